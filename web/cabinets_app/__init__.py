@@ -0,0 +1 @@
+default_app_config = 'cabinets_app.apps.CabinetsAppConfig'
@@ -0,0 +1,22 @@
+""" bulk_create with the new primary keys set on every database
+
+Only some databases return the primary keys of a bulk insert; on the
+rest the rows are left with pk None. The rows of one insert get
+ascending primary keys in the order given, so there they are read back
+with one query, from a queryset of exactly the inserted rows.
+"""
+
+
+def bulk_insert(rows, new_rows):
+    """ bulk_create rows and set their primary keys
+    new_rows is a queryset of exactly the inserted rows, only read on
+    databases that do not return new primary keys. Returns rows.
+    """
+    if not rows:
+        return rows
+    type(rows[0]).objects.bulk_create(rows)
+    if rows[0].pk is None:
+        pks = new_rows.order_by('pk').values_list('pk', flat=True)
+        for row, pk in zip(rows, pks):
+            row.pk = pk
+    return rows
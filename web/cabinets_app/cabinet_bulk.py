@@ -0,0 +1,84 @@
+""" Bulk operations on the Cabinets of a Room
+
+copy_cabinet adds any number of copies of a Cabinet, drawers and all,
+and update_cabinets applies the same field changes to a selection of a
+Room's Cabinets. Either way the rows are written with one bulk_create
+or one UPDATE rather than a save per cabinet, so no signals are sent:
+each operation instead ends with one reprice of the cabinets it wrote,
+which pushes the price differences up to the Room and Project.
+"""
+from django.db import transaction
+from .bulk_insert import bulk_insert
+from .cabinet_numbers import reserve_cabinet_numbers
+from .models import Cabinet, Drawer
+from .price_cache import bump_project
+from .stored_prices import add_to_room, reprice_cabinets
+
+# the most copies copy_cabinet makes at once
+MAX_COPIES = 100
+
+# the fields update_cabinets may change
+BULK_EDIT_FIELDS = (
+    'specification',
+    'width',
+    'height',
+    'depth',
+    'number_of_doors',
+    'number_of_shelves',
+    'finished_interior',
+    'finished_left_end',
+    'finished_right_end',
+    'finished_top',
+    'finished_bottom',
+)
+
+
+def copy_cabinet(cabinet, count):
+    """ Add count copies of a Cabinet, with its drawers, to its Room
+    The copies are numbered after the Project's last cabinet. Returns a
+    queryset of them.
+    """
+    values = {
+        field.attname: getattr(cabinet, field.attname)
+        for field in Cabinet._meta.concrete_fields
+        if not field.primary_key
+    }
+    drawers = list(cabinet.drawers.all())
+    with transaction.atomic():
+        first = reserve_cabinet_numbers(cabinet.project_id, count)
+        copies = [
+            Cabinet(**dict(values, cabinet_number=number, stored_price=0))
+            for number in range(first, first + count)
+        ]
+        new = Cabinet.objects.filter(
+            project_id=cabinet.project_id,
+            cabinet_number__range=(first, first + count - 1))
+        bulk_insert(copies, new)
+        Drawer.objects.bulk_create([
+            Drawer(cabinet_id=copy.pk, height=drawer.height,
+                   material_id=drawer.material_id)
+            for copy in copies
+            for drawer in drawers
+        ])
+        reprice_cabinets(new)
+        add_to_room(cabinet.room_id, drawer_count=len(drawers) * count)
+        bump_project(cabinet.project_id)
+    return new
+
+
+def update_cabinets(room, cabinet_ids, **changes):
+    """ Set the fields in changes on the Cabinets of a Room with the
+    given primary keys
+    Ids of cabinets in other Rooms are ignored. Returns the number of
+    cabinets changed.
+    """
+    unknown = set(changes) - set(BULK_EDIT_FIELDS)
+    if unknown:
+        raise ValueError(f'Cannot bulk edit {", ".join(sorted(unknown))}')
+    with transaction.atomic():
+        cabinets = Cabinet.objects.filter(room=room, pk__in=cabinet_ids)
+        count = cabinets.update(**changes) if changes else 0
+        if count:
+            reprice_cabinets(cabinets)
+            bump_project(room.project_id)
+    return count
@@ -0,0 +1,263 @@
+""" Import a cabinet schedule, from CSV or XLSX, into a Room
+
+A schedule has one cabinet per row, under a header row naming the
+CabinetForm fields. The Specification is given by name, the finish
+flags as yes/no, and the drawers as a drawer_heights column of heights
+separated by semicolons, all of the Material named in drawer_material.
+
+Rows are read as a stream and validated in batches against CabinetForm
+and the drawer form rules, with the Specifications and Materials looked
+up in dicts built once, so validation makes no queries. Each batch's
+valid cabinets and drawers are inserted with bulk_create. A bad row is
+reported as a RowError and skipped; the rest of the file is still
+imported. The whole import is one transaction, with each batch's
+cabinet numbers reserved from the Project's counter in one query, and
+ends with one reprice of the new cabinets, since bulk_create sends no
+signals.
+"""
+import csv
+import io
+import os
+import time
+from collections import namedtuple
+from django.db import transaction
+from .bulk_insert import bulk_insert
+from .forms import CabinetForm, CabinetRowForm, DrawerRowForm
+from .cabinet_numbers import reserve_cabinet_numbers
+from .models import Cabinet, Drawer, Material
+from .price_cache import bump_project
+from .stored_prices import add_to_room, reprice_cabinets
+
+IMPORT_BATCH_SIZE = 500
+
+FLAG_FIELDS = tuple(
+    field for field in CabinetForm.Meta.fields
+    if field.startswith('finished_'))
+SCHEDULE_COLUMNS = (
+    *CabinetForm.Meta.fields, 'drawer_heights', 'drawer_material')
+# DrawerRowForm field to schedule column
+DRAWER_COLUMNS = {'height': 'drawer_heights', 'material': 'drawer_material'}
+REQUIRED_COLUMNS = tuple(
+    field for field in CabinetForm.Meta.fields if field not in FLAG_FIELDS)
+
+TRUE_VALUES = ('1', 'y', 'yes', 't', 'true', 'x')
+FALSE_VALUES = ('', '0', 'n', 'no', 'f', 'false')
+
+RowError = namedtuple('RowError', 'row field message')
+
+
+class ScheduleError(ValueError):
+    """ A schedule file that cannot be read at all
+    """
+
+
+class ImportResult:
+    """ What an import created and which rows it skipped
+    """
+    def __init__(self):
+        self.rows = 0
+        self.cabinets = 0
+        self.drawers = 0
+        self.errors = []
+        self.first_number = None
+        self.seconds = 0
+
+    @property
+    def skipped(self):
+        return len({error.row for error in self.errors})
+
+    def __str__(self):
+        return (
+            f'Imported {self.cabinets} cabinets and {self.drawers} drawers '
+            f'from {self.rows} rows; {self.skipped} rows skipped '
+            f'({self.seconds * 1000:.0f} ms)'
+        )
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _rows(header, lines):
+    """ Yield (spreadsheet row number, dict of column to text) for the
+    lines under a header
+    """
+    columns = [_cell(name).lower().replace(' ', '_') for name in header]
+    missing = [name for name in REQUIRED_COLUMNS if name not in columns]
+    if missing:
+        raise ScheduleError(f'Missing column: {", ".join(missing)}')
+    for number, line in enumerate(lines, 2):
+        values = [_cell(value) for value in line]
+        if not any(values):
+            continue
+        yield number, dict(zip(columns, values))
+
+
+def _read_csv(file):
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    try:
+        reader = csv.reader(text)
+        yield from _rows(next(reader, []), reader)
+    finally:
+        text.detach()
+
+
+def _read_xlsx(file):
+    # openpyxl is only needed for spreadsheets
+    import openpyxl
+    try:
+        workbook = openpyxl.load_workbook(
+            file, read_only=True, data_only=True)
+    except Exception as e:
+        raise ScheduleError(f'Not a readable .xlsx file: {e}')
+    try:
+        lines = workbook.worksheets[0].iter_rows(values_only=True)
+        yield from _rows(next(lines, ()), lines)
+    finally:
+        workbook.close()
+
+
+def read_schedule(file, name):
+    """ Yield (row number, dict of column to text) from a binary file,
+    as CSV or XLSX by its file name
+    """
+    extension = os.path.splitext(name)[1].lower()
+    if extension == '.csv':
+        return _read_csv(file)
+    if extension == '.xlsx':
+        return _read_xlsx(file)
+    raise ScheduleError('The schedule must be a .csv or .xlsx file')
+
+
+def name_map(objects, name):
+    """ Map each object's name to it, or to None where several share it
+    """
+    names = {}
+    for obj in objects:
+        key = getattr(obj, name)
+        names[key] = None if key in names else obj
+    return names
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _flag(value):
+    value = value.lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise ValueError(f'Expected yes or no, not "{value}"')
+
+
+def validate_row(number, row, specifications, materials):
+    """ Validate one schedule row
+    Returns (Cabinet, [Drawer], []) for a good row or (None, [], [RowError])
+    for a bad one. The Cabinet has no Project, Room or number yet.
+    """
+    errors = []
+    data = {field: row.get(field, '') for field in CabinetForm.Meta.fields}
+    for field in FLAG_FIELDS:
+        try:
+            data[field] = _flag(data[field])
+        except ValueError as e:
+            errors.append(RowError(number, field, str(e)))
+    form = CabinetRowForm(specifications, data)
+    for field, messages in form.errors.items():
+        errors.extend(RowError(number, field, message) for message in messages)
+
+    drawers = []
+    heights = row.get('drawer_heights', '').replace(';', ' ').split()
+    for height in heights:
+        drawer_form = DrawerRowForm(materials, {
+            'height': height, 'material': row.get('drawer_material', '')})
+        if not drawer_form.is_valid():
+            # the first bad drawer is enough to report
+            for field, messages in drawer_form.errors.items():
+                errors.extend(
+                    RowError(number, DRAWER_COLUMNS[field], message)
+                    for message in messages)
+            break
+        drawers.append(drawer_form.save(commit=False))
+    if errors:
+        return None, [], errors
+    return form.save(commit=False), drawers, []
+
+
+def _insert(project, cabinets):
+    """ bulk_create a batch of (Cabinet, [Drawer]) and their drawers
+    Returns the number of drawers.
+    """
+    numbers = [cabinet.cabinet_number for cabinet, drawers in cabinets]
+    bulk_insert(
+        [cabinet for cabinet, drawers in cabinets],
+        Cabinet.objects.filter(
+            project=project,
+            cabinet_number__range=(min(numbers), max(numbers))))
+    new_drawers = []
+    for cabinet, drawers in cabinets:
+        for drawer in drawers:
+            drawer.cabinet = cabinet
+            new_drawers.append(drawer)
+    Drawer.objects.bulk_create(new_drawers)
+    return len(new_drawers)
+
+
+def import_schedule(room, rows, batch_size=IMPORT_BATCH_SIZE, dry_run=False):
+    """ Import read_schedule()'s rows into a Room
+    Returns an ImportResult. With dry_run, the rows are validated and
+    inserted but the transaction is rolled back.
+    """
+    started = time.perf_counter()
+    project = room.project
+    specifications = name_map(
+        project.specifications.only('pk', 'name', 'project'), 'name')
+    materials = name_map(Material.objects.only('pk', 'name'), 'name')
+    result = ImportResult()
+    with transaction.atomic():
+        for batch in _batches(rows, batch_size):
+            cabinets = []
+            for number, row in batch:
+                result.rows += 1
+                cabinet, drawers, errors = validate_row(
+                    number, row, specifications, materials)
+                if errors:
+                    result.errors.extend(errors)
+                    continue
+                cabinet.project = project
+                cabinet.room = room
+                cabinets.append((cabinet, drawers))
+            if cabinets:
+                # the counter stays locked until the import commits, so
+                # the batches' numbers run on from each other
+                number = reserve_cabinet_numbers(project.id, len(cabinets))
+                if result.first_number is None:
+                    result.first_number = number
+                for number, (cabinet, drawers) in enumerate(
+                        cabinets, number):
+                    cabinet.cabinet_number = number
+                result.drawers += _insert(project, cabinets)
+                result.cabinets += len(cabinets)
+
+        if result.cabinets:
+            reprice_cabinets(Cabinet.objects.filter(
+                project=project, cabinet_number__gte=result.first_number))
+            add_to_room(room.id, drawer_count=result.drawers)
+            bump_project(project.id)
+        if dry_run:
+            transaction.set_rollback(True)
+    result.seconds = time.perf_counter() - started
+    return result
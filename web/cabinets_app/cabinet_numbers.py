@@ -0,0 +1,63 @@
+""" Cabinet numbers, allocated from a counter row per Project
+
+Each Project's CabinetCounter holds the last number handed out. A
+reservation advances it in a single UPDATE, which holds the row's lock
+until the surrounding transaction ends, so two estimators adding
+cabinets to the same Project at once can never be given the same
+number, and no query has to scan the Project's cabinets. The unique
+(project, cabinet_number) constraint on Cabinet backs this up.
+
+Numbers are not reused: deleting a Project's last cabinet does not
+give its number to the next one.
+"""
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Max
+from .models import Cabinet, CabinetCounter
+
+
+def _advance(project_id, count):
+    """ Add count to a Project's counter, returning the new last number,
+    or None if the Project has no counter yet
+    """
+    if connection.vendor == 'postgresql':
+        # one round trip
+        table = connection.ops.quote_name(CabinetCounter._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {table} SET last_number = last_number + %s '
+                f'WHERE project_id = %s RETURNING last_number',
+                [count, project_id])
+            row = cursor.fetchone()
+        return row and row[0]
+    counters = CabinetCounter.objects.filter(project_id=project_id)
+    if not counters.update(last_number=F('last_number') + count):
+        return None
+    # the UPDATE holds the row, so this reads back our own number
+    return counters.values_list('last_number', flat=True).get()
+
+
+def reserve_cabinet_numbers(project_id, count=1):
+    """ Reserve count consecutive cabinet numbers in a Project
+    Returns the first of them. Call this inside the transaction that
+    inserts the cabinets to keep the Project's numbers gapless; other
+    reservations for the Project then wait for it to commit.
+    """
+    if count < 1:
+        raise ValueError('count must be at least 1')
+    with transaction.atomic():
+        last = _advance(project_id, count)
+        if last is None:
+            # the Project's first reservation: carry on from any
+            # cabinets it was given before it had a counter
+            highest = Cabinet.objects.filter(
+                project_id=project_id).aggregate(
+                Max('cabinet_number'))['cabinet_number__max']
+            try:
+                with transaction.atomic():
+                    CabinetCounter.objects.create(
+                        project_id=project_id, last_number=highest or 0)
+            except IntegrityError:
+                # another reservation created it first
+                pass
+            last = _advance(project_id, count)
+    return last - count + 1
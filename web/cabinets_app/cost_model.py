@@ -0,0 +1,179 @@
+""" Linear cost model of Project prices, for what-if questions
+
+Every term of a cabinet's price is linear in one input: a panel's
+material cost per area, the hourly rate, the minutes of one Labor item
+or the hinge cost. A Project's total is therefore a dot product of a
+few coefficients with those inputs:
+
+    total = sum of area[material] * cost[material]
+          + hourly_rate * sum of units[item] * minutes[item] / 60
+          + hinges * hinge_cost
+
+build_cost_models() finds the coefficients (areas per Material, units
+of each Labor item and the number of hinges) by walking the Projects
+once. They only change when a Project's graph does, so price_cache
+keeps them under the Project revision. A what-if is the same dot
+product evaluated at changed CostInputs.
+
+The dot product is exact, in price_core units, but is rounded once at
+the end. It can differ from the invoice total, which rounds each drawer
+and cabinet body, by up to half a cent per line. Cabinets that cannot be
+priced are left out, as their stored price is 0.
+"""
+from collections import Counter, defaultdict
+from fractions import Fraction
+from .models import Material, Project, Room
+from .parts import box_parts, drawer_parts
+from .price_core import (
+    WASTE_DENOMINATOR, WASTE_NUMERATOR, divide_half_up, hundredths,
+    to_dollars
+)
+from .pricing import prefetch_rooms
+from .rates import get_rate_table
+from .stored_prices import is_priceable
+
+
+HINGE = 'Blum 110+ Hinge'
+HINGES_PER_DOOR = 2
+WASTE = Fraction(WASTE_NUMERATOR, WASTE_DENOMINATOR)
+
+
+class CostModel:
+    """ Coefficients of one Project's price
+    material_areas maps Material id to area in hundredths of an inch
+    squared, waste included; labor_units maps Labor item_name to the
+    number of cabinets, doors or drawers.
+    """
+    def __init__(self, project_id, material_areas, labor_units, hinges):
+        self.project_id = project_id
+        self.material_areas = material_areas
+        self.labor_units = labor_units
+        self.hinges = hinges
+
+    def cents(self, inputs):
+        """ Exact total in cents, as a Fraction
+        """
+        material = sum((
+            area * inputs.material_costs[material_id]
+            for material_id, area in self.material_areas.items()
+        ), Fraction(0))
+        minutes = sum(
+            units * inputs.labor_minutes[item]
+            for item, units in self.labor_units.items()
+        )
+        labor = Fraction(minutes * inputs.hourly_rates[self.project_id], 60)
+        return material + labor + self.hinges * inputs.hinge_cost
+
+    def price(self, inputs):
+        """ Total in dollars, rounded half up to cents
+        """
+        cents = self.cents(inputs)
+        return to_dollars(divide_half_up(cents.numerator, cents.denominator))
+
+
+class CostInputs:
+    """ The values CostModels are evaluated at, in price_core units
+    material_costs maps Material id to cents per hundredth of an inch
+    squared; hourly_rates maps Project id to cents per hour.
+    """
+    def __init__(self, material_costs, labor_minutes, hinge_cost,
+                 hourly_rates):
+        self.material_costs = material_costs
+        self.labor_minutes = labor_minutes
+        self.hinge_cost = hinge_cost
+        self.hourly_rates = hourly_rates
+
+    @classmethod
+    def load(cls, models, rates=None):
+        """ Load the current inputs for a list of CostModels
+        Only the Materials, Labor items and Hardware they use are needed.
+        """
+        if rates is None:
+            rates = get_rate_table()
+        material_ids = set()
+        items = set()
+        for model in models:
+            material_ids.update(model.material_areas)
+            items.update(model.labor_units)
+        materials = Material.objects.in_bulk(material_ids)
+        hourly_rates = Project.objects.filter(
+            pk__in=[model.project_id for model in models]
+        ).values_list('pk', 'hourly_rate')
+        if any(model.hinges for model in models):
+            hinge_cost = hundredths(rates.hardware_cost(HINGE))
+        else:
+            hinge_cost = 0
+        return cls(
+            {pk: Fraction(*m.area_cost) for pk, m in materials.items()},
+            {item: rates.labor_minutes(item) for item in items},
+            hinge_cost,
+            {pk: hundredths(rate) for pk, rate in hourly_rates},
+        )
+
+    def what_if(self, materials=None, hourly_rate=None, labor_minutes=None,
+                hinge_cost=None):
+        """ Return a copy with some inputs changed
+        materials maps Material id to a multiplier of its current cost,
+        e.g. {cherry.id: Decimal('1.08')}. hourly_rate and hinge_cost are
+        in dollars; hourly_rate applies to every Project. labor_minutes
+        maps item_name to minutes.
+        """
+        material_costs = dict(self.material_costs)
+        for material_id, factor in (materials or {}).items():
+            if material_id in material_costs:
+                material_costs[material_id] *= Fraction(factor)
+        hourly_rates = self.hourly_rates
+        if hourly_rate is not None:
+            rate = hundredths(hourly_rate)
+            hourly_rates = {pk: rate for pk in hourly_rates}
+        return CostInputs(
+            material_costs,
+            {**self.labor_minutes, **(labor_minutes or {})},
+            self.hinge_cost if hinge_cost is None else hundredths(hinge_cost),
+            hourly_rates,
+        )
+
+
+def build_cost_models(projects):
+    """ Return a dict of Project id to CostModel
+    Loads every Project in the same fixed number of queries as
+    price_project.
+    """
+    project_ids = [project.id for project in projects]
+    areas = {pk: defaultdict(Fraction) for pk in project_ids}
+    units = {pk: Counter() for pk in project_ids}
+    hinges = Counter()
+    rooms = prefetch_rooms(Room.objects.filter(project__in=project_ids))
+    for room in rooms:
+        for cabinet in room.cabinets.all():
+            drawers = cabinet.drawers.all()
+            if not is_priceable(cabinet, drawers):
+                continue
+            spec = cabinet.specification
+            interior_area, exterior_area = box_parts(cabinet).areas()
+            project_areas = areas[room.project_id]
+            project_areas[spec.interior_material_id] += interior_area * WASTE
+            project_areas[spec.exterior_material_id] += exterior_area * WASTE
+            for drawer in drawers:
+                project_areas[drawer.material_id] += drawer_parts(
+                    drawer, cabinet).drawer_area(0)
+            units[room.project_id].update({
+                'Cabinet': 1,
+                'Door': cabinet.number_of_doors,
+                'Drawer': len(drawers),
+            })
+            hinges[room.project_id] += (
+                cabinet.number_of_doors * HINGES_PER_DOOR)
+    return {
+        pk: CostModel(
+            pk,
+            {m: area for m, area in areas[pk].items() if area},
+            {item: n for item, n in units[pk].items() if n},
+            hinges[pk],
+        )
+        for pk in project_ids
+    }
+
+
+def build_cost_model(project):
+    return build_cost_models([project])[project.id]
@@ -0,0 +1,206 @@
+""" Cut lists: packing a Project's panels onto sheets of each Material
+
+Every panel from the parts lists (see parts.py) is laid out on sheets
+of its Material with a guillotine heuristic, so every cut runs edge to
+edge of the piece it is made in, as on a panel saw:
+
+- panels are placed largest first;
+- each goes into the free rectangle it fits most tightly, by the
+  shorter leftover side (best short side fit), on one of the most
+  recently opened sheets;
+- the rectangle left around it is cut in two along the shorter
+  leftover side, which keeps the larger offcut whole.
+
+Only the last `window` sheets are searched. Because panels arrive
+largest first, older sheets are nearly full by the time they leave the
+window, and the search stays short however large the Project, so a
+thousand cabinets pack in well under a second.
+
+The kerf, the width of the saw blade, is added to every panel and to
+the sheet, which leaves a kerf between neighbouring panels but none at
+the sheet edge. With grain set, panels are never turned: their length
+runs along the sheet's length. Lengths are in hundredths of an inch,
+as in price_core.
+"""
+from collections import defaultdict, namedtuple
+from decimal import Decimal
+from .models import Material
+from .parts import PART_NAMES, cabinet_parts
+from .price_core import hundredths
+from .pricing import project_rooms
+
+
+DEFAULT_KERF = Decimal('0.125')
+DEFAULT_WINDOW = 4
+
+# one piece to cut; label says where it goes
+Panel = namedtuple('Panel', 'length width label')
+
+# x runs across the sheet's width and y along its length; length and
+# width are the panel's as laid out
+Placement = namedtuple('Placement', 'panel x y length width rotated')
+
+
+class Sheet:
+    """ One sheet of a CutList and the free rectangles left on it
+    """
+    def __init__(self, width, length):
+        self.placements = []
+        self.free = [(0, 0, width, length)]
+
+    @property
+    def panel_area(self):
+        return sum(p.length * p.width for p in self.placements)
+
+
+class CutList:
+    """ The sheets one Material's panels are cut from
+    Panels too large for an empty sheet are listed in oversize rather
+    than placed.
+    """
+    def __init__(self, sheet_length, sheet_width, kerf=0, grain=False):
+        self.sheet_length = sheet_length
+        self.sheet_width = sheet_width
+        self.kerf = kerf
+        self.grain = grain
+        self.sheets = []
+        self.oversize = []
+
+    @property
+    def sheet_count(self):
+        return len(self.sheets)
+
+    @property
+    def panel_count(self):
+        return sum(len(sheet.placements) for sheet in self.sheets)
+
+    @property
+    def panel_area(self):
+        return sum(sheet.panel_area for sheet in self.sheets)
+
+    @property
+    def sheet_area(self):
+        return self.sheet_count * self.sheet_length * self.sheet_width
+
+    @property
+    def utilization(self):
+        """ Fraction of the sheet area that ends up in panels
+        """
+        if not self.sheets:
+            return 0
+        return self.panel_area / self.sheet_area
+
+
+def _orientations(panel, grain):
+    yield panel.width, panel.length, False
+    if not grain and panel.width != panel.length:
+        yield panel.length, panel.width, True
+
+
+def pack(panels, sheet_length, sheet_width, kerf=0, grain=False,
+         window=DEFAULT_WINDOW):
+    """ Lay Panels out on sheets; returns a CutList
+    All lengths, kerf included, are in hundredths of an inch.
+    """
+    cut_list = CutList(sheet_length, sheet_width, kerf, grain)
+    # with a kerf added to both, panels that tile the sheet still fit
+    full = (sheet_width + kerf, sheet_length + kerf)
+    todo = []
+    for panel in panels:
+        if any(width <= sheet_width and length <= sheet_length
+               for width, length, _ in _orientations(panel, grain)):
+            todo.append(panel)
+        else:
+            cut_list.oversize.append(panel)
+    if grain:
+        todo.sort(key=lambda p: (p.length, p.width), reverse=True)
+    else:
+        todo.sort(
+            key=lambda p: (max(p.length, p.width), min(p.length, p.width)),
+            reverse=True)
+    if not todo:
+        return cut_list
+    # free rectangles too narrow for any panel are dropped
+    smallest = min(min(p.length, p.width) for p in todo) + kerf
+
+    open_sheets = []
+    for panel in todo:
+        best = None
+        for sheet in open_sheets:
+            for index, (x, y, free_w, free_l) in enumerate(sheet.free):
+                for width, length, rotated in _orientations(panel, grain):
+                    width, length = width + kerf, length + kerf
+                    if width > free_w or length > free_l:
+                        continue
+                    score = min(free_w - width, free_l - length)
+                    if best is None or score < best[0]:
+                        best = (score, sheet, index, width, length, rotated)
+            if best is not None and best[0] == 0:
+                break
+        if best is None:
+            sheet = Sheet(*full)
+            cut_list.sheets.append(sheet)
+            open_sheets.append(sheet)
+            if len(open_sheets) > window:
+                open_sheets.pop(0)
+            width, length, rotated = next(
+                (width + kerf, length + kerf, rotated)
+                for width, length, rotated in _orientations(panel, grain)
+                if width <= sheet_width and length <= sheet_length)
+            best = (None, sheet, 0, width, length, rotated)
+        _, sheet, index, width, length, rotated = best
+        x, y, free_w, free_l = sheet.free.pop(index)
+        sheet.placements.append(
+            Placement(panel, x, y, length - kerf, width - kerf, rotated))
+        right_w, top_l = free_w - width, free_l - length
+        if right_w < top_l:
+            pieces = ((x + width, y, right_w, length),
+                      (x, y + length, free_w, top_l))
+        else:
+            pieces = ((x + width, y, right_w, free_l),
+                      (x, y + length, width, top_l))
+        sheet.free.extend(
+            piece for piece in pieces
+            if piece[2] >= smallest and piece[3] >= smallest)
+    return cut_list
+
+
+def collect_panels(rooms):
+    """ Return a dict of Material id to the Panels of prefetched Rooms
+    Parts without a Material are left out.
+    """
+    panels = defaultdict(list)
+    for room in rooms:
+        for cabinet in room.cabinets.all():
+            for part in cabinet_parts(cabinet, cabinet.drawers.all()):
+                if not part.material_id:
+                    continue
+                label = f'{cabinet.cabinet_number} {PART_NAMES[part.kind]}'
+                panels[part.material_id].extend(
+                    [Panel(part.length, part.width, label)] * part.quantity)
+    return panels
+
+
+def pack_materials(panels, kerf=DEFAULT_KERF, grain=False):
+    """ Pack a dict of Material id to Panels, as from collect_panels()
+    Returns a list of (Material, CutList) in Material order. kerf is in
+    inches.
+    """
+    materials = sorted(
+        Material.objects.in_bulk(panels).values(),
+        key=lambda m: (m.name, m.id))
+    return [
+        (material, pack(
+            panels[material.id],
+            hundredths(material.length), hundredths(material.width),
+            hundredths(kerf), grain))
+        for material in materials
+    ]
+
+
+def project_cut_lists(project, kerf=DEFAULT_KERF, grain=False):
+    """ Return a list of (Material, CutList) for every Material a
+    Project uses
+    """
+    return pack_materials(
+        collect_panels(project_rooms(project)), kerf, grain)
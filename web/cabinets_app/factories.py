@@ -0,0 +1,178 @@
+""" factory-boy factories for synthetic Accounts, Projects, Rooms, Cabinets
+and Drawers, and a generator that builds them at scale
+
+Dimensions, finishes and Materials are drawn from factory-boy's random
+generator, so reseeding it (generate_account does, with its seed) gives
+the same rows every time. Cabinets and Drawers are built in memory and
+saved with bulk_create; everything else is saved one row at a time.
+"""
+import factory
+import factory.fuzzy
+import factory.random
+from decimal import Decimal
+from .bulk_insert import bulk_insert
+from .cabinet_numbers import reserve_cabinet_numbers
+from .cost_model import HINGE
+from .models import (
+    Account, Cabinet, Drawer, Hardware, Labor, Material, Project, Room,
+    Specification
+)
+
+# (Labor item_name, minutes) created when the catalog has none
+DEFAULT_LABOR = (
+    ('Cabinet', 120),
+    ('Door', 60),
+    ('Drawer', 45),
+)
+
+
+def _chance(probability):
+    return factory.LazyFunction(
+        lambda: factory.random.randgen.random() < probability)
+
+
+class AccountFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Account
+
+    name = factory.Faker('company')
+    billing_address = factory.Faker('address')
+    billing_phone = factory.Faker('numerify', text='###-###-####')
+    billing_email = factory.Faker('company_email')
+    contact_name = factory.Faker('name')
+    discount = factory.fuzzy.FuzzyDecimal(0, 0.2)
+
+
+class MaterialFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Material
+
+    name = factory.Sequence(lambda n: f'Plywood {n}')
+    description = factory.LazyAttribute(lambda m: f'3/4 {m.name}')
+    thickness = Decimal('0.75')
+    width = factory.fuzzy.FuzzyChoice([48, 49, 60])
+    length = factory.fuzzy.FuzzyChoice([96, 97, 120])
+    sheet_cost = factory.fuzzy.FuzzyDecimal(40, 300)
+    waste_factor = Decimal('0.15')
+    markup = factory.fuzzy.FuzzyDecimal(0, 0.6)
+
+
+class ProjectFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Project
+
+    name = factory.Sequence(lambda n: f'Project {n}')
+    account = factory.SubFactory(AccountFactory)
+    physical_address = factory.Faker('address')
+    site_contact = factory.Faker('name')
+    contact_phone = factory.Faker('numerify', text='###-###-####')
+    contact_email = factory.Faker('email')
+    hourly_rate = factory.fuzzy.FuzzyDecimal(18, 45)
+
+
+class SpecificationFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Specification
+
+    project = factory.SubFactory(ProjectFactory)
+    interior_material = factory.SubFactory(MaterialFactory)
+    exterior_material = factory.SubFactory(MaterialFactory)
+    name = factory.Sequence(lambda n: f'Spec {n}')
+
+
+class RoomFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Room
+
+    name = factory.Sequence(lambda n: f'Room {n}')
+    project = factory.SubFactory(ProjectFactory)
+
+
+class CabinetFactory(factory.django.DjangoModelFactory):
+    """ A random Cabinet; pass project, specification and room when
+    building in bulk, so no rows are created for them
+    """
+    class Meta:
+        model = Cabinet
+
+    project = factory.SubFactory(ProjectFactory)
+    specification = factory.SubFactory(
+        SpecificationFactory, project=factory.SelfAttribute('..project'))
+    room = factory.SubFactory(
+        RoomFactory, project=factory.SelfAttribute('..project'))
+    cabinet_number = factory.LazyAttribute(
+        lambda o: reserve_cabinet_numbers(o.project.id))
+    width = factory.fuzzy.FuzzyDecimal(9, 48)
+    height = factory.fuzzy.FuzzyDecimal(12, 96)
+    depth = factory.fuzzy.FuzzyDecimal(12, 24)
+    number_of_doors = factory.fuzzy.FuzzyInteger(0, 2)
+    number_of_shelves = factory.fuzzy.FuzzyInteger(0, 4)
+    finished_interior = _chance(0.2)
+    finished_left_end = _chance(0.3)
+    finished_right_end = _chance(0.3)
+    finished_top = _chance(0.2)
+    finished_bottom = _chance(0.2)
+
+
+class DrawerFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Drawer
+
+    cabinet = factory.SubFactory(CabinetFactory)
+    height = factory.fuzzy.FuzzyDecimal(3, 12)
+    material = factory.SubFactory(MaterialFactory)
+
+
+def ensure_rates():
+    """ Create the Labor and Hardware rows Cabinet.price needs, where the
+    catalog does not have them yet
+    """
+    for item_name, minutes in DEFAULT_LABOR:
+        Labor.objects.get_or_create(
+            item_name=item_name,
+            defaults={'minutes': minutes, 'unit_type': 'Each'})
+    Hardware.objects.get_or_create(name=HINGE, defaults={
+        'cost_per': Decimal('2.75'), 'unit_type': 'Each',
+        'markup': Decimal('0.20')})
+
+
+def generate_account(projects, rooms, cabinets, drawers, materials=4,
+                     specifications=2, seed=0):
+    """ Create an Account with projects Projects, each with rooms Rooms
+    of cabinets Cabinets, each with drawers Drawers
+    Returns the Account. The Materials are shared by the whole Account.
+    """
+    factory.random.reseed_random(seed)
+    ensure_rates()
+    account = AccountFactory()
+    catalog = MaterialFactory.create_batch(materials)
+    for p in range(projects):
+        project = ProjectFactory(account=account)
+        specs = [
+            SpecificationFactory(
+                project=project,
+                interior_material=factory.random.randgen.choice(catalog),
+                exterior_material=factory.random.randgen.choice(catalog))
+            for s in range(specifications)
+        ]
+        if rooms * cabinets:
+            number = reserve_cabinet_numbers(project.id, rooms * cabinets)
+        new_cabinets = []
+        for r in range(rooms):
+            room = RoomFactory(project=project)
+            batch = []
+            for c in range(cabinets):
+                batch.append(CabinetFactory.build(
+                    project=project, room=room, cabinet_number=number,
+                    specification=factory.random.randgen.choice(specs)))
+                number += 1
+            bulk_insert(batch, Cabinet.objects.filter(room=room))
+            new_cabinets.extend(batch)
+        Drawer.objects.bulk_create([
+            DrawerFactory.build(
+                cabinet=cabinet,
+                material=factory.random.randgen.choice(catalog))
+            for cabinet in new_cabinets
+            for d in range(drawers)
+        ])
+    return account
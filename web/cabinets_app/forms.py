@@ -1,4 +1,6 @@
 from django import forms
+from django.db import models
+from .cabinet_bulk import BULK_EDIT_FIELDS, MAX_COPIES
 from .models import (
     Account, Material, Hardware,
     Labor, Project, Specification,
@@ -32,6 +34,11 @@ class ProjectForm(forms.ModelForm):
         ]
 
 
+class ProjectCloneForm(forms.Form):
+    name = forms.CharField(max_length=128)
+    account = forms.ModelChoiceField(queryset=Account.objects.all())
+
+
 class SpecForm(forms.ModelForm):
     class Meta:
         model = Specification
@@ -83,6 +90,115 @@ class CabinetForm(forms.ModelForm):
             project=project)
 
 
+class NameChoiceField(forms.Field):
+    """ Choose a model instance by name from a dict of them, without a
+    query
+    choices maps each name to its instance, or to None when more than
+    one instance has the name.
+    """
+    def __init__(self, choices, *args, **kwargs):
+        super(NameChoiceField, self).__init__(*args, **kwargs)
+        self.choices = choices
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        name = str(value).strip()
+        if name not in self.choices:
+            raise forms.ValidationError(
+                f'No {self.label} named "{name}"', code='invalid_choice')
+        if self.choices[name] is None:
+            raise forms.ValidationError(
+                f'More than one {self.label} is named "{name}"',
+                code='ambiguous')
+        return self.choices[name]
+
+
+class CabinetRowForm(CabinetForm):
+    """ CabinetForm for one row of an imported schedule, with the
+    Specification given by name
+    specifications maps the Project's Specification names to them (see
+    NameChoiceField), so validating a row makes no queries.
+    """
+    def __init__(self, specifications, *args, **kwargs):
+        super(CabinetRowForm, self).__init__(None, *args, **kwargs)
+        self.fields['specification'] = NameChoiceField(
+            specifications, label='specification')
+
+    def _get_validation_exclusions(self):
+        # the name lookup has already found the Specification
+        return super()._get_validation_exclusions() + ['specification']
+
+
+class DrawerRowForm(forms.ModelForm):
+    """ A drawer of an imported schedule row, with the Material given by
+    name, validated as DrawerFormSet validates its forms
+    """
+    class Meta:
+        model = Drawer
+        fields = ('height', 'material')
+
+    def __init__(self, materials, *args, **kwargs):
+        super(DrawerRowForm, self).__init__(*args, **kwargs)
+        self.fields['material'] = NameChoiceField(
+            materials, label='drawer material')
+
+    def _get_validation_exclusions(self):
+        return super()._get_validation_exclusions() + ['material']
+
+
+class CabinetImportForm(forms.Form):
+    schedule = forms.FileField(
+        help_text='A .csv or .xlsx file with one cabinet per row')
+
+
+class CabinetCopyForm(forms.Form):
+    count = forms.IntegerField(
+        min_value=1, max_value=MAX_COPIES, initial=1,
+        help_text='Number of copies to add')
+
+
+class CabinetBulkEditForm(forms.Form):
+    """ A selection of a Room's Cabinets, and the fields to change on
+    all of them
+    A field left blank is left as it is on each cabinet.
+    """
+    FLAG_CHOICES = [('', 'Unchanged'), ('true', 'Yes'), ('false', 'No')]
+
+    def __init__(self, room, *args, **kwargs):
+        super(CabinetBulkEditForm, self).__init__(*args, **kwargs)
+        self.fields['cabinets'] = forms.ModelMultipleChoiceField(
+            queryset=room.cabinets.all(),
+            widget=forms.CheckboxSelectMultiple)
+        for name in BULK_EDIT_FIELDS:
+            field = Cabinet._meta.get_field(name)
+            if name == 'specification':
+                self.fields[name] = forms.ModelChoiceField(
+                    queryset=Specification.objects.filter(
+                        project_id=room.project_id),
+                    required=False, empty_label='Unchanged')
+            elif isinstance(field, models.BooleanField):
+                self.fields[name] = forms.NullBooleanField(
+                    label=field.verbose_name.capitalize(),
+                    widget=forms.Select(choices=self.FLAG_CHOICES))
+            else:
+                self.fields[name] = field.formfield(required=False)
+
+    def changes(self):
+        """ The fields to set, by name, once the form is valid
+        """
+        return {
+            name: self.cleaned_data[name] for name in BULK_EDIT_FIELDS
+            if self.cleaned_data.get(name) is not None
+        }
+
+    def clean(self):
+        cleaned_data = super(CabinetBulkEditForm, self).clean()
+        if not self.errors and not self.changes():
+            raise forms.ValidationError('Choose at least one change.')
+        return cleaned_data
+
+
 DrawerFormSet = forms.modelformset_factory(
     Drawer,
     fields=('height', 'material'),
@@ -0,0 +1,104 @@
+""" Hardware purchase orders: how much of each Hardware row a set of
+Cabinets needs
+
+What a cabinet uses is described by HARDWARE_USES in pieces per door or
+drawer, and converted to the Hardware row's unit_type when it is
+ordered: two hinges are one Pair, and a Set is whatever one door or
+drawer takes. The door and drawer counts for the whole scope come from
+one aggregate query; the catalog rows are a second. Hardware missing
+from the catalog is left off the order.
+"""
+import csv
+from collections import namedtuple
+from decimal import ROUND_HALF_UP, Decimal
+from django.db import models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from .cost_model import HINGE, HINGES_PER_DOOR
+from .models import Drawer, Hardware
+
+DRAWER_GUIDE = 'Blum 563 UM Guide'
+
+# (Hardware name, what it is counted per, pieces of it each one takes)
+HARDWARE_USES = (
+    (HINGE, 'doors', HINGES_PER_DOOR),
+    (DRAWER_GUIDE, 'drawers', 2),
+)
+
+# pieces in one of each Hardware unit_type but Set
+PIECES_PER_UNIT = {
+    'Each': 1,
+    'Pair': 2,
+}
+
+OrderLine = namedtuple(
+    'OrderLine', 'hardware quantity extended_cost marked_up')
+
+
+def _cents(amount):
+    return amount.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def cabinet_counts(cabinets):
+    """ Return a dict of the number of doors and drawers in a Cabinet
+    queryset, in one query
+    """
+    drawers = Drawer.objects.filter(
+        cabinet=OuterRef('pk')).order_by().values('cabinet').annotate(
+            total=Count('pk')).values('total')
+    counts = cabinets.order_by().annotate(drawer_count=Coalesce(
+        Subquery(drawers, output_field=models.IntegerField()), 0,
+    )).aggregate(
+        doors=Sum('number_of_doors'),
+        drawers=Sum('drawer_count'),
+    )
+    return {key: value or 0 for key, value in counts.items()}
+
+
+def order_quantity(hardware, uses, pieces):
+    """ How many of a Hardware row's unit_type to order for pieces
+    pieces, needed by uses doors or drawers
+    A Set is one use's worth; otherwise pieces are rounded up to whole
+    units. An unknown unit_type is taken to be Each.
+    """
+    unit_type = hardware.unit_type.capitalize()
+    if unit_type == 'Set':
+        return uses
+    per_unit = PIECES_PER_UNIT.get(unit_type, 1)
+    return -(-pieces // per_unit)
+
+
+def hardware_order(cabinets):
+    """ Return a list of OrderLines, in Hardware name order, for a Cabinet
+    queryset
+    extended_cost is quantity times cost_per; marked_up adds the
+    Hardware's markup. Both are rounded to cents.
+    """
+    counts = cabinet_counts(cabinets)
+    # (uses, pieces) by Hardware name
+    needs = {}
+    for name, per, pieces in HARDWARE_USES:
+        uses, total = needs.get(name, (0, 0))
+        needs[name] = (uses + counts[per], total + counts[per] * pieces)
+    lines = []
+    for hardware in Hardware.objects.filter(name__in=needs):
+        quantity = order_quantity(hardware, *needs[hardware.name])
+        if not quantity:
+            continue
+        extended_cost = quantity * hardware.cost_per
+        lines.append(OrderLine(
+            hardware, quantity, _cents(extended_cost),
+            _cents(extended_cost * (1 + hardware.markup))))
+    return lines
+
+
+def write_order_csv(lines, file):
+    writer = csv.writer(file)
+    writer.writerow([
+        'hardware', 'quantity', 'unit', 'cost per', 'extended cost',
+        'markup', 'marked up'])
+    for line in lines:
+        writer.writerow([
+            line.hardware.name, line.quantity, line.hardware.unit_type,
+            line.hardware.cost_per, line.extended_cost,
+            line.hardware.markup, line.marked_up])
@@ -0,0 +1,210 @@
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+from cabinets_app.factories import generate_account
+from cabinets_app.middleware import QueryCounter
+from cabinets_app.models import Cabinet, Project
+from cabinets_app.parts import parts_memo
+from cabinets_app.price_cache import bump_project
+from cabinets_app.pricing import price_memo
+from cabinets_app.stored_prices import rebuild_project
+
+DEFAULT_SCALES = [1000, 10000, 100000]
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR,
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True,
+            universal_newlines=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ('Generate synthetic Accounts at several scales and time '
+            'pricing and the main views against them, as JSON. The data '
+            'is rolled back afterwards.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'output', help='JSON file to write, or - for standard output')
+        parser.add_argument(
+            '--cabinets', type=int, action='append', dest='scales',
+            help='Cabinets in the Account at one scale (may be repeated; '
+                 f'default {", ".join(map(str, DEFAULT_SCALES))})')
+        parser.add_argument(
+            '--projects', type=int, default=5,
+            help='Projects per Account (default %(default)s)')
+        parser.add_argument(
+            '--rooms', type=int, default=4,
+            help='Rooms per Project (default %(default)s)')
+        parser.add_argument(
+            '--drawers', type=int, default=2,
+            help='Drawers per Cabinet (default %(default)s)')
+        parser.add_argument(
+            '--repeat', type=int, default=3,
+            help='Timed runs of each benchmark (default %(default)s)')
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Seed for the generated data (default %(default)s)')
+        parser.add_argument(
+            '--compare', metavar='JSON',
+            help='Earlier results to compare with, e.g. from another commit')
+
+    def handle(self, *args, **options):
+        scales = options['scales'] or DEFAULT_SCALES
+        for name in ('projects', 'rooms', 'repeat'):
+            if options[name] < 1:
+                raise CommandError(f'--{name} must be at least 1')
+        if options['drawers'] < 0:
+            raise CommandError('--drawers cannot be negative')
+        if min(scales) < options['projects'] * options['rooms']:
+            raise CommandError(
+                '--cabinets must allow one Cabinet per Room')
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+
+        # with the JSON on standard output, the summary goes to stderr
+        summary = self.stderr if options['output'] == '-' else self.stdout
+        results = {
+            'commit': _git_commit(),
+            'date': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'seed': options['seed'],
+            'repeat': options['repeat'],
+            'scales': [],
+        }
+        for cabinets in sorted(scales):
+            scale = self.run_scale(cabinets, options)
+            results['scales'].append(scale)
+            for name, result in scale['benchmarks'].items():
+                summary.write(
+                    f'{scale["cabinets"]:>8,} cabinets {name:<16} '
+                    f'{result["best"] * 1000:>10.1f} ms '
+                    f'{result["queries"]:>5} queries '
+                    f'{result["peak_bytes"] / 2 ** 20:>8.1f} MiB'
+                    + self.change(baseline, scale, name, result))
+
+        if options['output'] == '-':
+            json.dump(results, sys.stdout, indent=2)
+            sys.stdout.write('\n')
+        else:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+
+    def run_scale(self, cabinets, options):
+        """ Generate one Account, run every benchmark against it and roll
+        it all back
+        """
+        per_room = cabinets // (options['projects'] * options['rooms'])
+        with transaction.atomic():
+            started = time.perf_counter()
+            account = generate_account(
+                options['projects'], options['rooms'], per_room,
+                options['drawers'], seed=options['seed'])
+            projects = list(Project.objects.filter(account=account))
+            for project in projects:
+                rebuild_project(project)
+            generated = time.perf_counter() - started
+
+            project = projects[0]
+            cabinet = Cabinet.objects.filter(project=project).first()
+            user, created = User.objects.get_or_create(
+                username='cpm-benchmark')
+            client = Client()
+            client.force_login(user)
+
+            def get(url):
+                res = client.get(url)
+                if res.status_code != 200:
+                    raise CommandError(f'{url} returned {res.status_code}')
+
+            benchmarks = {
+                'Project.price': lambda: project.price,
+                'project_home': lambda: get(
+                    reverse('project_home', args=[project.id])),
+                'cabinet_detail': lambda: get(reverse(
+                    'cabinet_detail', args=[project.id, cabinet.id])),
+                'account': lambda: get(reverse('account')),
+            }
+            scale = {
+                'cabinets': Cabinet.objects.filter(
+                    project__account=account).count(),
+                'projects': options['projects'],
+                'rooms': options['rooms'],
+                'drawers': options['drawers'],
+                'generate_seconds': round(generated, 3),
+                'benchmarks': {
+                    name: self.measure(run, project, options['repeat'])
+                    for name, run in benchmarks.items()
+                },
+            }
+            transaction.set_rollback(True)
+        return scale
+
+    def measure(self, run, project, repeat):
+        """ Time run cold, then repeat - 1 more times, then once more, cold
+        again, for its peak memory
+        Cold is with the in-process memos cleared and the Project's
+        cached cost model orphaned. The query count is the cold run's.
+        """
+        def cold():
+            price_memo.clear()
+            parts_memo.clear()
+            bump_project(project.id)
+
+        cold()
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            started = time.perf_counter()
+            run()
+            seconds = [time.perf_counter() - started]
+        for i in range(repeat - 1):
+            started = time.perf_counter()
+            run()
+            seconds.append(time.perf_counter() - started)
+
+        cold()
+        tracemalloc.start()
+        try:
+            run()
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return {
+            'first': round(seconds[0], 6),
+            'best': round(min(seconds), 6),
+            'queries': counter.count,
+            'peak_bytes': peak,
+        }
+
+    def change(self, baseline, scale, name, result):
+        """ Change from the same benchmark at the same scale in baseline
+        """
+        if baseline is None:
+            return ''
+        for earlier in baseline['scales']:
+            if (earlier['cabinets'] == scale['cabinets'] and
+                    name in earlier['benchmarks']):
+                before = earlier['benchmarks'][name]
+                ratio = result['best'] / before['best']
+                queries = result['queries'] - before['queries']
+                return f' {ratio - 1:>+7.1%} time {queries:>+5} queries'
+        return ''
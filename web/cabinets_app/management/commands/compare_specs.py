@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+from cabinets_app.models import Material, Project, Specification
+from cabinets_app.rates import rate_scope
+from cabinets_app.spec_compare import (
+    Alternative, compare_specifications, load_alternatives
+)
+
+
+class Command(BaseCommand):
+    help = ('Price a Project under alternative Specifications or Material '
+            'pairs, without saving anything')
+
+    def add_arguments(self, parser):
+        parser.add_argument('project', type=int, help='Project id')
+        parser.add_argument(
+            '--spec', type=int, action='append', default=[], dest='specs',
+            help='Specification id to compare (may be repeated)')
+        parser.add_argument(
+            '--materials', type=int, nargs=2, action='append', default=[],
+            metavar=('INTERIOR', 'EXTERIOR'),
+            help='Interior and exterior Material ids (may be repeated)')
+
+    def handle(self, *args, **options):
+        try:
+            project = Project.objects.get(pk=options['project'])
+            alternatives = load_alternatives(
+                options['specs'], [tuple(pair) for pair in options['materials']])
+        except (Project.DoesNotExist, Specification.DoesNotExist,
+                Material.DoesNotExist) as e:
+            raise CommandError(e)
+        if not alternatives:
+            alternatives = [
+                Alternative.from_spec(spec)
+                for spec in project.specifications.select_related(
+                    'interior_material', 'exterior_material')
+            ]
+
+        with rate_scope():
+            comparison = compare_specifications(project, alternatives)
+
+        width = max(len(label) for label in comparison.labels) + 2
+        self.stdout.write(f'{"Room":<24}' + ''.join(
+            f'{label:>{width}}' for label in comparison.labels))
+        for room, totals in comparison.rooms:
+            self.stdout.write(f'{room.name:<24}' + ''.join(
+                f'{total:>{width},.2f}' for total in totals))
+        self.stdout.write(f'{"Project Total":<24}' + ''.join(
+            f'{total:>{width},.2f}' for total in comparison.totals))
@@ -1,155 +1,257 @@
+import csv
+import io
+import os
+import time
+from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
-from django.utils import timezone
+from django.db import connection, models, transaction
+from django.db.models import Max
 from cabinets_app.models import (
     Account, Material, Hardware, Labor,
-    Project, Specification, Room, Cabinet, Drawer)
-import csv
+    Project, Specification, Room, Cabinet, CabinetCounter, Drawer)
+from cabinets_app.price_cache import bump_project
+from cabinets_app.rates import invalidate_rate_table, rate_scope
+from cabinets_app.stored_prices import rebuild_all_projects
+
+DEFAULT_BATCH_SIZE = 1000
+
+# in the order they are loaded
+MODELS = (
+    Account, Project, Material, Hardware, Labor, Specification, Room,
+    Cabinet, CabinetCounter, Drawer)
+
+
+class NameMap:
+    """ Primary keys by name, or by a tuple of fields, loaded in one query
+    Where several rows share a key, the first one created wins.
+    """
+    def __init__(self, label, queryset, *fields):
+        self.label = label
+        self.ids = {}
+        for *key, pk in queryset.order_by('pk').values_list(*fields, 'pk'):
+            self.ids.setdefault(key[0] if len(key) == 1 else tuple(key), pk)
+
+    def __getitem__(self, key):
+        try:
+            return self.ids[key]
+        except KeyError:
+            raise LookupError(f'No {self.label} {key!r}')
+
+
+def copy_rows(model, objs):
+    """ Insert model instances with Postgres COPY
+    """
+    fields = [
+        field for field in model._meta.concrete_fields
+        if not isinstance(field, models.AutoField)]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for obj in objs:
+        values = (
+            field.get_db_prep_save(getattr(obj, field.attname), connection)
+            for field in fields)
+        writer.writerow([r'\N' if value is None else value
+                         for value in values])
+    buffer.seek(0)
+    qn = connection.ops.quote_name
+    columns = ', '.join(qn(field.column) for field in fields)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f'COPY {qn(model._meta.db_table)} ({columns}) FROM STDIN '
+            rf"WITH (FORMAT csv, NULL '\N')", buffer)
+
+
+def _flag(value):
+    return value.strip() == 'True'
 
 
 class Command(BaseCommand):
+    help = ('Replace all data with the dummy CSV files, streamed in with '
+            'bulk inserts, and rebuild the stored prices')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dir', default=os.path.join(settings.BASE_DIR, 'dummy_data'),
+            help='Directory of dummy_*.csv files (default %(default)s)')
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Rows per insert (default %(default)s)')
+        parser.add_argument(
+            '--copy', action='store_true',
+            help='Truncate the tables and load them with COPY (Postgres '
+                 'only)')
+
     def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        if options['copy'] and connection.vendor != 'postgresql':
+            raise CommandError('--copy needs a Postgres database')
+        self.directory = options['dir']
+        self.batch_size = options['batch_size']
+        self.copy = options['copy']
+
+        started = time.perf_counter()
+        with transaction.atomic():
+            self.clear()
+            self.load_catalog()
+            self.load_projects()
+            self.rebuild_prices()
+        # the rows were written without signals, so nothing cached so far
+        # can be trusted
+        invalidate_rate_table()
+        for project_id in Project.objects.values_list('pk', flat=True):
+            bump_project(project_id)
+        self.stdout.write(
+            f'Loaded in {time.perf_counter() - started:.2f} s')
+
+    def clear(self):
+        """ Empty every table MODELS names
+        The stored prices are rebuilt after the load, so the delete
+        signals, which would run for each row, are bypassed.
+        """
+        qn = connection.ops.quote_name
+        tables = [qn(model._meta.db_table) for model in reversed(MODELS)]
+        with connection.cursor() as cursor:
+            if self.copy:
+                cursor.execute(f'TRUNCATE {", ".join(tables)}')
+                return
+            for table in tables:
+                cursor.execute(f'DELETE FROM {table}')
+
+    def load(self, model, filename, build):
+        """ Stream a CSV file into model's table, build making an instance
+        from each row
+        """
+        started = time.perf_counter()
+        path = os.path.join(self.directory, filename)
+        count = 0
+        batch = []
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            for line, row in enumerate(csv.DictReader(f), 2):
+                try:
+                    batch.append(build(row))
+                except LookupError as e:
+                    raise CommandError(f'{path} line {line}: {e}')
+                if len(batch) == self.batch_size:
+                    self.insert(model, batch)
+                    count += len(batch)
+                    batch = []
+        if batch:
+            self.insert(model, batch)
+            count += len(batch)
+        seconds = time.perf_counter() - started
+        self.stdout.write(
+            f'{model.__name__:<16} {count:>9,} rows '
+            f'{seconds:>7.2f} s {count / (seconds or 1e-9):>10,.0f} rows/s')
+
+    def insert(self, model, batch):
+        if self.copy:
+            copy_rows(model, batch)
+        else:
+            model.objects.bulk_create(batch)
+
+    def load_catalog(self):
+        self.load(Account, 'dummy_accounts.csv', lambda row: Account(
+            name=row['Name'],
+            billing_address=row['Address'],
+            billing_phone=row['Phone'],
+            billing_email=row['Email'],
+            contact_name=row['Contact'],
+            discount=row['Discount'],
+        ))
+        accounts = NameMap('Account', Account.objects, 'name')
+
+        self.load(Project, 'dummy_projects.csv', lambda row: Project(
+            name=row['Name'],
+            physical_address=row['Address'],
+            site_contact=row['Contact'],
+            contact_phone=row['Phone'],
+            contact_email=row['Email'],
+            hourly_rate=row['Rate'],
+            account_id=accounts[row['Account']],
+        ))
+
+        self.load(Material, 'dummy_materials.csv', lambda row: Material(
+            name=row['Name'],
+            description=row['Description'],
+            thickness=row['Thickness'],
+            width=row['Width'],
+            length=row['Length'],
+            sheet_cost=row['Sheet_Cost'],
+            waste_factor=row['Waste_Factor'],
+            markup=row['Markup'],
+        ))
+
+        self.load(Hardware, 'dummy_hardware.csv', lambda row: Hardware(
+            name=row['Name'],
+            cost_per=row['Cost_Per'],
+            unit_type=row['Unit'],
+            markup=row['Markup'],
+        ))
+
+        self.load(Labor, 'dummy_labor.csv', lambda row: Labor(
+            item_name=row['Item_Name'],
+            minutes=row['Minutes'],
+            unit_type=row['Units'],
+        ))
+
+    def load_projects(self):
+        projects = NameMap('Project', Project.objects, 'name')
+        materials = NameMap('Material', Material.objects, 'name')
+
+        self.load(Specification, 'dummy_specs.csv', lambda row: Specification(
+            name=row['Name'],
+            project_id=projects[row['Project']],
+            interior_material_id=materials[row['Int_Material']],
+            exterior_material_id=materials[row['Ext_Material']],
+        ))
+        specs = NameMap(
+            'Specification', Specification.objects, 'project', 'name')
+
+        self.load(Room, 'dummy_rooms.csv', lambda row: Room(
+            project_id=projects[row['Project']],
+            name=row['Room'],
+        ))
+        rooms = NameMap('Room', Room.objects, 'project', 'name')
+
+        def cabinet(row):
+            project_id = projects[row['Project']]
+            return Cabinet(
+                project_id=project_id,
+                specification_id=specs[project_id, row['Spec']],
+                room_id=rooms[project_id, row['Room']],
+                cabinet_number=row['Cab_No'],
+                width=row['Width'],
+                height=row['Height'],
+                depth=row['Depth'],
+                number_of_doors=row['Num_Doors'],
+                number_of_shelves=row['Num_Shelves'],
+                finished_interior=_flag(row['Fin_Interior']),
+                finished_left_end=_flag(row['Fin_Left']),
+                finished_right_end=_flag(row['Fin_Right']),
+                finished_top=_flag(row['Fin_Top']),
+                finished_bottom=_flag(row['Fin_Bottom']),
+            )
+        self.load(Cabinet, 'dummy_cabinets.csv', cabinet)
+        # carry each Project's numbering on from its highest cabinet
+        CabinetCounter.objects.bulk_create([
+            CabinetCounter(project_id=project_id, last_number=number)
+            for project_id, number in Cabinet.objects.values_list(
+                'project').annotate(Max('cabinet_number')).order_by()
+        ])
+        cabinets = NameMap(
+            'Cabinet', Cabinet.objects, 'project', 'cabinet_number')
+
+        self.load(Drawer, 'dummy_drawers.csv', lambda row: Drawer(
+            cabinet_id=cabinets[projects[row['Project']], int(row['Cab_No'])],
+            height=row['Height'],
+            material_id=materials[row['Material']],
+        ))
 
-        Account.objects.all().delete()
-        Project.objects.all().delete()
-        Material.objects.all().delete()
-        Hardware.objects.all().delete()
-        Labor.objects.all().delete()
-
-        with open('dummy_data/dummy_accounts.csv') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                p = Account(
-                    name=row['\ufeffName'],
-                    billing_address=row['Address'],
-                    billing_phone=row['Phone'],
-                    billing_email=row['Email'],
-                    contact_name=row['Contact'],
-                    discount=row['Discount'],
-                )
-                p.save()
-
-        with open('dummy_data/dummy_projects.csv') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                account = Account.objects.get(name=row['Account'])
-                p = Project(
-                    name=row['\ufeffName'],
-                    physical_address=row['Address'],
-                    site_contact=row['Contact'],
-                    contact_phone=row['Phone'],
-                    contact_email=row['Email'],
-                    hourly_rate=row['Rate'],
-                    account=account,
-                )
-                p.save()
-
-        with open('dummy_data/dummy_materials.csv') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                p = Material(
-                    name=row['\ufeffName'],
-                    description=row['Description'],
-                    thickness=row['Thickness'],
-                    width=row['Width'],
-                    length=row['Length'],
-                    sheet_cost=row['Sheet_Cost'],
-                    waste_factor=row['Waste_Factor'],
-                    markup=row['Markup'],
-                )
-                p.save()
-
-        with open('dummy_data/dummy_hardware.csv') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                p = Hardware(
-                    name=row['\ufeffName'],
-                    cost_per=row['Cost_Per'],
-                    unit_type=row['Unit'],
-                    markup=row['Markup'],
-                )
-                p.save()
-
-        with open('dummy_data/dummy_labor.csv') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                p = Labor(
-                    item_name=row['\ufeffItem_Name'],
-                    minutes=row['Minutes'],
-                    unit_type=row['Units'],
-                )
-                p.save()
-
-        with open('dummy_data/dummy_specs.csv') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                project = Project.objects.get(name=row['Project'])
-                int_mat = Material.objects.get(name=row['Int_Material'])
-                ext_mat = Material.objects.get(name=row['Ext_Material'])
-                p = Specification(
-                    name=row['\ufeffName'],
-                    project=project,
-                    interior_material=int_mat,
-                    exterior_material=ext_mat,
-                )
-                p.save()
-
-        with open('dummy_data/dummy_rooms.csv') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                project = Project.objects.get(name=row['Project'])
-                p = Room(
-                    project=project,
-                    name=row['Room']
-                )
-                p.save()
-
-        with open('dummy_data/dummy_cabinets.csv') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                project = Project.objects.get(name=row['\ufeffProject'])
-                spec = Specification.objects.filter(
-                    name=row['Spec'],
-                    project=project
-                )[0]
-                room = Room.objects.filter(
-                    project=project,
-                    name=row['Room']
-                )[0]
-                fin_int = True if row['Fin_Interior'] == 'True' else False
-                fin_left = True if row['Fin_Interior'] == 'True' else False
-                fin_right = True if row['Fin_Interior'] == 'True' else False
-                fin_top = True if row['Fin_Interior'] == 'True' else False
-                fin_bot = True if row['Fin_Interior'] == 'True' else False
-                p = Cabinet(
-                    project=project,
-                    specification=spec,
-                    room=room,
-                    cabinet_number=row['Cab_No'],
-                    width=row['Width'],
-                    height=row['Height'],
-                    depth=row['Depth'],
-                    number_of_doors=row['Num_Doors'],
-                    number_of_shelves=row['Num_Shelves'],
-                    finished_interior=fin_int,
-                    finished_left_end=fin_left,
-                    finished_right_end=fin_right,
-                    finished_top=fin_top,
-                    finished_bottom=fin_bot,
-                )
-                p.save()
-
-        with open('dummy_data/dummy_drawers.csv') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                project = Project.objects.get(name=row['\ufeffProject'])
-                cabinet = Cabinet.objects.filter(
-                    project=project,
-                    cabinet_number=row['Cab_No']
-                )[0]
-                material = Material.objects.get(name=row['Material'])
-                p = Drawer(
-                    cabinet=cabinet,
-                    height=row['Height'],
-                    material=material,
-                )
-                p.save()
+    def rebuild_prices(self):
+        started = time.perf_counter()
+        with rate_scope():
+            count = rebuild_all_projects()
+        self.stdout.write(
+            f'{"stored prices":<16} {count:>9,} projects '
+            f'{time.perf_counter() - started:>7.2f} s')
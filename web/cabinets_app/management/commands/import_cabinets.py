@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from cabinets_app.cabinet_import import (
+    IMPORT_BATCH_SIZE, ScheduleError, import_schedule, read_schedule
+)
+from cabinets_app.models import Room
+
+
+class Command(BaseCommand):
+    help = ('Import a cabinet schedule, from a .csv or .xlsx file, into a '
+            'Room. Bad rows are reported and skipped.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('room', type=int, help='Room id')
+        parser.add_argument('schedule', help='.csv or .xlsx file')
+        parser.add_argument(
+            '--batch-size', type=int, default=IMPORT_BATCH_SIZE,
+            help='Rows validated and inserted at a time '
+                 '(default %(default)s)')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Check the schedule and roll the import back')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        try:
+            room = Room.objects.select_related('project').get(
+                pk=options['room'])
+        except Room.DoesNotExist:
+            raise CommandError(f'No Room {options["room"]}')
+        try:
+            with open(options['schedule'], 'rb') as f:
+                result = import_schedule(
+                    room, read_schedule(f, options['schedule']),
+                    options['batch_size'], options['dry_run'])
+        except (OSError, ScheduleError) as e:
+            raise CommandError(e)
+
+        for error in result.errors:
+            self.stderr.write(
+                f'row {error.row}: {error.field}: {error.message}')
+        if options['dry_run']:
+            self.stdout.write('Dry run; nothing was saved')
+        self.stdout.write(str(result))
@@ -0,0 +1,122 @@
+import csv
+import os
+import sys
+import time
+from decimal import Decimal
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from cabinets_app.cutlist import DEFAULT_KERF, collect_panels, pack
+from cabinets_app.models import Material, Project, Room
+from cabinets_app.price_core import hundredths
+from cabinets_app.pricing import prefetch_rooms
+
+
+def _nest(material_id, panels, sheet_length, sheet_width, kerf, grain):
+    """ Pack one Material's panels in a worker process
+    """
+    started = time.perf_counter()
+    cut_list = pack(panels, sheet_length, sheet_width, kerf, grain)
+    return material_id, cut_list, time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = ('Nest the panels of several Projects onto sheets, one process '
+            'per Material, and write the placements as CSV')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'output', help='CSV file to write, or - for standard output')
+        parser.add_argument(
+            '--project', type=int, action='append', dest='projects',
+            help='Only this Project id (may be repeated); default all')
+        parser.add_argument(
+            '--kerf', type=float, default=float(DEFAULT_KERF),
+            help='Saw kerf in inches (default %(default)s)')
+        parser.add_argument(
+            '--grain', action='store_true',
+            help='Keep every panel lengthwise on the sheet')
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Worker processes (default one per CPU)')
+
+    def handle(self, *args, **options):
+        projects = Project.objects.all()
+        if options['projects']:
+            projects = projects.filter(pk__in=options['projects'])
+            missing = set(options['projects']) - set(
+                projects.values_list('pk', flat=True))
+            if missing:
+                raise CommandError(f'No Project {missing.pop()}')
+        if options['kerf'] < 0:
+            raise CommandError('--kerf cannot be negative')
+        if options['workers'] < 1:
+            raise CommandError('--workers must be at least 1')
+
+        started = time.perf_counter()
+        rooms = prefetch_rooms(Room.objects.filter(project__in=projects))
+        panels = collect_panels(rooms)
+        materials = Material.objects.in_bulk(panels)
+        kerf = hundredths(options['kerf'])
+        # the workers only pack; they must not share this process's
+        # database connections
+        connections.close_all()
+
+        # with the CSV on standard output, the summary goes to stderr
+        if options['output'] == '-':
+            output, summary = sys.stdout, self.stderr
+        else:
+            output = open(options['output'], 'w', newline='')
+            summary = self.stdout
+        sheets = 0
+        try:
+            writer = csv.writer(output)
+            writer.writerow([
+                'material', 'sheet', 'panel', 'x', 'y', 'width', 'length',
+                'rotated'])
+            with ProcessPoolExecutor(
+                    max_workers=options['workers'],
+                    initializer=django.setup) as pool:
+                # largest groups first, so no worker is left with a big
+                # one at the end
+                futures = [
+                    pool.submit(
+                        _nest, material.id, panels[material.id],
+                        hundredths(material.length),
+                        hundredths(material.width),
+                        kerf, options['grain'])
+                    for material in sorted(
+                        materials.values(),
+                        key=lambda m: len(panels[m.id]), reverse=True)
+                ]
+                for future in as_completed(futures):
+                    material_id, cut_list, seconds = future.result()
+                    material = materials[material_id]
+                    self.write_rows(writer, material, cut_list)
+                    output.flush()
+                    sheets += cut_list.sheet_count
+                    summary.write(
+                        f'{material.name:<30} {cut_list.panel_count:>7,} '
+                        f'panels {cut_list.sheet_count:>5,} sheets '
+                        f'{cut_list.utilization:>6.1%} yield '
+                        f'{seconds * 1000:>9.1f} ms')
+                    for panel in cut_list.oversize:
+                        summary.write(
+                            f'  too large for a sheet: {panel.label}')
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        summary.write(
+            f'{len(materials)} materials, {sheets:,} sheets in '
+            f'{time.perf_counter() - started:.2f} s')
+
+    def write_rows(self, writer, material, cut_list):
+        for number, sheet in enumerate(cut_list.sheets, 1):
+            writer.writerows(
+                [material.name, number, p.panel.label,
+                 *(Decimal(value).scaleb(-2)
+                   for value in (p.x, p.y, p.width, p.length)),
+                 int(p.rotated)]
+                for p in sheet.placements
+            )
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from cabinets_app.models import Project
+from cabinets_app.rates import rate_scope
+from cabinets_app.stored_prices import rebuild_project, verify_project
+
+
+class Command(BaseCommand):
+    help = ('Rebuild the stored price columns and verify them '
+            'against the live price properties')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--project', type=int, action='append', dest='projects',
+            help='Only this Project id (may be repeated)')
+        parser.add_argument(
+            '--verify-only', action='store_true',
+            help='Check the stored columns without rebuilding them')
+
+    def handle(self, *args, **options):
+        projects = Project.objects.all()
+        if options['projects']:
+            projects = projects.filter(pk__in=options['projects'])
+
+        mismatches = []
+        with rate_scope():
+            for project in projects:
+                if not options['verify_only']:
+                    rebuild_project(project)
+                    project.refresh_from_db()
+                mismatches += verify_project(project)
+
+        for obj, stored, live in mismatches:
+            self.stderr.write(f'{obj!r}: stored {stored}, live {live}')
+        if mismatches:
+            raise CommandError(f'{len(mismatches)} stored values are wrong')
+        self.stdout.write(f'{projects.count()} projects verified')
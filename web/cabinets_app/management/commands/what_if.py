@@ -0,0 +1,91 @@
+import time
+from decimal import Decimal, InvalidOperation
+from django.core.management.base import BaseCommand, CommandError
+from cabinets_app.cost_model import CostInputs
+from cabinets_app.models import Material, Project
+from cabinets_app.price_cache import cached_cost_models
+from cabinets_app.rates import rate_scope
+
+
+class Command(BaseCommand):
+    help = ('Show what Project totals would be with different material '
+            'costs, hourly rate, labor minutes or hinge cost')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--project', type=int, action='append', dest='projects',
+            help='Only this Project id (may be repeated); default all')
+        parser.add_argument(
+            '--material', nargs=2, action='append', default=[],
+            metavar=('NAME', 'PERCENT'),
+            help='Change the cost of Materials with this name by PERCENT, '
+                 'e.g. --material "Select Cherry" 8')
+        parser.add_argument(
+            '--hourly-rate', type=Decimal,
+            help='Quote every Project at this hourly rate')
+        parser.add_argument(
+            '--labor', nargs=2, action='append', default=[],
+            metavar=('ITEM', 'MINUTES'),
+            help='Use MINUTES for a Labor item, e.g. --labor Door 45')
+        parser.add_argument(
+            '--hinge-cost', type=Decimal,
+            help='Use this cost per hinge')
+
+    def handle(self, *args, **options):
+        projects = Project.objects.all()
+        if options['projects']:
+            projects = projects.filter(pk__in=options['projects'])
+        projects = list(projects)
+
+        materials = {}
+        for name, percent in options['material']:
+            try:
+                factor = 1 + Decimal(percent) / 100
+            except InvalidOperation:
+                factor = None
+            if factor is None or not factor.is_finite():
+                raise CommandError(
+                    f'--material {name!r}: bad PERCENT {percent!r}')
+            ids = Material.objects.filter(name=name).values_list(
+                'pk', flat=True)
+            if not ids:
+                raise CommandError(f'No Material named {name!r}')
+            for pk in ids:
+                materials[pk] = factor
+        labor_minutes = {}
+        for item, minutes in options['labor']:
+            try:
+                labor_minutes[item] = int(minutes)
+            except ValueError:
+                raise CommandError(
+                    f'--labor {item!r}: bad MINUTES {minutes!r}')
+
+        with rate_scope():
+            models = cached_cost_models(projects)
+            current = CostInputs.load(list(models.values()))
+        changed = current.what_if(
+            materials=materials,
+            hourly_rate=options['hourly_rate'],
+            labor_minutes=labor_minutes,
+            hinge_cost=options['hinge_cost'],
+        )
+
+        started = time.perf_counter()
+        rows = [
+            (project, models[project.id].price(current),
+             models[project.id].price(changed))
+            for project in projects
+        ]
+        elapsed = time.perf_counter() - started
+
+        for project, before, after in rows:
+            self.stdout.write(
+                f'{project.name:<30} {before:>12,.2f} {after:>12,.2f} '
+                f'{after - before:>+12,.2f}')
+        before = sum((row[1] for row in rows), Decimal(0))
+        after = sum((row[2] for row in rows), Decimal(0))
+        self.stdout.write(
+            f'{"Total":<30} {before:>12,.2f} {after:>12,.2f} '
+            f'{after - before:>+12,.2f}')
+        self.stdout.write(
+            f'{len(rows)} projects evaluated in {elapsed * 1000:.2f} ms')
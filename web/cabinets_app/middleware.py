@@ -0,0 +1,122 @@
+import logging
+import threading
+import time
+from contextlib import ExitStack
+from django.conf import settings
+from django.db import connections
+from .rates import rate_scope
+
+logger = logging.getLogger(__name__)
+
+
+class RateTableMiddleware:
+    """ Load Labor and Hardware rates at most once per request
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, req):
+        with rate_scope():
+            return self.get_response(req)
+
+
+class QueryCounter:
+    """ Database execute wrapper counting queries and their time
+    """
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+class ViewQueryStats:
+    """ Requests, queries and database time per URL name, for this process
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def add(self, url_name, queries, seconds):
+        with self._lock:
+            requests, total, db_seconds, most = self._stats.get(
+                url_name, (0, 0, 0, 0))
+            self._stats[url_name] = (
+                requests + 1, total + queries, db_seconds + seconds,
+                max(most, queries))
+
+    def get(self, url_name):
+        """ Return (requests, queries, database seconds, most queries in
+        one request) for a URL name
+        """
+        with self._lock:
+            return self._stats.get(url_name, (0, 0, 0, 0))
+
+    def clear(self):
+        with self._lock:
+            self._stats.clear()
+
+
+view_query_stats = ViewQueryStats()
+
+
+class ServerTimingMiddleware:
+    """ Send QueryTimingMiddleware's counts in a Server-Timing header
+    Only with DEBUG on, or to staff users, since the header shows
+    backend internals to the client. Goes just before
+    QueryTimingMiddleware in MIDDLEWARE.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, req):
+        res = self.get_response(req)
+        timing = getattr(req, 'query_timing', None)
+        if timing is None or not self.may_see(req):
+            return res
+        count, seconds, total = timing
+        res['Server-Timing'] = (
+            f'db;desc="{count} queries";dur={seconds * 1000:.1f}, '
+            f'total;dur={total * 1000:.1f}')
+        return res
+
+    def may_see(self, req):
+        if settings.DEBUG:
+            return True
+        user = getattr(req, 'user', None)
+        return user is not None and user.is_staff
+
+
+class QueryTimingMiddleware:
+    """ Count each request's queries and database time
+    They are added to view_query_stats under the URL name and to the log
+    at DEBUG level, and left on the request as query_timing for
+    ServerTimingMiddleware. Goes near the top of MIDDLEWARE so the
+    session and user queries are counted too.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, req):
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            res = self.get_response(req)
+        total = time.perf_counter() - started
+        match = getattr(req, 'resolver_match', None)
+        url_name = match.url_name if match else None
+        view_query_stats.add(url_name, counter.count, counter.seconds)
+        logger.debug(
+            '%s %s: %d queries, %.1f ms in the database, %.1f ms in all',
+            req.method, url_name or req.path, counter.count,
+            counter.seconds * 1000, total * 1000)
+        req.query_timing = (counter.count, counter.seconds, total)
+        return res
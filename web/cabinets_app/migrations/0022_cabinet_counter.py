@@ -0,0 +1,52 @@
+# Generated by Django 2.2 on 2026-10-18 21:05
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+import django.db.models.deletion
+
+
+def number_cabinets(apps, schema_editor):
+    """ Give duplicated cabinet numbers new numbers at the end of their
+    Project, then start each Project's counter at its highest number
+    """
+    Cabinet = apps.get_model('cabinets_app', 'Cabinet')
+    CabinetCounter = apps.get_model('cabinets_app', 'CabinetCounter')
+    highest = dict(Cabinet.objects.values_list('project').annotate(
+        Max('cabinet_number')).order_by())
+    duplicates = Cabinet.objects.values_list(
+        'project', 'cabinet_number').annotate(
+        count=Count('pk')).filter(count__gt=1).order_by()
+    for project_id, number, count in duplicates:
+        # the first cabinet keeps the number
+        for cabinet in Cabinet.objects.filter(
+                project_id=project_id,
+                cabinet_number=number).order_by('pk')[1:]:
+            highest[project_id] += 1
+            cabinet.cabinet_number = highest[project_id]
+            cabinet.save(update_fields=['cabinet_number'])
+    CabinetCounter.objects.bulk_create([
+        CabinetCounter(project_id=project_id, last_number=number)
+        for project_id, number in highest.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cabinets_app', '0021_stored_prices'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CabinetCounter',
+            fields=[
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='cabinet_counter', serialize=False, to='cabinets_app.Project')),
+                ('last_number', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(number_cabinets, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cabinet',
+            constraint=models.UniqueConstraint(fields=('project', 'cabinet_number'), name='unique_cabinet_number'),
+        ),
+    ]
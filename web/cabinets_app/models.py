@@ -1,8 +1,55 @@
 from django.db import models
+from django.db.models import (
+    Case, F, Func, OuterRef, Q, Subquery, Sum, Value, When
+)
+from django.db.models.functions import Coalesce, Round
 from django.utils import timezone
 from datetime import datetime
 from django.contrib.auth.models import User
 from decimal import Decimal
+from .parts import box_parts, drawer_parts
+from .price_core import (
+    body_cents, drawer_area_cents, hundredths, material_cost, to_dollars
+)
+
+
+class Divide(Func):
+    """ Division that never truncates, even when both operands are integers
+    """
+    output_field = models.DecimalField()
+
+    def as_sql(self, compiler, connection, cast='NUMERIC', **extra_context):
+        lhs, rhs = self.get_source_expressions()
+        lhs_sql, lhs_params = compiler.compile(lhs)
+        rhs_sql, rhs_params = compiler.compile(rhs)
+        sql = f'(CAST({lhs_sql} AS {cast}) / {rhs_sql})'
+        return sql, [*lhs_params, *rhs_params]
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, cast='REAL')
+
+
+def sq_ft_cost_expression(material):
+    """ Material.sq_ft_cost as an expression, for the Material at the
+    lookup path given, e.g. 'specification__interior_material'
+    """
+    return Divide(
+        F(f'{material}__sheet_cost') * 144 * (1 + F(f'{material}__markup')),
+        F(f'{material}__width') * F(f'{material}__length')
+    )
+
+
+def labor_hours_expression(item_name):
+    """ Hours of Labor for an item, looked up by Subquery
+    """
+    minutes = Labor.objects.filter(item_name=item_name).values('minutes')
+    return Divide(Subquery(minutes[:1]), Value(60))
+
+
+def round_to_cents(expression):
+    """ Round a dollar expression to cents, as price_core does
+    """
+    return Divide(Round(expression * 100), Value(100))
 
 
 class Account(models.Model):
@@ -48,6 +95,15 @@ class Material(models.Model):
         after_markup = before_markup + (before_markup * self.markup)
         return after_markup
 
+    @property
+    def area_cost(self):
+        """ Exact cost in cents per hundredth of an inch squared, as a
+        (numerator, denominator) pair for price_core
+        """
+        return material_cost(
+            hundredths(self.sheet_cost), hundredths(self.markup),
+            hundredths(self.width), hundredths(self.length))
+
     class Meta:
         ordering = ('name',)
 
@@ -110,6 +166,126 @@ class Labor(models.Model):
         return f'{self.item_name}'
 
 
+class CabinetQuerySet(models.QuerySet):
+    def with_names(self):
+        """ Load each Cabinet's Room and Specification in the same query,
+        for listings that show their names
+        """
+        return self.select_related('room', 'specification')
+
+    def with_price(self):
+        """ Annotate each Cabinet with calculated_price, computed by the
+        database with the same formula and rounding points as Cabinet.price
+        """
+        waste = Value(Decimal('1.2'))
+        interior = sq_ft_cost_expression(
+            'specification__interior_material') * waste
+        exterior = sq_ft_cost_expression(
+            'specification__exterior_material') * waste
+        finished_interior = Q(finished_interior=True)
+
+        def panel(area, finished):
+            return Case(
+                When(finished, then=area * exterior),
+                default=area * interior,
+                output_field=models.DecimalField()
+            )
+
+        vertical = Divide(F('height') * F('depth'), Value(144))
+        horizontal = Divide(F('width') * F('depth'), Value(144))
+        face_back = Divide(F('width') * F('height'), Value(144))
+        cabinet_material_price = (
+            panel(vertical, finished_interior | Q(finished_left_end=True)) +
+            panel(vertical, finished_interior | Q(finished_right_end=True)) +
+            panel(horizontal, finished_interior | Q(finished_top=True)) +
+            panel(horizontal, finished_interior | Q(finished_bottom=True)) +
+            panel(face_back, finished_interior) +
+            F('number_of_shelves') * panel(horizontal, finished_interior)
+        )
+
+        labor_rate = F('project__hourly_rate')
+        hinges = Hardware.objects.filter(name='Blum 110+ Hinge')
+        per_hinge_cost = Subquery(hinges.values('cost_per')[:1])
+        total_hinge_price = F('number_of_doors') * per_hinge_cost * 2
+
+        drawers = Drawer.objects.filter(
+            cabinet=OuterRef('pk')).order_by().values('cabinet')
+        drawer_area = Divide(
+            2 * F('cabinet__depth') * F('height') +
+            2 * F('cabinet__width') * F('height') +
+            F('cabinet__width') * F('cabinet__depth'),
+            Value(144)
+        )
+        drawer_price = Sum(round_to_cents(
+            drawer_area * sq_ft_cost_expression('material') +
+            labor_hours_expression('Drawer') *
+            F('cabinet__project__hourly_rate')
+        ))
+        total_drawer_price = Coalesce(
+            Subquery(
+                drawers.annotate(total=drawer_price).values('total'),
+                output_field=models.DecimalField()
+            ),
+            Value(0)
+        )
+
+        body_price = (
+            cabinet_material_price +
+            labor_hours_expression('Cabinet') * labor_rate +
+            total_hinge_price +
+            face_back * exterior +
+            labor_hours_expression('Door') * labor_rate * F('number_of_doors')
+        )
+        price = round_to_cents(body_price) + total_drawer_price
+        return self.annotate(calculated_price=models.ExpressionWrapper(
+            price, output_field=models.DecimalField()))
+
+
+class RoomQuerySet(models.QuerySet):
+    def with_counts(self):
+        """ Annotate each Room with cabinet_total and drawer_total, counted
+        in the same query as the Rooms
+        """
+        return self.annotate(
+            cabinet_total=models.Count('cabinets', distinct=True),
+            drawer_total=models.Count('cabinets__drawers'),
+        )
+
+    def with_price(self):
+        """ Annotate each Room with calculated_price, the database-side
+        sum of Cabinet.objects.with_price()
+        """
+        cabinets = Cabinet.objects.with_price().filter(
+            room=OuterRef('pk')).order_by().values('room')
+        return self.annotate(calculated_price=Coalesce(
+            Subquery(
+                cabinets.annotate(
+                    total=Sum('calculated_price')).values('total'),
+                output_field=models.DecimalField()
+            ),
+            Value(0),
+            output_field=models.DecimalField()
+        ))
+
+
+class ProjectQuerySet(models.QuerySet):
+    def with_price(self):
+        """ Annotate each Project with calculated_price, the database-side
+        sum of Cabinet.objects.with_price() over its Rooms
+        """
+        cabinets = Cabinet.objects.with_price().filter(
+            room__project=OuterRef('pk')).order_by().values('room__project')
+        return self.annotate(calculated_price=Coalesce(
+            Subquery(
+                cabinets.annotate(
+                    total=Sum('calculated_price')).values('total'),
+                output_field=models.DecimalField()
+            ),
+            Value(0),
+            output_field=models.DecimalField()
+        ))
+
+
 class Project(models.Model):
     """ Defines a Project within an Account
     """
@@ -124,14 +300,19 @@ class Project(models.Model):
     contact_phone = models.CharField(max_length=32)
     contact_email = models.EmailField(max_length=256)
     hourly_rate = models.DecimalField(max_digits=6, decimal_places=2)
+    stored_price = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        editable=False
+    )
+
+    objects = ProjectQuerySet.as_manager()
 
     @property
     def price(self):
-        rooms = Room.objects.filter(project=self)
-        project_total = 0
-        for room in rooms:
-            project_total += room.price
-        return project_total
+        from .pricing import price_project
+        return price_project(self).total
 
     class Meta:
         ordering = ('name',)
@@ -152,22 +333,25 @@ class Room(models.Model):
         on_delete=models.CASCADE,
         related_name='rooms'
     )
+    stored_price = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        editable=False
+    )
+    stored_drawer_count = models.IntegerField(default=0, editable=False)
+
+    objects = RoomQuerySet.as_manager()
 
     @property
     def price(self):
-        cabinets = Cabinet.objects.filter(room=self)
-        room_total = 0
-        for cabinet in cabinets:
-            room_total += cabinet.price
-        return room_total
+        from .pricing import prefetch_rooms, price_rooms
+        rooms = prefetch_rooms(Room.objects.filter(pk=self.pk))
+        return price_rooms(rooms).total
 
     @property
     def drawer_count(self):
-        cabinets = Cabinet.objects.filter(room=self)
-        count = 0
-        for cab in cabinets:
-            count += cab.drawers.count()
-        return count
+        return Drawer.objects.filter(cabinet__room=self).count()
 
     class Meta:
         ordering = ('name',)
@@ -280,60 +464,51 @@ class Cabinet(models.Model):
     finished_right_end = models.BooleanField(default=False)
     finished_top = models.BooleanField(default=False)
     finished_bottom = models.BooleanField(default=False)
+    stored_price = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        editable=False
+    )
+
+    objects = CabinetQuerySet.as_manager()
 
     @property
     def price(self):
-
-        labor_rate = self.project.hourly_rate
-
-        vertical = self.height * self.depth / 144
-        horizontal = self.width * self.depth / 144
-        face_back = self.width * self.height / 144
-        int_waste = Decimal.from_float(1.2)
-        ext_waste = Decimal.from_float(1.2)
-        int_sq_ft_cost = self.specification.interior_material.sq_ft_cost * int_waste
-        ext_sq_ft_cost = self.specification.exterior_material.sq_ft_cost * ext_waste
-
-        left_side = vertical * ext_sq_ft_cost if self.finished_left_end else vertical * int_sq_ft_cost
-        right_side = vertical * ext_sq_ft_cost if self.finished_right_end else vertical * int_sq_ft_cost
-        top = horizontal * ext_sq_ft_cost if self.finished_top else horizontal * int_sq_ft_cost
-        bottom = horizontal * ext_sq_ft_cost if self.finished_bottom else horizontal * int_sq_ft_cost
-
-        if self.finished_interior:
-            left_side = vertical * ext_sq_ft_cost
-            right_side = vertical * ext_sq_ft_cost
-            top = horizontal * ext_sq_ft_cost
-            bottom = horizontal * ext_sq_ft_cost
-            back = face_back * ext_sq_ft_cost
-            shelves = horizontal * ext_sq_ft_cost
-        else:
-            shelves = horizontal * int_sq_ft_cost
-            back = face_back * int_sq_ft_cost
-
-        cabinet_material_price = left_side + right_side + top + bottom + back + (self.number_of_shelves * shelves)
-
-        cabinet_labor_price = Decimal(Labor.objects.get(item_name='Cabinet').minutes / 60) * labor_rate
-
-        per_hinge_cost = Hardware.objects.get(name='Blum 110+ Hinge').cost_per
-        hinges_per_door = 2
-        total_hinge_price = self.number_of_doors * per_hinge_cost * hinges_per_door
-
-        door_material_price = face_back * ext_sq_ft_cost
-
-        per_door_labor_cost = Decimal(Labor.objects.get(item_name='Door').minutes / 60) * labor_rate
-        total_door_labor_price = per_door_labor_cost * self.number_of_doors
-
-        drawers = Drawer.objects.filter(cabinet=self)
-        total_drawer_price = 0
-        for drawer in drawers:
-            total_drawer_price += drawer.price
-
-        total_price = cabinet_material_price + cabinet_labor_price + total_hinge_price + door_material_price + total_door_labor_price + total_drawer_price
-
-        return total_price
+        from .pricing import price_cabinet
+        return price_cabinet(self)
+
+    def calculate_body_price(self, rates, interior=None, exterior=None):
+        """ Price of the box, doors and hinges, without drawers
+        rates is a RateTable. The interior and exterior Materials default
+        to the Specification's. Panel areas come from the parts list;
+        the price is computed exactly by price_core and rounded to cents.
+        """
+        if interior is None:
+            interior = self.specification.interior_material
+        if exterior is None:
+            exterior = self.specification.exterior_material
+        interior_area, exterior_area = box_parts(self).areas()
+        body = body_cents(
+            interior_area=interior_area,
+            exterior_area=exterior_area,
+            doors=self.number_of_doors,
+            interior=interior.area_cost,
+            exterior=exterior.area_cost,
+            cabinet_minutes=rates.labor_minutes('Cabinet'),
+            door_minutes=rates.labor_minutes('Door'),
+            hinge_cost=hundredths(rates.hardware_cost('Blum 110+ Hinge')),
+            rate=hundredths(self.project.hourly_rate),
+        )
+        return to_dollars(body)
 
     class Meta:
         ordering = ('cabinet_number',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=('project', 'cabinet_number'),
+                name='unique_cabinet_number'),
+        ]
 
     def __repr__(self):
         return f'<Cab No: {self.cabinet_number}>'
@@ -342,6 +517,22 @@ class Cabinet(models.Model):
         return f'Cab No: {self.cabinet_number}'
 
 
+class CabinetCounter(models.Model):
+    """ The last cabinet number handed out in a Project
+    Only cabinet_numbers.py should write to this.
+    """
+    project = models.OneToOneField(
+        Project,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='cabinet_counter'
+    )
+    last_number = models.IntegerField(default=0)
+
+    def __repr__(self):
+        return f'<Cabinet Counter: {self.project_id} {self.last_number}>'
+
+
 class Drawer(models.Model):
     """ Drawers for Cabinets
     """
@@ -360,20 +551,20 @@ class Drawer(models.Model):
 
     @property
     def price(self):
-        labor_rate = self.cabinet.project.hourly_rate
-
-        sides = self.cabinet.depth * self.height / 144
-        front_back = self.cabinet.width * self.height / 144
-        bottom = self.cabinet.width * self.cabinet.depth / 144
-
-        total_sq_ft = (2 * sides) + (2 * front_back) + bottom
-        drawer_material_price = total_sq_ft * self.material.sq_ft_cost
-
-        drawer_labor_price = Decimal(Labor.objects.get(item_name='Drawer').minutes / 60) * labor_rate
-
-        total_price = drawer_material_price + drawer_labor_price
-
-        return total_price
+        from .rates import get_rate_table
+        return self.calculate_price(get_rate_table())
+
+    def calculate_price(self, rates):
+        """ Price this drawer from a RateTable
+        Computed exactly by price_core and rounded to cents.
+        """
+        cents = drawer_area_cents(
+            area=drawer_parts(self).drawer_area(0),
+            material=self.material.area_cost,
+            minutes=rates.labor_minutes('Drawer'),
+            rate=hundredths(self.cabinet.project.hourly_rate),
+        )
+        return to_dollars(cents)
 
     class Meta:
         ordering = ('height',)
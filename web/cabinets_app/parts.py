@@ -0,0 +1,190 @@
+""" Parts lists: the panels a cabinet and its drawers are made of
+
+Pricing, cut lists and material takeoffs all need the same panels:
+sides, top, bottom, back, shelves and door face of the box, and the
+sides, front and back, and bottom of each drawer. A PartsList holds them
+as parallel arrays in price_core units (hundredths of an inch), built
+from the model fields once.
+
+PartsLists are memoized in an LRU keyed on the values they are built
+from: the cabinet's dimensions, shelves, finish flags and Specification
+Materials, and each drawer's height and Material. That is a key per
+revision of the cabinet; an edit produces a new key, and the old entry
+is never read again. Memoized PartsLists are shared, so callers must
+not change them.
+"""
+from array import array
+from collections import namedtuple
+from . import price_core
+from .memo import LRUMemo
+from .price_core import (
+    BACK, BOTTOM, DOOR, DRAWER_BOTTOM, DRAWER_FRONT_BACK, DRAWER_SIDE,
+    LEFT_SIDE, RIGHT_SIDE, SHELF, TOP, hundredths
+)
+
+
+PARTS_MEMO_SIZE = 4096
+
+# drawer index of the parts of the cabinet box itself
+BOX = -1
+
+PART_NAMES = {
+    LEFT_SIDE: 'Left Side',
+    RIGHT_SIDE: 'Right Side',
+    TOP: 'Top',
+    BOTTOM: 'Bottom',
+    BACK: 'Back',
+    SHELF: 'Shelf',
+    DOOR: 'Door Face',
+    DRAWER_SIDE: 'Drawer Side',
+    DRAWER_FRONT_BACK: 'Drawer Front/Back',
+    DRAWER_BOTTOM: 'Drawer Bottom',
+}
+
+Part = namedtuple(
+    'Part', 'kind length width quantity exterior material_id drawer')
+
+parts_memo = LRUMemo(PARTS_MEMO_SIZE)
+
+
+class PartsList:
+    """ Parallel arrays with one entry per part
+    kinds: a price_core part kind; lengths and widths: hundredths of an
+    inch; quantities; exterior: 1 when the part is cut from the exterior
+    Material; material_ids: the Material, 0 if there is none; drawers:
+    the index of the drawer the part belongs to, or BOX.
+    """
+    def __init__(self):
+        self.kinds = array('b')
+        self.lengths = array('q')
+        self.widths = array('q')
+        self.quantities = array('q')
+        self.exterior = array('b')
+        self.material_ids = array('q')
+        self.drawers = array('h')
+
+    def add(self, kind, length, width, quantity, exterior, material_id,
+            drawer=BOX):
+        self.kinds.append(kind)
+        self.lengths.append(length)
+        self.widths.append(width)
+        self.quantities.append(quantity)
+        self.exterior.append(exterior)
+        self.material_ids.append(material_id or 0)
+        self.drawers.append(drawer)
+
+    def extend(self, other, drawer=None):
+        """ Append another PartsList's parts, optionally as drawer
+        """
+        for part in other:
+            self.add(*part[:-1], part.drawer if drawer is None else drawer)
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __iter__(self):
+        return map(
+            Part, self.kinds, self.lengths, self.widths, self.quantities,
+            self.exterior, self.material_ids, self.drawers)
+
+    def areas(self):
+        """ Return (interior area, exterior area) of the box parts
+        """
+        interior_area = exterior_area = 0
+        for part in self:
+            if part.drawer != BOX:
+                continue
+            area = part.length * part.width * part.quantity
+            if part.exterior:
+                exterior_area += area
+            else:
+                interior_area += area
+        return interior_area, exterior_area
+
+    def drawer_area(self, drawer):
+        """ Total area of one drawer's parts
+        """
+        return sum(
+            part.length * part.width * part.quantity
+            for part in self if part.drawer == drawer
+        )
+
+    def material_areas(self):
+        """ Return a dict of Material id to total area, before waste
+        """
+        areas = {}
+        for part in self:
+            area = part.length * part.width * part.quantity
+            areas[part.material_id] = areas.get(part.material_id, 0) + area
+        return areas
+
+
+def _memoized(key, build):
+    parts = parts_memo.get(key)
+    if parts is None:
+        parts = build()
+        parts_memo.put(key, parts)
+    return parts
+
+
+def box_parts(cabinet):
+    """ PartsList of a Cabinet's box and door face
+    """
+    spec = cabinet.specification
+    interior_id = spec.interior_material_id if spec else None
+    exterior_id = spec.exterior_material_id if spec else None
+    finished = (
+        cabinet.finished_interior,
+        cabinet.finished_left_end,
+        cabinet.finished_right_end,
+        cabinet.finished_top,
+        cabinet.finished_bottom,
+    )
+    key = ('box', cabinet.width, cabinet.height, cabinet.depth,
+           cabinet.number_of_shelves, finished, interior_id, exterior_id)
+
+    def build():
+        parts = PartsList()
+        for kind, length, width, quantity, exterior in (
+                price_core.cabinet_parts(
+                    hundredths(cabinet.width), hundredths(cabinet.height),
+                    hundredths(cabinet.depth), cabinet.number_of_shelves,
+                    finished)):
+            if quantity:
+                parts.add(kind, length, width, quantity, exterior,
+                          exterior_id if exterior else interior_id)
+        return parts
+
+    return _memoized(key, build)
+
+
+def drawer_parts(drawer, cabinet=None):
+    """ PartsList of a Drawer's box, as drawer 0
+    cabinet defaults to drawer.cabinet.
+    """
+    if cabinet is None:
+        cabinet = drawer.cabinet
+    key = ('drawer', cabinet.width, cabinet.depth, drawer.height,
+           drawer.material_id)
+
+    def build():
+        parts = PartsList()
+        for kind, length, width, quantity in price_core.drawer_parts(
+                hundredths(cabinet.width), hundredths(cabinet.depth),
+                hundredths(drawer.height)):
+            parts.add(kind, length, width, quantity, False,
+                      drawer.material_id, 0)
+        return parts
+
+    return _memoized(key, build)
+
+
+def cabinet_parts(cabinet, drawers):
+    """ PartsList of a Cabinet's box and every one of its drawers
+    Drawers are numbered in the order given.
+    """
+    parts = PartsList()
+    parts.extend(box_parts(cabinet))
+    for index, drawer in enumerate(drawers):
+        parts.extend(drawer_parts(drawer, cabinet), drawer=index)
+    return parts
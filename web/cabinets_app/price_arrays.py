@@ -0,0 +1,247 @@
+""" Columnar (NumPy) pricing for large batches of cabinets
+
+Repricing thousands of cabinets one Decimal at a time is slow even once
+the queries are batched. Here the cabinet dimensions, finish flags,
+door/shelf counts and material costs are loaded into arrays and the
+Cabinet.price formula is evaluated for the whole batch at once in
+float64.
+
+Float results are rounded to cents half up at the same points as
+price_core: each drawer, then each cabinet body. A float can only round
+differently from the exact result when it lands within a hair of a half
+cent; those few drawers and bodies are repriced with the integer
+price_core functions, so every returned cent matches cabinet.price.
+"""
+from decimal import Decimal
+import numpy as np
+from .models import Cabinet, Drawer, Material
+from .price_core import cabinet_body_cents, drawer_cents, hundredths
+from .rates import get_rate_table
+
+
+# how close (in cents) to a half cent a float result must be before the
+# integer formula is used instead; float64 error here is around 1e-10
+HALF_CENT_TOLERANCE = 1e-6
+
+CABINET_COLUMNS = (
+    'id', 'room_id', 'room__project_id', 'project__hourly_rate',
+    'width', 'height', 'depth', 'number_of_doors', 'number_of_shelves',
+    'finished_interior', 'finished_left_end', 'finished_right_end',
+    'finished_top', 'finished_bottom',
+    'specification__interior_material_id',
+    'specification__exterior_material_id',
+)
+
+
+class PriceArrays:
+    """ Cabinet prices in whole cents, as parallel arrays
+    """
+    def __init__(self, ids, room_ids, project_ids, cents):
+        self.ids = ids
+        self.room_ids = room_ids
+        self.project_ids = project_ids
+        self.cents = cents
+
+    def prices(self):
+        """ Return a dict of Cabinet id to Decimal price
+        """
+        return {
+            int(pk): Decimal(int(cents)).scaleb(-2)
+            for pk, cents in zip(self.ids, self.cents)
+        }
+
+    def room_totals(self):
+        return _totals(self.room_ids, self.cents)
+
+    def project_totals(self):
+        return _totals(self.project_ids, self.cents)
+
+
+def _totals(keys, cents):
+    """ Sum cents by key, returning a dict of key to Decimal
+    """
+    unique, index = np.unique(keys, return_inverse=True)
+    sums = np.bincount(index, weights=cents, minlength=len(unique))
+    return {
+        int(key): Decimal(int(round(total))).scaleb(-2)
+        for key, total in zip(unique, sums)
+    }
+
+
+def sq_ft_costs(materials):
+    """ Return a dict of Material id to sq_ft_cost as a float
+    Follows the order of operations of Material.sq_ft_cost.
+    """
+    costs = {}
+    for m in materials.values():
+        sq_ft = (float(m.width) / 12) * (float(m.length) / 12)
+        before_markup = float(m.sheet_cost) / sq_ft
+        costs[m.id] = before_markup + before_markup * float(m.markup)
+    return costs
+
+
+def _lookup(costs, ids):
+    """ Map material ids to costs, NaN where the material is missing
+    """
+    return np.array([costs.get(pk, np.nan) for pk in ids], dtype=float)
+
+
+def round_to_cents(dollars, exact):
+    """ Round float dollars to whole cents, half up
+    NaN becomes 0. Elements within HALF_CENT_TOLERANCE of a half cent are
+    replaced by exact(i), the price_core result in cents for element i.
+    """
+    unpriceable = np.isnan(dollars)
+    scaled = np.where(unpriceable, 0, dollars) * 100
+    cents = np.floor(scaled + 0.5).astype(np.int64)
+    near_half = np.abs(scaled - np.floor(scaled) - 0.5) < HALF_CENT_TOLERANCE
+    for i in np.flatnonzero(near_half & ~unpriceable):
+        cents[i] = exact(i)
+    return cents
+
+
+def price_cabinet_arrays(cabinets, rates=None):
+    """ Price a Cabinet queryset in vectorized form
+    Loads cabinets, drawers and materials in three queries (plus the
+    RateTable). Cabinets that cannot be priced get 0, like the stored
+    prices.
+    """
+    rows = list(cabinets.order_by().values_list(*CABINET_COLUMNS))
+    if not rows:
+        empty = np.zeros(0, dtype=np.int64)
+        return PriceArrays(empty, empty, empty, empty)
+    if rates is None:
+        rates = get_rate_table()
+    columns = dict(zip(CABINET_COLUMNS, zip(*rows)))
+    ids = np.array(columns['id'], dtype=np.int64)
+    # by subquery, so any number of cabinets fits in one statement
+    drawers = list(Drawer.objects.filter(
+        cabinet__in=cabinets.order_by().values('pk')).values_list(
+            'cabinet_id', 'height', 'material_id'))
+    material_ids = (
+        set(columns['specification__interior_material_id']) |
+        set(columns['specification__exterior_material_id']) |
+        {material_id for _, _, material_id in drawers}
+    )
+    materials = Material.objects.in_bulk(material_ids - {None})
+    costs = sq_ft_costs(materials)
+
+    def floats(name):
+        return np.array(columns[name], dtype=float)
+
+    def flags(name):
+        return np.array(columns[name], dtype=bool)
+
+    def exact(name, i):
+        return hundredths(columns[name][i])
+
+    cabinet_minutes = rates.labor_minutes('Cabinet')
+    door_minutes = rates.labor_minutes('Door')
+    hinge_cost = rates.hardware_cost('Blum 110+ Hinge')
+
+    width, height, depth = floats('width'), floats('height'), floats('depth')
+    labor_rate = floats('project__hourly_rate')
+    doors = floats('number_of_doors')
+    shelves = floats('number_of_shelves')
+    finished_interior = flags('finished_interior')
+
+    vertical = height * depth / 144
+    horizontal = width * depth / 144
+    face_back = width * height / 144
+    int_sq_ft_cost = _lookup(
+        costs, columns['specification__interior_material_id']) * 1.2
+    ext_sq_ft_cost = _lookup(
+        costs, columns['specification__exterior_material_id']) * 1.2
+
+    def panel(area, finished):
+        cost = np.where(finished | finished_interior,
+                        ext_sq_ft_cost, int_sq_ft_cost)
+        return area * cost
+
+    cabinet_material_price = (
+        panel(vertical, flags('finished_left_end')) +
+        panel(vertical, flags('finished_right_end')) +
+        panel(horizontal, flags('finished_top')) +
+        panel(horizontal, flags('finished_bottom')) +
+        panel(face_back, False) +
+        shelves * panel(horizontal, False)
+    )
+    cabinet_labor_price = cabinet_minutes / 60 * labor_rate
+    total_hinge_price = doors * float(hinge_cost) * 2
+    door_material_price = face_back * ext_sq_ft_cost
+    total_door_labor_price = door_minutes / 60 * labor_rate * doors
+    body_price = (
+        cabinet_material_price + cabinet_labor_price + total_hinge_price +
+        door_material_price + total_door_labor_price
+    )
+
+    def exact_body(i):
+        return cabinet_body_cents(
+            width=exact('width', i),
+            height=exact('height', i),
+            depth=exact('depth', i),
+            doors=columns['number_of_doors'][i],
+            shelves=columns['number_of_shelves'][i],
+            finished=tuple(columns[name][i] for name in (
+                'finished_interior', 'finished_left_end',
+                'finished_right_end', 'finished_top', 'finished_bottom')),
+            interior=materials[
+                columns['specification__interior_material_id'][i]].area_cost,
+            exterior=materials[
+                columns['specification__exterior_material_id'][i]].area_cost,
+            cabinet_minutes=cabinet_minutes,
+            door_minutes=door_minutes,
+            hinge_cost=hundredths(hinge_cost),
+            rate=exact('project__hourly_rate', i),
+        )
+
+    cents = round_to_cents(body_price, exact_body)
+    unpriceable = np.isnan(body_price)
+
+    if drawers:
+        drawer_minutes = rates.labor_minutes('Drawer')
+        cabinet_ids, heights, drawer_material_ids = zip(*drawers)
+        position = np.searchsorted(
+            np.sort(ids), np.array(cabinet_ids, dtype=np.int64))
+        index = np.argsort(ids)[position]
+        drawer_heights = np.array(heights, dtype=float)
+        sides = depth[index] * drawer_heights / 144
+        front_back = width[index] * drawer_heights / 144
+        bottom = width[index] * depth[index] / 144
+        total_sq_ft = (2 * sides) + (2 * front_back) + bottom
+        drawer_price = (
+            total_sq_ft * _lookup(costs, drawer_material_ids) +
+            drawer_minutes / 60 * labor_rate[index]
+        )
+
+        def exact_drawer(j):
+            i = index[j]
+            return drawer_cents(
+                width=exact('width', i),
+                depth=exact('depth', i),
+                height=hundredths(heights[j]),
+                material=materials[drawer_material_ids[j]].area_cost,
+                minutes=drawer_minutes,
+                rate=exact('project__hourly_rate', i),
+            )
+
+        cents += np.bincount(
+            index, weights=round_to_cents(drawer_price, exact_drawer),
+            minlength=len(ids)).astype(np.int64)
+        unpriceable |= np.bincount(
+            index, weights=np.isnan(drawer_price),
+            minlength=len(ids)).astype(bool)
+
+    return PriceArrays(
+        ids,
+        np.array(columns['room_id'], dtype=np.int64),
+        np.array(columns['room__project_id'], dtype=np.int64),
+        np.where(unpriceable, 0, cents),
+    )
+
+
+def price_projects_arrays(projects):
+    """ Price every cabinet in a set of Projects in one batch
+    """
+    return price_cabinet_arrays(
+        Cabinet.objects.filter(room__project__in=projects))
@@ -0,0 +1,81 @@
+""" Shared cache of Project cost models
+
+A CostModel (see cost_model.py) is cached under a key made from the
+Project's revision number, bumped by any write to the Project or its
+Rooms, Specifications, Cabinets and Drawers. A Material price change
+only bumps the Projects that use the Material. A write never deletes
+cached models; it moves the revision on, so the old entries are simply
+never read again and expire.
+
+Each bump happens twice, once straight away and once when the
+transaction commits. The first keeps the writer from reading its own
+stale models; the second orphans anything another process built from
+the old rows while the transaction was open.
+
+Revisions never expire. If one is evicted anyway, it restarts from the
+current time in nanoseconds rather than from 0, so it cannot come back
+to a number that already has models cached under it.
+"""
+import time
+from django.core.cache import cache
+from django.db import transaction
+from .cost_model import build_cost_models
+
+
+PRICE_TIMEOUT = 60 * 60 * 24
+
+
+def project_revision(project_id):
+    return f'price:project-revision:{project_id}'
+
+
+def _revision(key):
+    value = cache.get(key)
+    if value is None:
+        cache.add(key, time.time_ns(), None)
+        value = cache.get(key)
+    return value
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def _bump_now_and_on_commit(key):
+    _bump(key)
+    transaction.on_commit(lambda: _bump(key))
+
+
+def bump_project(project_id):
+    """ Invalidate the cached cost model of a Project
+    """
+    if project_id is not None:
+        _bump_now_and_on_commit(project_revision(project_id))
+
+
+def cost_model_key(project_id):
+    return 'price:cost-model:{}:{}'.format(
+        project_id, _revision(project_revision(project_id)))
+
+
+def cached_cost_models(projects):
+    """ Return a dict of Project id to CostModel, building only those
+    whose Project changed since they were cached
+    A CostModel holds no catalog values, so only the Project revision
+    is in its key.
+    """
+    keys = {project.id: cost_model_key(project.id) for project in projects}
+    cached = cache.get_many(keys.values())
+    models = {
+        pk: cached[key] for pk, key in keys.items() if key in cached
+    }
+    missing = [project for project in projects if project.id not in models]
+    if missing:
+        built = build_cost_models(missing)
+        cache.set_many(
+            {keys[pk]: model for pk, model in built.items()}, PRICE_TIMEOUT)
+        models.update(built)
+    return models
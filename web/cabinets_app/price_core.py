@@ -0,0 +1,184 @@
+""" Exact fixed-point pricing core
+
+Everything is computed in integers:
+
+* lengths in hundredths of an inch (every dimension field has two
+  decimal places, so this is exact)
+* money in cents, markups in hundredths
+* labor in whole minutes, converted to money as minutes * rate / 60
+
+Areas are hundredths-of-an-inch squared, so a square foot is
+144 * 100 ** 2 units. A material's cost per unit of area is the exact
+ratio sheet_cost * (1 + markup) / sheet_area, kept as a numerator and a
+denominator, and cabinet panels include the 6/5 waste multiplier
+exactly.
+
+Rounding happens at two defined points, both half up to whole cents:
+
+1. each drawer's price
+2. each cabinet's body (box panels, doors, hinges and labor)
+
+A cabinet's price is its body plus its drawers, a room's is the sum of
+its cabinets and a project's the sum of its rooms; those sums are exact.
+
+Values come in from the models through hundredths() and go back out as
+two-place Decimals through to_dollars(). Nothing else converts.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+
+SQ_FT = 144 * 100 ** 2
+WASTE_NUMERATOR, WASTE_DENOMINATOR = 6, 5
+
+
+def hundredths(value):
+    """ Convert a dollar amount or length to whole hundredths
+    Accepts Decimal, int, float or str; floats go through str so that
+    22.5 becomes 2250, not 2249.
+    """
+    value = value if isinstance(value, Decimal) else Decimal(str(value))
+    return int((value * 100).to_integral_value(rounding=ROUND_HALF_UP))
+
+
+def to_dollars(cents):
+    """ Convert whole cents to a two-place Decimal
+    """
+    return Decimal(cents).scaleb(-2)
+
+
+def divide_half_up(numerator, denominator):
+    """ Integer division rounded half up, for a positive denominator
+    """
+    return (2 * numerator + denominator) // (2 * denominator)
+
+
+def material_cost(sheet_cost, markup, width, length):
+    """ Return (numerator, denominator): cents per hundredth-inch squared
+    All arguments are in hundredths, as from hundredths().
+    """
+    return sheet_cost * (100 + markup), 100 * width * length
+
+
+def labor_cents(minutes, rate):
+    """ Return (numerator, denominator): cents for minutes at rate cents
+    per hour
+    """
+    return minutes * rate, 60
+
+
+# part kinds, see cabinet_parts() and drawer_parts()
+(LEFT_SIDE, RIGHT_SIDE, TOP, BOTTOM, BACK, SHELF, DOOR,
+ DRAWER_SIDE, DRAWER_FRONT_BACK, DRAWER_BOTTOM) = range(10)
+
+
+def cabinet_parts(width, height, depth, shelves, finished):
+    """ The panels of a cabinet box, as (kind, length, width, quantity,
+    exterior) tuples
+    finished is a tuple of (interior, left, right, top, bottom) flags;
+    exterior parts use the exterior material. The doors are one face
+    covering the whole opening, whatever the number of doors.
+    """
+    finished_interior, left, right, top, bottom = finished
+    return (
+        (LEFT_SIDE, height, depth, 1, left or finished_interior),
+        (RIGHT_SIDE, height, depth, 1, right or finished_interior),
+        (TOP, width, depth, 1, top or finished_interior),
+        (BOTTOM, width, depth, 1, bottom or finished_interior),
+        (BACK, width, height, 1, finished_interior),
+        (SHELF, width, depth, shelves, finished_interior),
+        (DOOR, height, width, 1, True),
+    )
+
+
+def drawer_parts(width, depth, height):
+    """ The panels of a drawer box, as (kind, length, width, quantity)
+    tuples
+    width and depth are the cabinet's, height the drawer's.
+    """
+    return (
+        (DRAWER_SIDE, depth, height, 2),
+        (DRAWER_FRONT_BACK, width, height, 2),
+        (DRAWER_BOTTOM, width, depth, 1),
+    )
+
+
+def drawer_area(width, depth, height):
+    """ Area of a drawer box: two sides, front and back, and bottom
+    """
+    return sum(
+        length * part_width * quantity
+        for kind, length, part_width, quantity
+        in drawer_parts(width, depth, height)
+    )
+
+
+def cabinet_areas(width, height, depth, shelves, finished):
+    """ Return (interior area, exterior area) of a cabinet's panels and
+    doors, before waste
+    """
+    interior_area = exterior_area = 0
+    for kind, length, part_width, quantity, exterior in cabinet_parts(
+            width, height, depth, shelves, finished):
+        if exterior:
+            exterior_area += length * part_width * quantity
+        else:
+            interior_area += length * part_width * quantity
+    return interior_area, exterior_area
+
+
+def drawer_area_cents(area, material, minutes, rate):
+    """ Price of one drawer box of the given area in cents
+    material is a material_cost() pair, minutes the Labor minutes per
+    drawer and rate the hourly rate in cents.
+    """
+    material_num, material_den = material
+    labor_num, labor_den = labor_cents(minutes, rate)
+    return divide_half_up(
+        area * material_num * labor_den + labor_num * material_den,
+        material_den * labor_den
+    )
+
+
+def drawer_cents(width, depth, height, material, minutes, rate):
+    """ Price of one drawer box in cents
+    width and depth are the cabinet's, height the drawer's, in hundredths
+    of an inch; the rest is as for drawer_area_cents().
+    """
+    return drawer_area_cents(
+        drawer_area(width, depth, height), material, minutes, rate)
+
+
+def body_cents(interior_area, exterior_area, doors, interior, exterior,
+               cabinet_minutes, door_minutes, hinge_cost, rate):
+    """ Price of a cabinet without its drawers, in cents, from the areas
+    of its interior and exterior parts
+    interior and exterior are material_cost() pairs; hinge_cost and rate
+    are in cents.
+    """
+    int_num, int_den = interior
+    ext_num, ext_den = exterior
+    labor_num, labor_den = labor_cents(
+        cabinet_minutes + door_minutes * doors, rate)
+    material_den = int_den * ext_den * WASTE_DENOMINATOR
+    material_num = (
+        interior_area * int_num * ext_den +
+        exterior_area * ext_num * int_den
+    ) * WASTE_NUMERATOR
+    body = divide_half_up(
+        material_num * labor_den + labor_num * material_den,
+        material_den * labor_den
+    )
+    return body + doors * hinge_cost * 2
+
+
+def cabinet_body_cents(width, height, depth, doors, shelves, finished,
+                       interior, exterior, cabinet_minutes, door_minutes,
+                       hinge_cost, rate):
+    """ Price of a cabinet without its drawers, in cents
+    finished is as for cabinet_parts(); the rest is as for body_cents().
+    """
+    interior_area, exterior_area = cabinet_areas(
+        width, height, depth, shelves, finished)
+    return body_cents(
+        interior_area, exterior_area, doors, interior, exterior,
+        cabinet_minutes, door_minutes, hinge_cost, rate)
@@ -0,0 +1,164 @@
+""" Batched pricing for Projects, Rooms, Cabinets and Drawers
+
+The price properties on the models walk the object graph one row at a
+time. The functions here load a whole Project in a fixed number of
+queries and price every Room, Cabinet and Drawer in one pass, using the
+same formulas as the models so the totals are identical. Labor and
+Hardware rates come from the shared RateTable (see rates.py).
+
+Cabinets repeat: a kitchen is mostly the same few boxes. Cabinet and
+drawer prices are memoized in an LRU keyed on a canonical tuple of
+every value the price depends on (dimensions, counts, finish flags, the
+hourly rate, every rate in the RateTable and the price fields of each
+Material, with the drawer stack sorted), so each distinct box is only
+computed once per process. Because the key holds the values rather than
+row ids, a stale entry can never match; the signal handlers still clear
+the memo on Material, Labor and Hardware writes so old entries do not
+crowd out live ones.
+"""
+from django.db.models import Prefetch
+from .memo import LRUMemo
+from .models import Cabinet, Drawer, Room
+from .rates import get_rate_table
+
+
+PRICE_MEMO_SIZE = 4096
+
+price_memo = LRUMemo(PRICE_MEMO_SIZE)
+
+
+def material_key(material):
+    return (material.sheet_cost, material.markup,
+            material.width, material.length)
+
+
+def drawer_key(drawer):
+    return drawer.height, material_key(drawer.material)
+
+
+def cabinet_key(cabinet, drawer_keys, rates, materials=None):
+    """ Canonical tuple of every input to a cabinet's price
+    materials is an (interior, exterior) pair of Materials to use instead
+    of the Specification's.
+    """
+    if materials is None:
+        spec = cabinet.specification
+        materials = spec.interior_material, spec.exterior_material
+    interior, exterior = materials
+    return (
+        rates.key,
+        cabinet.project.hourly_rate,
+        cabinet.width, cabinet.height, cabinet.depth,
+        cabinet.number_of_doors, cabinet.number_of_shelves,
+        cabinet.finished_interior, cabinet.finished_left_end,
+        cabinet.finished_right_end, cabinet.finished_top,
+        cabinet.finished_bottom,
+        material_key(interior),
+        material_key(exterior),
+        tuple(sorted(drawer_keys)),
+    )
+
+
+def cabinet_prices(cabinet, drawers, rates, materials=None):
+    """ Return (body price, list of drawer prices) for a cabinet
+    Served from price_memo when an identical cabinet was priced before.
+    materials optionally replaces the Specification's, as in cabinet_key.
+    """
+    drawers = list(drawers)
+    drawer_keys = [drawer_key(drawer) for drawer in drawers]
+    key = cabinet_key(cabinet, drawer_keys, rates, materials)
+    prices = price_memo.get(key)
+    if prices is None:
+        prices = (
+            cabinet.calculate_body_price(rates, *(materials or ())),
+            {
+                drawer_keys[i]: drawer.calculate_price(rates)
+                for i, drawer in enumerate(drawers)
+            },
+        )
+        price_memo.put(key, prices)
+    body_price, drawer_prices = prices
+    return body_price, [drawer_prices[k] for k in drawer_keys]
+
+
+class ProjectPrice:
+    """ Price totals for a set of Rooms, keyed by primary key
+    """
+    def __init__(self):
+        self.total = 0
+        self.rooms = {}
+        self.cabinets = {}
+        self.drawers = {}
+
+    def price_of(self, obj):
+        """ Return the price of a Room, Cabinet or Drawer in this result
+        """
+        if isinstance(obj, Room):
+            return self.rooms[obj.id]
+        if isinstance(obj, Cabinet):
+            return self.cabinets[obj.id]
+        if isinstance(obj, Drawer):
+            return self.drawers[obj.id]
+        raise TypeError(f'Cannot price {obj!r}')
+
+
+def prefetch_rooms(rooms):
+    """ Attach cabinets, drawers, specifications and materials to a Room
+    queryset so pricing it needs no further queries
+    """
+    drawers = Drawer.objects.select_related('material')
+    cabinets = Cabinet.objects.select_related(
+        'project',
+        'specification__interior_material',
+        'specification__exterior_material',
+    ).prefetch_related(Prefetch('drawers', queryset=drawers))
+    return rooms.prefetch_related(Prefetch('cabinets', queryset=cabinets))
+
+
+def project_rooms(project):
+    """ Return the Rooms of a Project, prefetched for pricing
+    """
+    return prefetch_rooms(Room.objects.filter(project=project))
+
+
+def price_rooms(rooms, rates=None):
+    """ Price prefetched Rooms and everything in them
+    Unless rates are given, the RateTable is only fetched if there is at
+    least one cabinet.
+    """
+    result = ProjectPrice()
+    for room in rooms:
+        room_total = 0
+        for cabinet in room.cabinets.all():
+            if rates is None:
+                rates = get_rate_table()
+            room_total += _price_cabinet(
+                cabinet, cabinet.drawers.all(), rates, result)
+        result.rooms[room.id] = room_total
+        result.total += room_total
+    return result
+
+
+def price_project(project):
+    """ Price a whole Project in a fixed number of queries
+    """
+    return price_rooms(project_rooms(project))
+
+
+def price_cabinet(cabinet):
+    """ Price a single Cabinet, loading its drawers in one query
+    """
+    drawers = cabinet.drawers.select_related('material')
+    return _price_cabinet(cabinet, drawers, get_rate_table(), ProjectPrice())
+
+
+def _price_cabinet(cabinet, drawers, rates, result):
+    drawers = list(drawers)
+    body_price, drawer_prices = cabinet_prices(cabinet, drawers, rates)
+    total_drawer_price = 0
+    for drawer, drawer_price in zip(drawers, drawer_prices):
+        result.drawers[drawer.id] = drawer_price
+        total_drawer_price += drawer_price
+    total_price = body_price + total_drawer_price
+    result.cabinets[cabinet.id] = total_price
+    return total_price
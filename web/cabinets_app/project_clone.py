@@ -0,0 +1,85 @@
+""" Deep copies of Projects, for reusing a past Project as a template
+
+A clone has copies of the Project's Specifications, Rooms, Cabinets and
+Drawers. Each level is read in one query and written with one
+bulk_create, with the foreign keys of the level below remapped in
+memory from old to new primary keys, so the number of queries does not
+depend on the size of the Project.
+
+Nothing a price depends on changes in a copy (the Account's discount is
+not part of it), so the stored prices and drawer counts are copied as
+they are rather than recomputed. The exception is a Cabinet whose
+Specification belongs to another Project: the copy has no
+Specification, so it is repriced, at 0.
+"""
+from django.db import transaction
+from .bulk_insert import bulk_insert
+from .models import Cabinet, Drawer, Project, Room, Specification
+from .stored_prices import reprice_cabinets
+
+
+def _copy_rows(rows, new_rows, **changes):
+    """ Insert a copy of each row, with changes applied, by bulk_insert
+    new_rows is a queryset of exactly the inserted rows. Returns a dict
+    of old primary key to new.
+    """
+    old_pks = []
+    for row in rows:
+        old_pks.append(row.pk)
+        row.pk = None
+        for name, value in changes.items():
+            setattr(row, name, value)
+    bulk_insert(rows, new_rows)
+    return dict(zip(old_pks, [row.pk for row in rows]))
+
+
+def clone_project(project, account=None, name=None):
+    """ Copy a Project and everything in it
+    The copy goes in account, by default the Project's own, under name,
+    by default the Project's name with " (copy)". Cabinet numbers are
+    kept. Cabinets with another Project's Specification are copied
+    without one. Returns the new Project.
+    """
+    with transaction.atomic():
+        clone = Project.objects.get(pk=project.pk)
+        clone.pk = None
+        if account is not None:
+            clone.account = account
+        clone.name = name or f'{project.name} (copy)'
+        clone.save()
+
+        specs = _copy_rows(
+            list(Specification.objects.filter(
+                project=project).order_by('pk')),
+            Specification.objects.filter(project=clone),
+            project=clone)
+        rooms = _copy_rows(
+            list(Room.objects.filter(project=project).order_by('pk')),
+            Room.objects.filter(project=clone),
+            project=clone)
+
+        cabinets = list(
+            Cabinet.objects.filter(room__project=project).order_by('pk'))
+        unspecified = []
+        for cabinet in cabinets:
+            cabinet.room_id = rooms[cabinet.room_id]
+            if cabinet.specification_id not in specs:
+                if cabinet.specification_id is not None:
+                    unspecified.append(cabinet)
+                cabinet.specification_id = None
+            else:
+                cabinet.specification_id = specs[cabinet.specification_id]
+        cabinets = _copy_rows(
+            cabinets, Cabinet.objects.filter(project=clone), project=clone)
+
+        drawers = list(Drawer.objects.filter(
+            cabinet__room__project=project).order_by('pk'))
+        for drawer in drawers:
+            drawer.pk = None
+            drawer.cabinet_id = cabinets[drawer.cabinet_id]
+        Drawer.objects.bulk_create(drawers)
+        if unspecified:
+            reprice_cabinets(Cabinet.objects.filter(
+                pk__in=[cabinet.pk for cabinet in unspecified]))
+            clone.refresh_from_db()
+    return clone
@@ -0,0 +1,87 @@
+""" Snapshot of the Labor and Hardware catalogs used while pricing
+
+Pricing looks up the same handful of Labor and Hardware rows for every
+cabinet and drawer. A RateTable holds all of them, keyed by name, so a
+request loads them once. RateTableMiddleware opens a scope per request;
+saving or deleting a Labor or Hardware row drops the scoped table so the
+next lookup sees the change.
+"""
+import threading
+from contextlib import contextmanager
+from .models import Hardware, Labor
+
+
+_local = threading.local()
+
+
+class RateTable:
+    """ All Labor rows keyed by item_name, all Hardware rows keyed by name
+    """
+    def __init__(self, labor, hardware):
+        self.labor = labor
+        self.hardware = hardware
+        self._key = None
+
+    @classmethod
+    def load(cls):
+        labor = {row.item_name: row for row in Labor.objects.all()}
+        hardware = {row.name: row for row in Hardware.objects.all()}
+        return cls(labor, hardware)
+
+    @property
+    def key(self):
+        """ Every rate in the table as one hashable value, for memo keys
+        """
+        if self._key is None:
+            self._key = (
+                tuple(sorted(
+                    (name, row.minutes) for name, row in self.labor.items())),
+                tuple(sorted(
+                    (name, row.cost_per)
+                    for name, row in self.hardware.items())),
+            )
+        return self._key
+
+    def labor_minutes(self, item_name):
+        try:
+            return self.labor[item_name].minutes
+        except KeyError:
+            raise Labor.DoesNotExist(f'No Labor for {item_name!r}')
+
+    def hardware_cost(self, name):
+        try:
+            return self.hardware[name].cost_per
+        except KeyError:
+            raise Hardware.DoesNotExist(f'No Hardware named {name!r}')
+
+
+@contextmanager
+def rate_scope():
+    """ Share one RateTable across every lookup inside the block
+    Scopes nest; only the outermost one clears the table on exit.
+    """
+    depth = getattr(_local, 'depth', 0)
+    _local.depth = depth + 1
+    try:
+        yield
+    finally:
+        _local.depth = depth
+        if not depth:
+            _local.table = None
+
+
+def get_rate_table():
+    """ Return the scoped RateTable, loading it on first use
+    Outside of a rate_scope every call loads a fresh table.
+    """
+    if not getattr(_local, 'depth', 0):
+        return RateTable.load()
+    if getattr(_local, 'table', None) is None:
+        _local.table = RateTable.load()
+    return _local.table
+
+
+def invalidate_rate_table():
+    """ Drop the scoped RateTable so the next lookup reloads it
+    """
+    _local.table = None
@@ -0,0 +1,181 @@
+""" Shop labor: minutes of each Labor item per Project, and a schedule of
+Projects over weeks of shop capacity
+
+Every Labor row is rolled up by its unit_type. Rows counted Each, Pair
+or Set are charged per cabinet, door, drawer or shelf, as COUNTED_LABOR
+names them; 'Sq Ft' rows are finishing work, charged per square foot of
+finished panel (takeoff's exterior area) on the cabinets whose
+Specification has the finish_level of the same name, compared by
+finish_key() so that "Stain, Glaze, & Distress" is "Stain, Glaze &
+Distress". A row that matches neither has nothing to count it by and is
+returned by labor_uses() as unplaced, so the page can say so. The
+quantities are summed by the database, per Project, in one query.
+
+schedule() then fills weeks of shop time in the order the Projects are
+given. Each Project starts in the first week with time left and runs
+on into the following weeks until its minutes are used up, so a week
+can hold the end of one Project and the start of the next.
+"""
+import datetime
+from collections import namedtuple
+from decimal import ROUND_HALF_UP, Decimal
+from django.db import models
+from django.db.models import Case, Count, OuterRef, Subquery, Sum, When
+from django.db.models.functions import Coalesce
+from .models import Cabinet, Drawer, Labor, Specification
+from .takeoff import SQ_IN_PER_SQ_FT, box_area
+
+DEFAULT_SHOP_HOURS = 160
+
+# Labor item_name, for rows counted Each, Pair or Set, to what it is
+# counted per
+COUNTED_LABOR = {
+    'Cabinet': 'cabinets',
+    'Door': 'doors',
+    'Drawer': 'drawers',
+    'Shelf': 'shelves',
+}
+
+SQ_FT = 'sq ft'
+
+# what a Labor row is charged per: a COUNTED_LABOR count, or the square
+# inches of panel finished at a finish_level
+LaborUse = namedtuple('LaborUse', 'item_name minutes per finish_level')
+
+ScheduledProject = namedtuple(
+    'ScheduledProject', 'project minutes start finish')
+
+
+def finish_key(name):
+    """ A finish name with only its letters and digits, in lowercase
+    """
+    return ''.join(c for c in name.lower() if c.isalnum())
+
+
+def labor_uses():
+    """ Return (LaborUses, unplaced item_names) for the Labor rows, in
+    item_name order
+    """
+    finish_levels = {
+        finish_key(name): name
+        for name, label in Specification.FINISH_LEVEL_CHOICES}
+    uses = []
+    unplaced = []
+    for labor in Labor.objects.order_by('item_name', 'pk'):
+        if labor.unit_type.lower() == SQ_FT:
+            finish_level = finish_levels.get(finish_key(labor.item_name))
+            if finish_level is not None:
+                uses.append(LaborUse(
+                    labor.item_name, labor.minutes, 'area', finish_level))
+                continue
+        elif labor.item_name in COUNTED_LABOR:
+            uses.append(LaborUse(
+                labor.item_name, labor.minutes,
+                COUNTED_LABOR[labor.item_name], None))
+            continue
+        unplaced.append(labor.item_name)
+    return uses, unplaced
+
+
+def _quantity(use, counts):
+    if use.per != 'area':
+        return counts[use.per]
+    return Sum(Case(
+        When(specification__finish_level=use.finish_level,
+             then=box_area(exterior=True)),
+        default=0, output_field=models.DecimalField()))
+
+
+def _minutes(use, quantity):
+    """ Minutes for a quantity of a LaborUse, a count or square inches,
+    to the nearest minute
+    """
+    quantity = Decimal(quantity or 0)
+    if use.per == 'area':
+        quantity /= SQ_IN_PER_SQ_FT
+    return int((quantity * use.minutes).quantize(
+        Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def project_labor(projects, uses=None):
+    """ Return a dict of Project id to a dict of Labor item_name to
+    minutes, for a Project queryset
+    uses is labor_uses()'s first value, looked up when not given. The
+    quantities are one query. Projects without cabinets are left out.
+    """
+    if uses is None:
+        uses = labor_uses()[0]
+    drawers = Drawer.objects.filter(
+        cabinet=OuterRef('pk')).order_by().values('cabinet').annotate(
+            total=Count('pk')).values('total')
+    counts = {
+        'cabinets': Count('pk'),
+        'doors': Sum('number_of_doors'),
+        'drawers': Sum('drawer_count'),
+        'shelves': Sum('number_of_shelves'),
+    }
+    rows = Cabinet.objects.filter(project__in=projects).order_by().annotate(
+        drawer_count=Coalesce(
+            Subquery(drawers, output_field=models.IntegerField()), 0),
+    ).values('project').annotate(**{
+        f'labor_{index}': _quantity(use, counts)
+        for index, use in enumerate(uses)
+    })
+    labor = {}
+    for row in rows:
+        minutes = labor[row['project']] = {}
+        for index, use in enumerate(uses):
+            minutes[use.item_name] = (
+                minutes.get(use.item_name, 0) +
+                _minutes(use, row[f'labor_{index}']))
+    return labor
+
+
+def labor_totals(labor):
+    """ Total minutes of each Labor item over project_labor()'s result
+    """
+    totals = {}
+    for minutes in labor.values():
+        for item_name, item_minutes in minutes.items():
+            totals[item_name] = totals.get(item_name, 0) + item_minutes
+    return totals
+
+
+def next_monday(today=None):
+    today = today or datetime.date.today()
+    return today + datetime.timedelta(days=-today.weekday() % 7 or 7)
+
+
+def schedule(projects, labor, shop_hours=DEFAULT_SHOP_HOURS, start=None):
+    """ Fill weeks of shop_hours with Projects, in the order given
+    labor is project_labor()'s result. Returns (ScheduledProjects,
+    weeks), where start and finish are Mondays and weeks is a list of
+    (Monday, minutes booked).
+    """
+    if shop_hours <= 0:
+        raise ValueError('shop_hours must be positive')
+    start = start or next_monday()
+    capacity = shop_hours * 60
+    booked = [0]
+    scheduled = []
+    for project in projects:
+        minutes = sum(labor.get(project.id, {}).values())
+        first = len(booked) - 1
+        if booked[-1] >= capacity:
+            first += 1
+            booked.append(0)
+        remaining = minutes
+        while remaining > capacity - booked[-1]:
+            remaining -= capacity - booked[-1]
+            booked[-1] = capacity
+            booked.append(0)
+        booked[-1] += remaining
+        scheduled.append(ScheduledProject(
+            project, minutes,
+            start + datetime.timedelta(weeks=first),
+            start + datetime.timedelta(weeks=len(booked) - 1)))
+    weeks = [
+        (start + datetime.timedelta(weeks=week), minutes)
+        for week, minutes in enumerate(booked) if minutes
+    ]
+    return scheduled, weeks
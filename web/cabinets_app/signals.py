@@ -0,0 +1,245 @@
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+from .models import (
+    Cabinet, Drawer, Hardware, Labor, Material, Project, Room, Specification
+)
+from .price_cache import bump_project
+from .pricing import price_memo
+from .rates import invalidate_rate_table
+from .stored_prices import (
+    MATERIAL_PRICE_FIELDS, PRICED_HARDWARE, PRICED_LABOR, add_to_room,
+    deleting_cabinets, material_cabinet_ids, material_price_changed,
+    move_cabinet, move_room, recall, remember, reprice_all_projects,
+    reprice_cabinets, reprice_material
+)
+
+
+# ----- RATES ----- #
+
+# the field naming a rate row, and the names pricing reads
+RATE_NAMES = {
+    Labor: ('item_name', PRICED_LABOR),
+    Hardware: ('name', PRICED_HARDWARE),
+}
+
+
+@receiver(pre_save, sender=Labor)
+@receiver(pre_save, sender=Hardware)
+def rate_pre_save(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    field, priced = RATE_NAMES[sender]
+    before = sender.objects.filter(pk=instance.pk).values(field).first()
+    if before:
+        remember(instance, name=before[field])
+
+
+@receiver(post_save, sender=Labor)
+@receiver(post_delete, sender=Labor)
+@receiver(post_save, sender=Hardware)
+@receiver(post_delete, sender=Hardware)
+def rates_changed(sender, instance, raw=False, **kwargs):
+    invalidate_rate_table()
+    price_memo.clear()
+    if raw:
+        return
+    field, priced = RATE_NAMES[sender]
+    # a rename can move a row into or out of pricing
+    before = recall(instance) or {}
+    if {getattr(instance, field), before.get('name')} & set(priced):
+        # after the rate change commits, so the admin's own save neither
+        # waits on it nor holds every cabinet's lock
+        transaction.on_commit(reprice_all_projects)
+
+
+# ----- PROJECTS & ROOMS ----- #
+
+@receiver(pre_save, sender=Project)
+def project_pre_save(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    before = Project.objects.filter(pk=instance.pk).values(
+        'hourly_rate', 'stored_price').first()
+    if before:
+        instance.stored_price = before['stored_price']
+        remember(instance, **before)
+
+
+@receiver(post_save, sender=Project)
+def project_saved(sender, instance, raw=False, **kwargs):
+    bump_project(instance.pk)
+    before = recall(instance)
+    if not raw and before and before['hourly_rate'] != instance.hourly_rate:
+        reprice_cabinets(Cabinet.objects.filter(project=instance))
+
+
+@receiver(pre_save, sender=Room)
+def room_pre_save(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    before = Room.objects.filter(pk=instance.pk).values(
+        'project_id', 'stored_price', 'stored_drawer_count').first()
+    if before:
+        instance.stored_price = before['stored_price']
+        instance.stored_drawer_count = before['stored_drawer_count']
+        remember(instance, **before)
+
+
+@receiver(post_save, sender=Room)
+def room_saved(sender, instance, raw=False, **kwargs):
+    bump_project(instance.project_id)
+    before = recall(instance)
+    if not raw and before and before['project_id'] != instance.project_id:
+        bump_project(before['project_id'])
+        move_room(instance, before['project_id'])
+
+
+@receiver(post_delete, sender=Room)
+def room_deleted(sender, instance, **kwargs):
+    bump_project(instance.project_id)
+
+
+# ----- SPECIFICATIONS & MATERIALS ----- #
+
+@receiver(post_save, sender=Specification)
+def spec_saved(sender, instance, raw=False, **kwargs):
+    bump_project(instance.project_id)
+    if not raw:
+        reprice_cabinets(Cabinet.objects.filter(specification=instance))
+
+
+@receiver(pre_delete, sender=Specification)
+def spec_pre_delete(sender, instance, **kwargs):
+    remember(instance, cabinet_ids=list(
+        instance.cabinets.values_list('pk', flat=True)))
+
+
+@receiver(post_delete, sender=Specification)
+def spec_deleted(sender, instance, **kwargs):
+    bump_project(instance.project_id)
+    reprice_cabinets(
+        Cabinet.objects.filter(pk__in=recall(instance)['cabinet_ids']))
+
+
+@receiver(pre_save, sender=Material)
+def material_pre_save(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    before = Material.objects.filter(pk=instance.pk).values(
+        *MATERIAL_PRICE_FIELDS).first()
+    if before:
+        remember(instance, **before)
+
+
+@receiver(post_save, sender=Material)
+def material_saved(sender, instance, raw=False, **kwargs):
+    """ Reprice what the Material affects, if a price field changed
+    The RepriceReport is left on instance.reprice_report.
+    """
+    instance.reprice_report = None
+    before = recall(instance)
+    if raw or not before or not material_price_changed(before, instance):
+        return
+    price_memo.clear()
+    instance.reprice_report = reprice_material(instance)
+    for project_id in instance.reprice_report.project_ids:
+        bump_project(project_id)
+
+
+@receiver(pre_delete, sender=Material)
+def material_pre_delete(sender, instance, **kwargs):
+    remember(instance, cabinet_ids=material_cabinet_ids(instance))
+
+
+@receiver(post_delete, sender=Material)
+def material_deleted(sender, instance, **kwargs):
+    price_memo.clear()
+    report = reprice_material(instance, recall(instance)['cabinet_ids'])
+    for project_id in report.project_ids:
+        bump_project(project_id)
+
+
+# ----- CABINETS & DRAWERS ----- #
+
+@receiver(pre_save, sender=Cabinet)
+def cabinet_pre_save(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    before = Cabinet.objects.filter(pk=instance.pk).values(
+        'room_id', 'stored_price').first()
+    if before:
+        instance.stored_price = before['stored_price']
+        remember(instance, **before)
+
+
+@receiver(post_save, sender=Cabinet)
+def cabinet_saved(sender, instance, raw=False, **kwargs):
+    bump_project(instance.project_id)
+    if raw:
+        return
+    before = recall(instance)
+    if before and before['room_id'] != instance.room_id:
+        move_cabinet(instance.pk, before['room_id'], instance.room_id)
+    for cabinet in reprice_cabinets(Cabinet.objects.filter(pk=instance.pk)):
+        instance.stored_price = cabinet.stored_price
+
+
+@receiver(pre_delete, sender=Cabinet)
+def cabinet_pre_delete(sender, instance, **kwargs):
+    deleting_cabinets().add(instance.pk)
+    before = Cabinet.objects.filter(pk=instance.pk).annotate(
+        drawer_count=Count('drawers')).values(
+        'room_id', 'stored_price', 'drawer_count').first()
+    remember(instance, **before)
+
+
+@receiver(post_delete, sender=Cabinet)
+def cabinet_deleted(sender, instance, **kwargs):
+    bump_project(instance.project_id)
+    deleting_cabinets().discard(instance.pk)
+    before = recall(instance)
+    add_to_room(
+        before['room_id'], -before['stored_price'], -before['drawer_count'])
+
+
+@receiver(pre_save, sender=Drawer)
+def drawer_pre_save(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    before = Drawer.objects.filter(pk=instance.pk).values(
+        'cabinet_id', 'cabinet__room_id', 'cabinet__project_id').first()
+    if before:
+        remember(instance, **before)
+
+
+@receiver(post_save, sender=Drawer)
+def drawer_saved(sender, instance, created, raw=False, **kwargs):
+    bump_project(instance.cabinet.project_id)
+    if raw:
+        return
+    before = recall(instance)
+    cabinet_ids = {instance.cabinet_id}
+    if created:
+        add_to_room(instance.cabinet.room_id, drawer_count=1)
+    elif before and before['cabinet_id'] != instance.cabinet_id:
+        bump_project(before['cabinet__project_id'])
+        cabinet_ids.add(before['cabinet_id'])
+        add_to_room(before['cabinet__room_id'], drawer_count=-1)
+        add_to_room(instance.cabinet.room_id, drawer_count=1)
+    reprice_cabinets(Cabinet.objects.filter(pk__in=cabinet_ids))
+
+
+@receiver(post_delete, sender=Drawer)
+def drawer_deleted(sender, instance, **kwargs):
+    if instance.cabinet_id in deleting_cabinets():
+        return
+    cabinet = Cabinet.objects.filter(pk=instance.cabinet_id).values(
+        'room_id', 'project_id').first()
+    if cabinet is not None:
+        bump_project(cabinet['project_id'])
+        add_to_room(cabinet['room_id'], drawer_count=-1)
+        reprice_cabinets(Cabinet.objects.filter(pk=instance.cabinet_id))
@@ -0,0 +1,101 @@
+""" Price a Project under alternative Specifications, without saving
+
+An alternative is a pair of interior and exterior Materials, usually
+taken from an existing Specification. Every cabinet in the Project is
+priced with its own Specification ("Current") and then as if each
+alternative's Materials replaced it. The Project graph and the
+RateTable are loaded once for all the alternatives, and identical boxes
+come from the price memo (see pricing.py), so N alternatives cost far
+less than N full repricings.
+"""
+from decimal import Decimal
+from .models import Hardware, Labor, Material, Specification
+from .pricing import cabinet_prices, project_rooms
+from .rates import get_rate_table
+from .stored_prices import stored_price_of, to_cents
+
+
+class Alternative:
+    """ A labelled pair of interior and exterior Materials
+    """
+    def __init__(self, label, interior, exterior):
+        self.label = label
+        self.interior = interior
+        self.exterior = exterior
+
+    @classmethod
+    def from_spec(cls, spec):
+        return cls(spec.name, spec.interior_material, spec.exterior_material)
+
+    def price(self, cabinet, drawers, rates):
+        """ Price of a cabinet built with these Materials, 0 if it cannot
+        be priced
+        """
+        if self.interior is None or self.exterior is None:
+            return to_cents(0)
+        if any(drawer.material is None for drawer in drawers):
+            return to_cents(0)
+        try:
+            body_price, drawer_prices = cabinet_prices(
+                cabinet, drawers, rates, (self.interior, self.exterior))
+        except (Labor.DoesNotExist, Hardware.DoesNotExist):
+            return to_cents(0)
+        return body_price + sum(drawer_prices)
+
+
+def load_alternatives(spec_ids=(), material_pairs=()):
+    """ Build Alternatives from Specification ids and from
+    (interior id, exterior id) pairs of Material ids
+    Raises Specification.DoesNotExist or Material.DoesNotExist for an
+    unknown id.
+    """
+    specs = Specification.objects.select_related(
+        'interior_material', 'exterior_material').in_bulk(spec_ids)
+    material_ids = {pk for pair in material_pairs for pk in pair}
+    materials = Material.objects.in_bulk(material_ids)
+    alternatives = []
+    for pk in spec_ids:
+        if pk not in specs:
+            raise Specification.DoesNotExist(f'No Specification {pk}')
+        alternatives.append(Alternative.from_spec(specs[pk]))
+    for interior_id, exterior_id in material_pairs:
+        missing = {interior_id, exterior_id} - set(materials)
+        if missing:
+            raise Material.DoesNotExist(f'No Material {missing.pop()}')
+        interior, exterior = materials[interior_id], materials[exterior_id]
+        alternatives.append(Alternative(
+            f'{interior.name} / {exterior.name}', interior, exterior))
+    return alternatives
+
+
+class SpecComparison:
+    """ Room and Project totals, current and under each Alternative
+    totals and each room's totals are lists in the order of labels.
+    """
+    def __init__(self, alternatives):
+        self.labels = ['Current'] + [alt.label for alt in alternatives]
+        self.rooms = []
+        self.totals = [Decimal(0)] * len(self.labels)
+
+    def add_room(self, room, totals):
+        self.rooms.append((room, totals))
+        self.totals = [a + b for a, b in zip(self.totals, totals)]
+
+
+def compare_specifications(project, alternatives, rates=None):
+    """ Price every cabinet of a Project currently and under each
+    Alternative; returns a SpecComparison
+    """
+    comparison = SpecComparison(alternatives)
+    for room in project_rooms(project):
+        room_totals = [Decimal(0)] * len(comparison.labels)
+        for cabinet in room.cabinets.all():
+            if rates is None:
+                rates = get_rate_table()
+            drawers = list(cabinet.drawers.all())
+            prices = [stored_price_of(cabinet, drawers, rates)]
+            prices += [alt.price(cabinet, drawers, rates)
+                       for alt in alternatives]
+            room_totals = [a + b for a, b in zip(room_totals, prices)]
+        comparison.add_room(room, room_totals)
+    return comparison
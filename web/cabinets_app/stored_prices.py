@@ -0,0 +1,356 @@
+""" Maintenance of the stored (denormalized) price columns
+
+Cabinet.stored_price is the cabinet's price rounded to cents.
+Room.stored_price and Project.stored_price are the sums of the stored
+cabinet prices below them, and Room.stored_drawer_count counts the
+drawers in the room. Totals are therefore the sum of the rounded line
+items, as on an invoice.
+
+The signal handlers in signals.py call into this module on every write
+that can change a price. Only the difference between the old and the
+new cabinet price is pushed up to the Room and Project, with F()
+expressions so concurrent updates do not overwrite each other, and the
+cabinets are locked while the difference is worked out, so it is only
+pushed up once.
+"""
+import threading
+import time
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+from django.db import transaction
+from django.db.models import Count, F, Prefetch
+from .models import Cabinet, Drawer, Hardware, Labor, Project, Room
+from .price_arrays import price_projects_arrays
+from .price_core import hundredths
+from .pricing import cabinet_prices
+from .rates import get_rate_table
+
+
+CENT = Decimal('0.01')
+
+# the Material fields that Material.sq_ft_cost, and so every price, uses
+MATERIAL_PRICE_FIELDS = ('sheet_cost', 'markup', 'width', 'length')
+
+# the Labor item_names and Hardware names a price reads; other rows can
+# change without repricing anything
+PRICED_LABOR = ('Cabinet', 'Door', 'Drawer')
+PRICED_HARDWARE = ('Blum 110+ Hinge',)
+
+# Projects whose stored prices are rebuilt together
+REBUILD_BATCH_SIZE = 100
+
+_local = threading.local()
+
+
+def to_cents(price):
+    """ Round a price to whole cents, half up
+    """
+    return Decimal(price).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def is_priceable(cabinet, drawers):
+    """ Cabinets without a Specification or Material cannot be priced
+    """
+    spec = cabinet.specification
+    if spec is None:
+        return False
+    if spec.interior_material is None or spec.exterior_material is None:
+        return False
+    return all(drawer.material is not None for drawer in drawers)
+
+
+def has_price_rates(rates):
+    """ Whether a RateTable has every Labor and Hardware row a price reads
+    """
+    return (all(name in rates.labor for name in PRICED_LABOR)
+            and all(name in rates.hardware for name in PRICED_HARDWARE))
+
+
+def stored_price_of(cabinet, drawers, rates):
+    """ Return the price to store for a cabinet
+    Cabinets that cannot be priced, because a Specification, Material,
+    Labor or Hardware row is missing, are stored at 0.
+    """
+    if not is_priceable(cabinet, drawers):
+        return to_cents(0)
+    try:
+        body_price, drawer_prices = cabinet_prices(cabinet, drawers, rates)
+        price = body_price + sum(drawer_prices)
+    except (Labor.DoesNotExist, Hardware.DoesNotExist):
+        return to_cents(0)
+    return to_cents(price)
+
+
+def live_price_of(cabinet):
+    """ Return Cabinet.price rounded to cents, 0 if it cannot be priced
+    """
+    if not is_priceable(cabinet, cabinet.drawers.all()):
+        return to_cents(0)
+    try:
+        return to_cents(cabinet.price)
+    except (Labor.DoesNotExist, Hardware.DoesNotExist):
+        return to_cents(0)
+
+
+def add_to_room(room_id, price=0, drawer_count=0):
+    """ Add to a Room's stored totals and to its Project's stored price
+    """
+    if price:
+        Room.objects.filter(pk=room_id).update(
+            stored_price=F('stored_price') + price)
+        Project.objects.filter(rooms__id=room_id).update(
+            stored_price=F('stored_price') + price)
+    if drawer_count:
+        Room.objects.filter(pk=room_id).update(
+            stored_drawer_count=F('stored_drawer_count') + drawer_count)
+
+
+def load_cabinets(cabinets):
+    """ Load a Cabinet queryset with everything its price depends on
+    """
+    return cabinets.select_related(
+        'project',
+        'specification__interior_material',
+        'specification__exterior_material',
+    ).prefetch_related(
+        Prefetch('drawers', queryset=Drawer.objects.select_related('material'))
+    )
+
+
+def reprice_cabinets(cabinets):
+    """ Recompute the stored price of every Cabinet in a queryset and
+    push the differences up to their Rooms and Projects
+    Returns the list of cabinets whose stored price changed.
+    The cabinets are locked, in primary key order, until the transaction
+    ends, so two reprices of the same cabinet cannot both push the same
+    difference up.
+    """
+    rates = None
+    changed = []
+    room_deltas = defaultdict(Decimal)
+    with transaction.atomic():
+        locked = load_cabinets(cabinets).select_for_update(
+            of=('self',)).order_by('pk')
+        for cabinet in locked:
+            if rates is None:
+                rates = get_rate_table()
+            price = stored_price_of(cabinet, cabinet.drawers.all(), rates)
+            if price != cabinet.stored_price:
+                room_deltas[cabinet.room_id] += price - cabinet.stored_price
+                cabinet.stored_price = price
+                changed.append(cabinet)
+        if changed:
+            Cabinet.objects.bulk_update(changed, ['stored_price'])
+        for room_id, delta in room_deltas.items():
+            add_to_room(room_id, delta)
+    return changed
+
+
+def reprice_all_projects():
+    """ reprice_cabinets() for every Project, one Project at a time
+    Each Project's cabinets are locked only while it is repriced, and
+    only the differences are pushed up. Returns the number of Projects.
+    """
+    project_ids = list(Project.objects.values_list('pk', flat=True))
+    for project_id in project_ids:
+        reprice_cabinets(Cabinet.objects.filter(project_id=project_id))
+    return len(project_ids)
+
+
+# ----- MATERIALS ----- #
+
+class RepriceReport:
+    """ What a targeted reprice looked at and changed, and how long it took
+    """
+    def __init__(self, cabinets, drawers, changed, rooms, project_ids,
+                 seconds):
+        self.cabinets = cabinets
+        self.drawers = drawers
+        self.changed = changed
+        self.rooms = rooms
+        self.project_ids = project_ids
+        self.seconds = seconds
+
+    def __str__(self):
+        return (
+            f'Repriced {self.cabinets} cabinets and {self.drawers} drawers '
+            f'in {len(self.project_ids)} projects; {self.changed} cabinet '
+            f'and {self.rooms} room totals changed '
+            f'({self.seconds * 1000:.0f} ms)'
+        )
+
+
+def material_price_changed(before, material):
+    """ Whether a Material's price fields differ from the values before
+    """
+    return any(
+        hundredths(before[field]) != hundredths(getattr(material, field))
+        for field in MATERIAL_PRICE_FIELDS
+    )
+
+
+def material_cabinet_ids(material):
+    """ Ids of the Cabinets priced from a Material
+    Walks the reverse relations: specifications using it inside or out,
+    and drawers made of it.
+    """
+    spec_ids = set(material.interior_specifications.values_list(
+        'pk', flat=True))
+    spec_ids |= set(material.exterior_specifications.values_list(
+        'pk', flat=True))
+    cabinet_ids = set(Cabinet.objects.filter(
+        specification__in=spec_ids).values_list('pk', flat=True))
+    cabinet_ids |= set(material.drawer_material.values_list(
+        'cabinet_id', flat=True))
+    return cabinet_ids
+
+
+def reprice_material(material, cabinet_ids=None):
+    """ Reprice only the Cabinets, Rooms and Projects a Material affects
+    cabinet_ids defaults to material_cabinet_ids(material); pass the ids
+    found before a delete, when the relations are already gone.
+    Returns a RepriceReport.
+    """
+    started = time.perf_counter()
+    if cabinet_ids is None:
+        cabinet_ids = material_cabinet_ids(material)
+    cabinets = Cabinet.objects.filter(pk__in=cabinet_ids)
+    project_ids = set(cabinets.values_list('project_id', flat=True))
+    changed = reprice_cabinets(cabinets)
+    return RepriceReport(
+        cabinets=len(cabinet_ids),
+        drawers=Drawer.objects.filter(
+            cabinet__in=cabinet_ids, material=material.pk).count(),
+        changed=len(changed),
+        rooms=len({cabinet.room_id for cabinet in changed}),
+        project_ids=project_ids,
+        seconds=time.perf_counter() - started,
+    )
+
+
+# ----- SIGNAL HELPERS ----- #
+
+def remember(instance, **values):
+    """ Keep pre-save values on an instance for the post-save handler
+    """
+    instance._stored_before = values
+
+
+def recall(instance):
+    return getattr(instance, '_stored_before', None)
+
+
+def deleting_cabinets():
+    """ Ids of cabinets whose delete is in progress on this thread
+    Drawers deleted along with their cabinet are left to the cabinet's
+    own handler.
+    """
+    if not hasattr(_local, 'cabinets'):
+        _local.cabinets = set()
+    return _local.cabinets
+
+
+def move_cabinet(cabinet_id, old_room_id, new_room_id):
+    """ Move a cabinet's stored price and drawer count to another Room
+    """
+    cabinet = Cabinet.objects.annotate(
+        drawer_count=Count('drawers')).get(pk=cabinet_id)
+    add_to_room(old_room_id, -cabinet.stored_price, -cabinet.drawer_count)
+    add_to_room(new_room_id, cabinet.stored_price, cabinet.drawer_count)
+
+
+def move_room(room, old_project_id):
+    """ Move a Room's stored price to another Project
+    """
+    Project.objects.filter(pk=old_project_id).update(
+        stored_price=F('stored_price') - room.stored_price)
+    Project.objects.filter(pk=room.project_id).update(
+        stored_price=F('stored_price') + room.stored_price)
+
+
+# ----- REBUILD & VERIFY ----- #
+
+def rebuild_project(project):
+    """ Recompute every stored column of a Project from scratch
+    """
+    rooms = Room.objects.filter(project=project).with_counts()
+    drawer_counts = {room.id: room.drawer_total for room in rooms}
+    cabinets = list(load_cabinets(
+        Cabinet.objects.filter(room__project=project)))
+    rates = get_rate_table() if cabinets else None
+    room_totals = defaultdict(Decimal)
+    for cabinet in cabinets:
+        cabinet.stored_price = stored_price_of(
+            cabinet, cabinet.drawers.all(), rates)
+        room_totals[cabinet.room_id] += cabinet.stored_price
+    Cabinet.objects.bulk_update(cabinets, ['stored_price'])
+    for room_id, drawer_count in drawer_counts.items():
+        Room.objects.filter(pk=room_id).update(
+            stored_price=room_totals[room_id],
+            stored_drawer_count=drawer_count)
+    project.stored_price = sum(room_totals.values(), to_cents(0))
+    Project.objects.filter(pk=project.id).update(
+        stored_price=project.stored_price)
+
+
+def rebuild_projects(projects):
+    """ rebuild_project() for a batch of Projects at once
+    The cabinets are priced together by price_arrays, to the same cents,
+    and every stored column is written with bulk_update.
+    """
+    projects = list(projects)
+    try:
+        arrays = price_projects_arrays(projects)
+    except (Labor.DoesNotExist, Hardware.DoesNotExist):
+        # without the rates every cabinet is stored at 0, as
+        # stored_price_of() does
+        for project in projects:
+            rebuild_project(project)
+        return
+    Cabinet.objects.bulk_update([
+        Cabinet(pk=pk, stored_price=price)
+        for pk, price in arrays.prices().items()
+    ], ['stored_price'])
+    room_totals = arrays.room_totals()
+    rooms = list(Room.objects.filter(project__in=projects).with_counts())
+    for room in rooms:
+        room.stored_price = room_totals.get(room.id, to_cents(0))
+        room.stored_drawer_count = room.drawer_total
+    Room.objects.bulk_update(rooms, ['stored_price', 'stored_drawer_count'])
+    project_totals = arrays.project_totals()
+    for project in projects:
+        project.stored_price = project_totals.get(project.id, to_cents(0))
+    Project.objects.bulk_update(projects, ['stored_price'])
+
+
+def rebuild_all_projects(batch_size=REBUILD_BATCH_SIZE):
+    """ rebuild_projects() for every Project, batch_size at a time
+    """
+    projects = list(Project.objects.all())
+    for i in range(0, len(projects), batch_size):
+        rebuild_projects(projects[i:i + batch_size])
+    return len(projects)
+
+
+def verify_project(project):
+    """ Compare a Project's stored columns with the live price properties
+    Returns a list of (object, stored, live) tuples that disagree.
+    """
+    mismatches = []
+    project_total = to_cents(0)
+    for room in Room.objects.filter(project=project):
+        room_total = to_cents(0)
+        for cabinet in Cabinet.objects.filter(room=room):
+            live = live_price_of(cabinet)
+            if cabinet.stored_price != live:
+                mismatches.append((cabinet, cabinet.stored_price, live))
+            room_total += live
+        if room.stored_price != room_total:
+            mismatches.append((room, room.stored_price, room_total))
+        if room.stored_drawer_count != room.drawer_count:
+            mismatches.append(
+                (room, room.stored_drawer_count, room.drawer_count))
+        project_total += room_total
+    if project.stored_price != project_total:
+        mismatches.append((project, project.stored_price, project_total))
+    return mismatches
@@ -0,0 +1,134 @@
+""" Material takeoff: square feet of each Material a scope of Cabinets uses
+
+The areas are summed by the database. A cabinet's interior panels go to
+its Specification's interior Material, its exterior panels and door
+face to the exterior Material, and each drawer box to the drawer's
+Material. The three groupings are one UNION ALL statement, so a takeoff
+is a single query however many Projects it covers.
+
+The panel areas mirror price_core.cabinet_parts() and drawer_parts();
+like them, they are before waste.
+"""
+import csv
+from collections import namedtuple
+from decimal import Decimal
+from django.db import models
+from django.db.models import Case, F, Q, Sum, Value, When
+from .models import Cabinet, Drawer
+
+SQ_IN_PER_SQ_FT = 144
+
+TakeoffRow = namedtuple(
+    'TakeoffRow', 'material_id name interior exterior drawer total')
+
+
+def _area(expression):
+    return models.ExpressionWrapper(
+        expression, output_field=models.DecimalField())
+
+
+def _box_panels():
+    """ (area, exterior condition) of each cabinet panel, in square
+    inches
+    """
+    vertical = F('height') * F('depth')
+    horizontal = F('width') * F('depth')
+    face = F('width') * F('height')
+    finished_interior = Q(finished_interior=True)
+    return (
+        (vertical, finished_interior | Q(finished_left_end=True)),
+        (vertical, finished_interior | Q(finished_right_end=True)),
+        (horizontal, finished_interior | Q(finished_top=True)),
+        (horizontal, finished_interior | Q(finished_bottom=True)),
+        (face, finished_interior),
+        (F('number_of_shelves') * horizontal, finished_interior),
+    )
+
+
+def box_area(exterior):
+    """ A cabinet's panels cut from the exterior Material, or from the
+    interior one, in square inches, as an expression on Cabinet
+    """
+    terms = [
+        Case(
+            When(condition, then=area if exterior else Value(0)),
+            default=Value(0) if exterior else area,
+            output_field=models.DecimalField(),
+        )
+        for area, condition in _box_panels()
+    ]
+    if exterior:
+        # the door face
+        terms.append(F('width') * F('height'))
+    return _area(sum(terms[1:], terms[0]))
+
+
+def _box_area(exterior):
+    return Sum(box_area(exterior))
+
+
+def _takeoff_query(cabinets):
+    zero = _area(Value(0))
+    cabinets = cabinets.order_by()
+    interior = cabinets.values(
+        material=F('specification__interior_material'),
+        name=F('specification__interior_material__name'),
+    ).annotate(
+        interior=_box_area(exterior=False), exterior=zero, drawer=zero)
+    exterior = cabinets.values(
+        material=F('specification__exterior_material'),
+        name=F('specification__exterior_material__name'),
+    ).annotate(
+        interior=zero, exterior=_box_area(exterior=True), drawer=zero)
+    drawer_area = (
+        2 * F('cabinet__depth') * F('height') +
+        2 * F('cabinet__width') * F('height') +
+        F('cabinet__width') * F('cabinet__depth')
+    )
+    drawers = Drawer.objects.filter(cabinet__in=cabinets).order_by().values(
+        material_key=F('material'), name=F('material__name'),
+    ).annotate(interior=zero, exterior=zero, drawer=Sum(_area(drawer_area)))
+    return interior.union(exterior, drawers, all=True)
+
+
+def _sq_ft(sq_in):
+    return (Decimal(sq_in) / SQ_IN_PER_SQ_FT).quantize(Decimal('0.01'))
+
+
+def material_takeoff(cabinets):
+    """ Return a list of TakeoffRows, in square feet, for a Cabinet
+    queryset, ordered by Material name
+    Panels without a Material are left out.
+    """
+    totals = {}
+    for row in _takeoff_query(cabinets):
+        if row['material'] is None:
+            continue
+        total = totals.setdefault(row['material'], [row['name'], 0, 0, 0])
+        total[1] += row['interior'] or 0
+        total[2] += row['exterior'] or 0
+        total[3] += row['drawer'] or 0
+    rows = []
+    for material_id, (name, interior, exterior, drawer) in totals.items():
+        areas = [_sq_ft(area) for area in (interior, exterior, drawer)]
+        rows.append(TakeoffRow(material_id, name, *areas, sum(areas)))
+    return sorted(rows, key=lambda row: (row.name, row.material_id))
+
+
+def project_takeoff(project):
+    return material_takeoff(Cabinet.objects.filter(project=project))
+
+
+def account_takeoff(account):
+    return material_takeoff(
+        Cabinet.objects.filter(project__account=account))
+
+
+def write_takeoff_csv(rows, file):
+    writer = csv.writer(file)
+    writer.writerow([
+        'material', 'interior sq ft', 'exterior sq ft', 'drawer sq ft',
+        'total sq ft'])
+    for row in rows:
+        writer.writerow([
+            row.name, row.interior, row.exterior, row.drawer, row.total])
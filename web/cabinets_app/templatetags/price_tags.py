@@ -0,0 +1,20 @@
+from decimal import Decimal
+from django import template
+
+register = template.Library()
+
+
+@register.filter
+def price_of(prices, obj):
+    """ Look up a Room, Cabinet or Drawer in a ProjectPrice
+    e.g. {{ prices|price_of:cab|floatformat:2 }}
+    """
+    return prices.price_of(obj)
+
+
+@register.filter
+def inches(value):
+    """ Hundredths of an inch, as from parts.py, in inches
+    e.g. {{ placement.length|inches }}
+    """
+    return Decimal(value).scaleb(-2)
@@ -0,0 +1,107 @@
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from .models import Material, Cabinet, Specification, Room
+from .cabinet_bulk import copy_cabinet, update_cabinets
+from .stored_prices import verify_project
+from .tests_models import get_material_info, get_spec_info
+from .tests_utils import create_rates, create_priced_project
+
+
+class CabinetBulkTest(TestCase):
+    def setUp(self):
+        create_rates()
+        cache.clear()
+        self.project = create_priced_project(rooms=2, cabinets_per_room=3)
+        self.room = Room.objects.filter(project=self.project).first()
+        # the cabinet with two drawers
+        self.cabinet = Cabinet.objects.get(
+            project=self.project, cabinet_number=3)
+
+    def test_copy_cabinet(self):
+        copies = copy_cabinet(self.cabinet, 4)
+        self.assertEqual(
+            list(copies.values_list('cabinet_number', flat=True)),
+            [7, 8, 9, 10])
+        for copy in copies:
+            self.assertEqual(copy.room_id, self.cabinet.room_id)
+            self.assertEqual(copy.width, self.cabinet.width)
+            self.assertEqual(copy.stored_price, self.cabinet.stored_price)
+            self.assertEqual(copy.drawers.count(), 2)
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.stored_drawer_count, 3 + 4 * 2)
+        self.project.refresh_from_db()
+        self.assertEqual(verify_project(self.project), [])
+
+    def test_copy_query_count_is_fixed(self):
+        def count(copies):
+            with CaptureQueriesContext(connection) as queries:
+                copy_cabinet(self.cabinet, copies)
+            return len(queries)
+        # the first copy also creates the Project's counter
+        count(1)
+        self.assertEqual(count(2), count(20))
+
+    def test_update_cabinets(self):
+        material = Material.objects.create(**get_material_info())
+        spec = Specification.objects.create(
+            **get_spec_info(self.project, material, material))
+        selected, unchanged = Cabinet.objects.filter(
+            room=self.room).order_by('cabinet_number')[:2]
+        elsewhere = Cabinet.objects.exclude(room=self.room).first()
+        count = update_cabinets(
+            self.room, [selected.pk, elsewhere.pk],
+            specification=spec, depth=Decimal('12.50'), finished_top=True)
+        self.assertEqual(count, 1)
+        selected.refresh_from_db()
+        self.assertEqual(selected.specification, spec)
+        self.assertEqual(selected.depth, Decimal('12.50'))
+        self.assertTrue(selected.finished_top)
+        self.assertEqual(
+            Cabinet.objects.get(pk=unchanged.pk).depth, unchanged.depth)
+        self.assertEqual(
+            Cabinet.objects.get(pk=elsewhere.pk).depth, elsewhere.depth)
+        self.project.refresh_from_db()
+        self.assertEqual(verify_project(self.project), [])
+        with self.assertRaises(ValueError):
+            update_cabinets(self.room, [selected.pk], cabinet_number=99)
+
+    def test_update_query_count_is_fixed(self):
+        def count(depth):
+            cabinets = Cabinet.objects.filter(room=self.room)[:depth]
+            with CaptureQueriesContext(connection) as queries:
+                update_cabinets(
+                    self.room, [cabinet.pk for cabinet in cabinets],
+                    depth=depth)
+            return len(queries)
+        self.assertEqual(count(1), count(3))
+
+    def test_views(self):
+        user = User.objects.create_user('estimator', password='12345')
+        self.client.force_login(user)
+        home = reverse('project_home', kwargs={'proj_id': self.project.id})
+        res = self.client.post(reverse('cabinet_copy', kwargs={
+            'proj_id': self.project.id, 'cab_id': self.cabinet.id}),
+            {'count': 12})
+        self.assertRedirects(res, home)
+        self.assertEqual(self.room.cabinets.count(), 15)
+
+        url = reverse('cabinet_bulk_edit', kwargs={
+            'proj_id': self.project.id, 'room_id': self.room.id})
+        self.assertContains(self.client.get(url), 'Unchanged')
+        cabinets = [cabinet.pk for cabinet in self.room.cabinets.all()]
+        res = self.client.post(url, {'cabinets': cabinets})
+        self.assertContains(res, 'Choose at least one change.')
+        res = self.client.post(url, {
+            'cabinets': cabinets, 'depth': '14', 'finished_bottom': 'true'})
+        self.assertRedirects(res, home)
+        self.assertEqual(
+            set(self.room.cabinets.values_list(
+                'depth', 'finished_bottom')),
+            {(Decimal('14.00'), True)})
+        self.project.refresh_from_db()
+        self.assertEqual(verify_project(self.project), [])
@@ -0,0 +1,155 @@
+import csv
+import os
+import tempfile
+from decimal import Decimal
+from io import BytesIO, StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from .models import Cabinet, Room
+from .cabinet_import import ScheduleError, import_schedule, read_schedule
+from .stored_prices import verify_project
+from .tests_utils import create_rates, create_priced_project
+
+
+class CabinetImportTest(TestCase):
+
+    def setUp(self):
+        create_rates()
+        self.project = create_priced_project(rooms=1, cabinets_per_room=2)
+        self.room = Room.objects.select_related('project').get(
+            project=self.project)
+
+    def schedule(self, rows):
+        header = [
+            'Specification', 'Width', 'Height', 'Depth', 'Number of doors',
+            'Number of shelves', 'Finished left end', 'Drawer heights',
+            'Drawer material']
+        text = StringIO()
+        writer = csv.writer(text)
+        writer.writerow(header)
+        writer.writerows(rows)
+        return BytesIO(text.getvalue().encode())
+
+    def good_rows(self, count):
+        return [
+            ['Dark Cherry', 12 + n % 30, 30, 24, 1, 2, 'yes' if n % 2 else '',
+             '6; 8' if n % 3 else '', 'Select Cherry']
+            for n in range(count)
+        ]
+
+    def test_import(self):
+        rows = self.good_rows(3) + [
+            ['Light Maple', 12, 30, 24, 1, 2, '', '', ''],
+            ['Dark Cherry', 'wide', 30, 24, 1, 2, 'maybe', '', ''],
+            ['Dark Cherry', 12, 30, 24, 1, 2, '', '6;x', 'Select Cherry'],
+            ['Dark Cherry', 12, 30, 24, 1, 2, '', '6', 'Walnut'],
+        ]
+        result = import_schedule(
+            self.room, read_schedule(self.schedule(rows), 'plan.csv'))
+        self.assertEqual(result.rows, 7)
+        self.assertEqual(result.cabinets, 3)
+        self.assertEqual(result.drawers, 4)
+        self.assertEqual(result.skipped, 4)
+        self.assertEqual(
+            [(error.row, error.field) for error in result.errors], [
+                (5, 'specification'), (6, 'finished_left_end'),
+                (6, 'width'), (7, 'drawer_heights'),
+                (8, 'drawer_material')])
+        cabinets = Cabinet.objects.filter(project=self.project)
+        self.assertEqual(
+            list(cabinets.values_list('cabinet_number', flat=True)),
+            [1, 2, 3, 4, 5])
+        self.assertEqual(
+            list(cabinets.values_list('finished_left_end', flat=True)[2:]),
+            [False, True, False])
+        self.assertEqual(
+            Cabinet.objects.get(project=self.project, cabinet_number=4)
+            .drawers.count(), 2)
+        self.project.refresh_from_db()
+        self.assertEqual(verify_project(self.project), [])
+        self.assertEqual(self.project.stored_price, self.project.price)
+
+    def test_query_count_is_fixed_per_batch(self):
+        def count(rows):
+            with CaptureQueriesContext(connection) as queries:
+                result = import_schedule(self.room, read_schedule(
+                    self.schedule(self.good_rows(rows)), 'plan.csv'))
+            self.assertEqual(result.cabinets, rows)
+            return len(queries)
+        # the first import also creates the Project's counter
+        count(1)
+        self.assertEqual(count(5), count(50))
+
+    def test_bad_files(self):
+        with self.assertRaises(ScheduleError):
+            read_schedule(BytesIO(b''), 'plan.pdf')
+        with self.assertRaises(ScheduleError):
+            import_schedule(self.room, read_schedule(
+                BytesIO(b'width,height\n12,30\n'), 'plan.csv'))
+        self.assertEqual(
+            Cabinet.objects.filter(project=self.project).count(), 2)
+
+    def test_xlsx(self):
+        import openpyxl
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.append([
+            'specification', 'width', 'height', 'depth', 'number_of_doors',
+            'number_of_shelves', 'finished_top', 'drawer_heights',
+            'drawer_material'])
+        sheet.append(
+            ['Dark Cherry', 15.5, 30, 24, 2, 1, 'x', 5, 'Select Cherry'])
+        sheet.append([])
+        sheet.append(['Dark Cherry', 18, 34.5, 24, 0, 0, None, None, None])
+        file = BytesIO()
+        workbook.save(file)
+        file.seek(0)
+        result = import_schedule(self.room, read_schedule(file, 'plan.xlsx'))
+        self.assertEqual((result.cabinets, result.drawers), (2, 1))
+        self.assertEqual(result.errors, [])
+        cabinet = Cabinet.objects.get(project=self.project, cabinet_number=3)
+        self.assertEqual(cabinet.width, Decimal('15.5'))
+        self.assertTrue(cabinet.finished_top)
+
+    def test_command_and_view(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'plan.csv')
+            with open(path, 'wb') as f:
+                f.write(self.schedule(self.good_rows(4)).getvalue())
+            out = StringIO()
+            call_command(
+                'import_cabinets', self.room.id, path, dry_run=True,
+                stdout=out)
+            self.assertIn('Imported 4 cabinets', out.getvalue())
+            self.assertEqual(
+                Cabinet.objects.filter(project=self.project).count(), 2)
+            call_command('import_cabinets', self.room.id, path, stdout=out)
+            self.assertEqual(
+                Cabinet.objects.filter(project=self.project).count(), 6)
+            with self.assertRaises(CommandError):
+                call_command('import_cabinets', 0, path)
+
+        user = User.objects.create_user('estimator', password='12345')
+        self.client.force_login(user)
+        url = reverse('cabinet_import', kwargs={
+            'proj_id': self.project.id, 'room_id': self.room.id})
+        res = self.client.get(url)
+        self.assertEqual(res.status_code, 200)
+        upload = self.schedule(self.good_rows(2) + [
+            ['Light Maple', 12, 30, 24, 1, 2, '', '', '']])
+        upload.name = 'plan.csv'
+        res = self.client.post(url, {'schedule': upload})
+        self.assertEqual(res.context['result'].cabinets, 2)
+        self.assertContains(res, 'No specification named')
+        upload = BytesIO(b'x')
+        upload.name = 'plan.txt'
+        res = self.client.post(url, {'schedule': upload})
+        self.assertIsNone(res.context['result'])
+        self.assertContains(res, '.csv or .xlsx')
+        self.project.refresh_from_db()
+        self.assertEqual(verify_project(self.project), [])
@@ -0,0 +1,59 @@
+from django.contrib.auth.models import User
+from django.db import IntegrityError
+from django.test import TestCase
+from django.urls import reverse
+from .models import Project, Cabinet
+from .cabinet_numbers import reserve_cabinet_numbers
+from .tests_models import get_project_info
+from .tests_utils import create_rates, create_random_cabinets
+
+
+class CabinetNumberTest(TestCase):
+    def setUp(self):
+        create_rates()
+        self.project = Project.objects.create(**get_project_info())
+
+    def test_reserve(self):
+        self.assertEqual(reserve_cabinet_numbers(self.project.id), 1)
+        self.assertEqual(reserve_cabinet_numbers(self.project.id, 5), 2)
+        self.assertEqual(reserve_cabinet_numbers(self.project.id), 7)
+        other = Project.objects.create(**get_project_info())
+        self.assertEqual(reserve_cabinet_numbers(other.id), 1)
+        with self.assertRaises(ValueError):
+            reserve_cabinet_numbers(self.project.id, 0)
+
+    def test_counter_starts_after_existing_cabinets(self):
+        create_random_cabinets(self.project, 10)
+        self.assertEqual(reserve_cabinet_numbers(self.project.id, 3), 11)
+        self.assertEqual(self.project.cabinet_counter.last_number, 13)
+
+    def test_numbers_are_unique(self):
+        create_random_cabinets(self.project, 2)
+        cabinet = Cabinet.objects.get(
+            project=self.project, cabinet_number=2)
+        cabinet.pk = None
+        with self.assertRaises(IntegrityError):
+            cabinet.save()
+
+    def test_cabinet_create(self):
+        create_random_cabinets(self.project, 2)
+        cabinet = Cabinet.objects.get(
+            project=self.project, cabinet_number=2)
+        user = User.objects.create_user('estimator', password='12345')
+        self.client.force_login(user)
+        url = reverse('cabinet_create', kwargs={
+            'proj_id': self.project.id, 'room_id': cabinet.room_id})
+        data = {
+            'specification': cabinet.specification_id,
+            'width': 24, 'height': 30, 'depth': 12,
+            'number_of_doors': 1, 'number_of_shelves': 1,
+            'form-TOTAL_FORMS': 0, 'form-INITIAL_FORMS': 0,
+        }
+        self.client.post(url, data)
+        # a deleted number is not handed out again
+        Cabinet.objects.get(project=self.project, cabinet_number=3).delete()
+        self.client.post(url, data)
+        self.assertEqual(
+            list(self.project.cabinets.values_list(
+                'cabinet_number', flat=True)),
+            [1, 2, 4])
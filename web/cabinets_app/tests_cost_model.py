@@ -0,0 +1,76 @@
+from decimal import Decimal
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from .models import Material, Labor, Project, Cabinet, Drawer
+from .cost_model import CostInputs, build_cost_model
+from .price_cache import cached_cost_models
+from .tests_utils import create_rates, create_priced_project
+
+
+class CostModelTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        create_rates()
+        self.project = create_priced_project()
+        self.model = build_cost_model(self.project)
+        self.inputs = CostInputs.load([self.model])
+        # rounding each drawer and body can move the invoice half a cent
+        self.lines = Cabinet.objects.filter(project=self.project).count()
+        self.lines += Drawer.objects.filter(
+            cabinet__project=self.project).count()
+
+    def assertCloseToInvoice(self, price):
+        self.project = Project.objects.get(pk=self.project.pk)
+        self.assertLessEqual(
+            abs(price - self.project.price), Decimal('0.005') * self.lines)
+
+    def test_current_inputs(self):
+        self.assertCloseToInvoice(self.model.price(self.inputs))
+        self.assertEqual(self.model.labor_units, {
+            'Cabinet': 6, 'Door': 6, 'Drawer': 6})
+
+    def test_hourly_rate(self):
+        price = self.model.price(self.inputs.what_if(hourly_rate=95))
+        self.project.hourly_rate = 95
+        self.project.save()
+        self.assertCloseToInvoice(price)
+
+    def test_material_cost(self):
+        material = Material.objects.get()
+        price = self.model.price(self.inputs.what_if(
+            materials={material.id: Decimal('1.08')}))
+        material.sheet_cost = Decimal('129.60')
+        material.save()
+        self.assertCloseToInvoice(price)
+
+    def test_labor_minutes(self):
+        price = self.model.price(self.inputs.what_if(
+            labor_minutes={'Door': 90}))
+        Labor.objects.filter(item_name='Door').update(minutes=90)
+        self.assertCloseToInvoice(price)
+
+    def test_cached(self):
+        cached_cost_models([self.project])
+        with self.assertNumQueries(0):
+            models = cached_cost_models([self.project])
+        self.assertEqual(
+            models[self.project.id].material_areas,
+            self.model.material_areas)
+
+    def test_what_if_command(self):
+        out = StringIO()
+        call_command(
+            'what_if', '--material', 'Select Cherry', '8',
+            '--hourly-rate', '95', stdout=out)
+        self.assertIn('1 projects evaluated', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('what_if', '--material', 'Walnut', '8', stdout=out)
+        for args in (('--material', 'Select Cherry', 'eight'),
+                     ('--material', 'Select Cherry', 'nan'),
+                     ('--labor', 'Door', '4.5')):
+            with self.subTest(args), self.assertRaises(CommandError):
+                call_command('what_if', *args, stdout=out)
@@ -0,0 +1,119 @@
+import csv
+import os
+import random
+import tempfile
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.urls import reverse
+from .models import Cabinet
+from .cutlist import Panel, pack, project_cut_lists
+from . import parts
+from .tests_utils import create_rates, create_priced_project
+
+
+class CutListTest(TestCase):
+
+    def assertNoOverlap(self, cut_list):
+        kerf = cut_list.kerf
+        for sheet in cut_list.sheets:
+            placed = sheet.placements
+            for p in placed:
+                self.assertLessEqual(p.x + p.width, cut_list.sheet_width)
+                self.assertLessEqual(p.y + p.length, cut_list.sheet_length)
+            for i, a in enumerate(placed):
+                for b in placed[i + 1:]:
+                    self.assertTrue(
+                        a.x + a.width + kerf <= b.x or
+                        b.x + b.width + kerf <= a.x or
+                        a.y + a.length + kerf <= b.y or
+                        b.y + b.length + kerf <= a.y, (a, b))
+
+    def test_quarters_fill_a_sheet(self):
+        panels = [Panel(4800, 2400, 'quarter')] * 4
+        cut_list = pack(panels, 9600, 4800)
+        self.assertEqual(cut_list.sheet_count, 1)
+        self.assertEqual(cut_list.utilization, 1)
+        self.assertNoOverlap(cut_list)
+
+    def test_kerf(self):
+        panels = [Panel(4800, 2400, 'quarter')] * 4
+        # only three turned panels fit along a sheet with a kerf
+        cut_list = pack(panels, 9600, 4800, kerf=13)
+        self.assertEqual(cut_list.sheet_count, 2)
+        panels = [Panel(4790, 2390, 'quarter')] * 4
+        cut_list = pack(panels, 9600, 4800, kerf=13)
+        self.assertEqual(cut_list.sheet_count, 1)
+        self.assertNoOverlap(cut_list)
+
+    def test_grain(self):
+        panels = [Panel(4800, 4000, 'lengthwise')] * 2
+        self.assertEqual(
+            pack(panels, 9600, 4800, grain=True).sheet_count, 1)
+        # crosswise panels only fit if they can turn
+        panels = [Panel(2000, 9000, 'crosswise')] * 2
+        self.assertEqual(pack(panels, 9600, 4800).sheet_count, 1)
+        cut_list = pack(panels, 9600, 4800, grain=True)
+        self.assertEqual(cut_list.sheet_count, 0)
+        self.assertEqual(len(cut_list.oversize), 2)
+
+    def test_random_panels(self):
+        rng = random.Random(14)
+        panels = [
+            Panel(rng.randint(300, 9000), rng.randint(300, 4000), n)
+            for n in range(300)
+        ]
+        cut_list = pack(panels, 9600, 4800, kerf=13)
+        self.assertEqual(cut_list.panel_count, 300)
+        self.assertNoOverlap(cut_list)
+        area = sum(p.length * p.width for p in panels)
+        self.assertLess(cut_list.sheet_count, area / (9600 * 4800) * 1.5)
+
+    def test_project_cut_lists(self):
+        create_rates()
+        project = create_priced_project(rooms=2, cabinets_per_room=3)
+        [(material, cut_list)] = project_cut_lists(project)
+        self.assertEqual(material.name, 'Select Cherry')
+        panels = sum(
+            part.quantity
+            for cabinet in Cabinet.objects.filter(project=project)
+            for part in parts.cabinet_parts(
+                cabinet, cabinet.drawers.all()))
+        self.assertEqual(cut_list.panel_count, panels)
+        self.assertNoOverlap(cut_list)
+
+    def test_view(self):
+        create_rates()
+        project = create_priced_project(rooms=1, cabinets_per_room=2)
+        user = User.objects.create_user('estimator', password='12345')
+        self.client.force_login(user)
+        url = reverse('project_cut_list', kwargs={'proj_id': project.id})
+        res = self.client.get(url, {'kerf': '0.125', 'grain': '1'})
+        self.assertContains(res, 'Select Cherry')
+        self.assertContains(res, 'Sheet 1')
+        res = self.client.get(url, {'kerf': 'wide'})
+        self.assertEqual(res.status_code, 404)
+
+    def test_nest_batch(self):
+        create_rates()
+        first = create_priced_project(rooms=1, cabinets_per_room=3)
+        second = create_priced_project(rooms=2, cabinets_per_room=2)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'nest.csv')
+            out = StringIO()
+            call_command(
+                'nest_batch', path, project=[first.id, second.id],
+                workers=2, stdout=out)
+            with open(path, newline='') as f:
+                rows = list(csv.DictReader(f))
+        [(material, cut_list)] = project_cut_lists(first)
+        panels = cut_list.panel_count
+        [(material, cut_list)] = project_cut_lists(second)
+        panels += cut_list.panel_count
+        self.assertEqual(len(rows), panels)
+        self.assertEqual({row['material'] for row in rows}, {'Select Cherry'})
+        self.assertIn('yield', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('nest_batch', path, project=[0])
@@ -0,0 +1,71 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from .models import Project, Cabinet, Drawer, Room
+from .factories import generate_account
+from .pricing import price_project
+
+
+class BenchmarkTest(TestCase):
+
+    def test_generate_account(self):
+        account = generate_account(
+            projects=2, rooms=3, cabinets=4, drawers=2, seed=7)
+        cabinets = Cabinet.objects.filter(project__account=account)
+        self.assertEqual(Project.objects.filter(account=account).count(), 2)
+        self.assertEqual(
+            Room.objects.filter(project__account=account).count(), 6)
+        self.assertEqual(cabinets.count(), 24)
+        self.assertEqual(
+            Drawer.objects.filter(cabinet__project__account=account).count(),
+            48)
+        numbers = cabinets.filter(project=account.projects.first())
+        self.assertEqual(
+            sorted(numbers.values_list('cabinet_number', flat=True)),
+            list(range(1, 13)))
+        self.assertGreater(price_project(account.projects.first()).total, 0)
+
+        # the same seed gives the same cabinets
+        again = generate_account(
+            projects=2, rooms=3, cabinets=4, drawers=2, seed=7)
+        fields = ('cabinet_number', 'width', 'height', 'depth',
+                  'number_of_doors', 'finished_left_end')
+        self.assertEqual(
+            list(cabinets.order_by('pk').values_list(*fields)),
+            list(Cabinet.objects.filter(
+                project__account=again).order_by('pk').values_list(*fields)))
+
+    def test_benchmark_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench.json')
+            out = StringIO()
+            call_command(
+                'benchmark', path, scales=[40], projects=2, rooms=2,
+                repeat=2, stdout=out)
+            with open(path) as f:
+                results = json.load(f)
+            [scale] = results['scales']
+            self.assertEqual(scale['cabinets'], 40)
+            self.assertEqual(set(scale['benchmarks']), {
+                'Project.price', 'project_home', 'cabinet_detail',
+                'account'})
+            self.assertEqual(
+                scale['benchmarks']['Project.price']['queries'], 5)
+            self.assertGreater(
+                scale['benchmarks']['project_home']['peak_bytes'], 0)
+            # the generated rows are rolled back
+            self.assertFalse(Cabinet.objects.exists())
+
+            out = StringIO()
+            call_command(
+                'benchmark', os.path.join(directory, 'again.json'),
+                scales=[40], projects=2, rooms=2, repeat=1, compare=path,
+                stdout=out)
+            self.assertIn('queries', out.getvalue())
+            self.assertIn('+0 queries', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('benchmark', '-', scales=[3], projects=2, rooms=2)
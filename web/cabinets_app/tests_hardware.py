@@ -0,0 +1,65 @@
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from .models import Hardware, Cabinet, Room
+from .hardware import DRAWER_GUIDE, cabinet_counts, hardware_order
+from .tests_utils import create_rates, create_priced_project
+
+
+class HardwareOrderTest(TestCase):
+
+    def setUp(self):
+        create_rates()
+        Hardware.objects.create(
+            name=DRAWER_GUIDE, cost_per='24.35', unit_type='Pair',
+            markup='0.15')
+        # cabinets have 1 door each and 0, 1 and 2 drawers
+        self.project = create_priced_project(rooms=2, cabinets_per_room=3)
+        self.cabinets = Cabinet.objects.filter(project=self.project)
+
+    def test_counts(self):
+        with self.assertNumQueries(1):
+            counts = cabinet_counts(self.cabinets)
+        self.assertEqual(counts, {'doors': 6, 'drawers': 6})
+        self.assertEqual(
+            cabinet_counts(Cabinet.objects.none()),
+            {'doors': 0, 'drawers': 0})
+
+    def test_order(self):
+        hinges, guides = hardware_order(self.cabinets)
+        self.assertEqual(hinges.hardware.name, 'Blum 110+ Hinge')
+        self.assertEqual(hinges.quantity, 12)
+        self.assertEqual(hinges.extended_cost, Decimal('33.00'))
+        self.assertEqual(hinges.marked_up, Decimal('39.60'))
+        self.assertEqual(guides.quantity, 6)
+        self.assertEqual(guides.extended_cost, Decimal('146.10'))
+        self.assertEqual(guides.marked_up, Decimal('168.02'))
+
+    def test_order_in_unit_type(self):
+        Hardware.objects.filter(name='Blum 110+ Hinge').update(
+            unit_type='Pair', cost_per='5.50')
+        Hardware.objects.filter(name=DRAWER_GUIDE).update(unit_type='Each')
+        hinges, guides = hardware_order(self.cabinets)
+        self.assertEqual(hinges.quantity, 6)
+        self.assertEqual(hinges.extended_cost, Decimal('33.00'))
+        self.assertEqual(guides.quantity, 12)
+        Hardware.objects.filter(name=DRAWER_GUIDE).update(unit_type='Set')
+        hinges, guides = hardware_order(self.cabinets)
+        self.assertEqual(guides.quantity, 6)
+
+    def test_view(self):
+        user = User.objects.create_user('estimator', password='12345')
+        self.client.force_login(user)
+        url = reverse('account_hardware_order', kwargs={
+            'account_id': self.project.account.id})
+        room = Room.objects.filter(project=self.project).first()
+        res = self.client.get(url, {'room': room.id})
+        self.assertEqual(res.context['lines'][0].quantity, 6)
+        res = self.client.get(url, {'project': self.project.id,
+                                    'format': 'csv'})
+        lines = res.content.decode().splitlines()
+        self.assertEqual(lines[1].split(',')[:3],
+                         ['Blum 110+ Hinge', '12', 'each'])
+        res = self.client.get(url, {'project': 'all'})
+        self.assertEqual(res.status_code, 404)
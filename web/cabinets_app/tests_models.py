@@ -141,6 +141,17 @@ def get_hardware_info():
     }
 
 
+def get_labor_info(item_name='Cabinet', minutes=120):
+    """ Return dictionary for easy creation of Labor
+    E.g. labor = Labor.objects.create(**get_labor_info('Door', 60))
+    """
+    return {
+        'item_name': item_name,
+        'minutes': minutes,
+        'unit_type': 'Each',
+    }
+
+
 
 class AccountTest(TestCase):
 
@@ -267,6 +278,7 @@ class CabinetTest(TestCase):
     def test_cabinet_project_has_many_cabinets(self):
         one_cabinet = Cabinet.objects.create(**get_cabinet_info())
         two_cabinet_info = get_cabinet_info(one_cabinet.project)
+        two_cabinet_info['cabinet_number'] = 2
         two_cabinet = Cabinet.objects.create(**two_cabinet_info)
         self.assertEqual(len(one_cabinet.project.cabinets.all()), 2)
 
@@ -0,0 +1,65 @@
+from django.test import TestCase
+from .models import Cabinet
+from . import price_core
+from . import parts
+from .tests_utils import create_rates, create_priced_project
+
+
+class PartsListTest(TestCase):
+
+    def setUp(self):
+        parts.parts_memo.clear()
+        create_rates()
+        self.project = create_priced_project(rooms=1, cabinets_per_room=3)
+        self.cabinet = Cabinet.objects.get(
+            project=self.project, cabinet_number=3)
+        self.drawers = list(self.cabinet.drawers.all())
+
+    def test_areas_match_price_core(self):
+        cabinet = self.cabinet
+        areas = price_core.cabinet_areas(
+            price_core.hundredths(cabinet.width),
+            price_core.hundredths(cabinet.height),
+            price_core.hundredths(cabinet.depth),
+            cabinet.number_of_shelves, (
+                cabinet.finished_interior,
+                cabinet.finished_left_end,
+                cabinet.finished_right_end,
+                cabinet.finished_top,
+                cabinet.finished_bottom,
+            ))
+        self.assertEqual(parts.box_parts(cabinet).areas(), areas)
+
+    def test_cabinet_parts(self):
+        cabinet_parts = parts.cabinet_parts(self.cabinet, self.drawers)
+        self.assertEqual(set(cabinet_parts.drawers), {parts.BOX, 0, 1})
+        drawer = self.drawers[1]
+        self.assertEqual(
+            cabinet_parts.drawer_area(1),
+            price_core.drawer_area(
+                price_core.hundredths(self.cabinet.width),
+                price_core.hundredths(self.cabinet.depth),
+                price_core.hundredths(drawer.height)))
+        # one Material for the box and the drawers
+        self.assertEqual(
+            list(cabinet_parts.material_areas()), [drawer.material_id])
+        self.assertEqual(
+            sum(cabinet_parts.material_areas().values()),
+            sum(parts.box_parts(self.cabinet).areas()) +
+            cabinet_parts.drawer_area(0) + cabinet_parts.drawer_area(1))
+        door = [p for p in cabinet_parts if p.kind == price_core.DOOR][0]
+        self.assertTrue(door.exterior)
+        self.assertEqual(parts.PART_NAMES[door.kind], 'Door Face')
+
+    def test_memoized_by_value(self):
+        box = parts.box_parts(self.cabinet)
+        same = Cabinet.objects.get(pk=self.cabinet.pk)
+        self.assertIs(parts.box_parts(same), box)
+        same.width += 1
+        self.assertIsNot(parts.box_parts(same), box)
+        self.assertIs(
+            parts.drawer_parts(self.drawers[0]),
+            parts.drawer_parts(self.drawers[1]))
+
+    def test_prices_use_parts(self):
+        self.assertEqual(self.cabinet.price, self.cabinet.stored_price)
@@ -0,0 +1,547 @@
+import os
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from .models import (
+    Material, Hardware, Labor, Project, Cabinet, Drawer, Specification,
+    Room
+)
+from . import price_arrays, price_core
+from .cost_model import build_cost_models
+from .price_cache import cached_cost_models, project_revision
+from . import pricing
+from .memo import LRUMemo
+from .pricing import price_memo, price_project
+from .rates import RateTable, get_rate_table, rate_scope
+from .stored_prices import (
+    rebuild_projects, reprice_all_projects, reprice_cabinets, to_cents,
+    verify_project
+)
+from .tests_models import (
+    get_material_info, get_project_info, get_room_info, get_cabinet_info,
+    get_drawer_info, get_labor_info
+)
+from .tests_utils import (
+    create_rates, create_priced_project, create_random_cabinets,
+    run_on_commit
+)
+
+
+class PriceProjectTest(TestCase):
+
+    def setUp(self):
+        create_rates()
+
+    def test_single_cabinet_price(self):
+        project = create_priced_project(rooms=1, cabinets_per_room=2)
+        cabinet = Cabinet.objects.get(project=project, cabinet_number=2)
+        # box 210.70 plus one drawer at 27.00 + 16.875 labor, rounded up
+        self.assertEqual(cabinet.price, Decimal('254.58'))
+
+    def test_totals_match_properties(self):
+        project = create_priced_project()
+        prices = price_project(project)
+        self.assertEqual(prices.total, project.price)
+        for room in Room.objects.filter(project=project):
+            self.assertEqual(prices.rooms[room.id], room.price)
+        for cabinet in Cabinet.objects.filter(project=project):
+            self.assertEqual(prices.cabinets[cabinet.id], cabinet.price)
+        for drawer in Drawer.objects.filter(cabinet__project=project):
+            self.assertEqual(prices.drawers[drawer.id], drawer.price)
+
+    def test_price_of(self):
+        project = create_priced_project(rooms=1, cabinets_per_room=2)
+        prices = price_project(project)
+        room = Room.objects.get(project=project)
+        cabinet = Cabinet.objects.filter(project=project)[0]
+        self.assertEqual(prices.price_of(room), prices.rooms[room.id])
+        self.assertEqual(prices.price_of(cabinet), prices.cabinets[cabinet.id])
+        with self.assertRaises(TypeError):
+            prices.price_of(project)
+
+    def test_query_count_is_fixed(self):
+        small = create_priced_project(rooms=1, cabinets_per_room=1)
+        large = create_priced_project(rooms=4, cabinets_per_room=5)
+        # rooms, cabinets, drawers, labor, hinge
+        with self.assertNumQueries(5):
+            price_project(small)
+        with self.assertNumQueries(5):
+            price_project(large)
+
+    def test_empty_project(self):
+        project = Project.objects.create(**get_project_info())
+        with self.assertNumQueries(1):
+            prices = price_project(project)
+        self.assertEqual(prices.total, 0)
+
+
+class PriceCoreTest(TestCase):
+
+    def test_hundredths(self):
+        self.assertEqual(price_core.hundredths(Decimal('22.5')), 2250)
+        self.assertEqual(price_core.hundredths(22.5), 2250)
+        self.assertEqual(price_core.hundredths(0.29), 29)
+        self.assertEqual(price_core.hundredths('1.005'), 101)
+
+    def test_to_dollars(self):
+        self.assertEqual(str(price_core.to_dollars(25458)), '254.58')
+        self.assertEqual(str(price_core.to_dollars(5)), '0.05')
+
+    def test_divide_half_up(self):
+        self.assertEqual(price_core.divide_half_up(5, 10), 1)
+        self.assertEqual(price_core.divide_half_up(4, 10), 0)
+        self.assertEqual(price_core.divide_half_up(15, 10), 2)
+
+    def test_drawer_cents(self):
+        # 936 sq in at a cent each, plus 15 minutes at 67.50 = 2623.5
+        material = price_core.material_cost(4608, 0, 4800, 9600)
+        cents = price_core.drawer_cents(
+            width=2400, depth=1200, height=900,
+            material=material, minutes=15, rate=6750)
+        self.assertEqual(cents, 2624)
+
+    def test_body_is_exact(self):
+        # six 1 sq in panels at 100/3 cents each, plus 6/5 waste
+        material = price_core.material_cost(100, 0, 300, 100)
+        body = price_core.cabinet_body_cents(
+            width=100, height=100, depth=100, doors=0, shelves=0,
+            finished=(False,) * 5, interior=material, exterior=material,
+            cabinet_minutes=0, door_minutes=0, hinge_cost=0, rate=0)
+        self.assertEqual(body, 240)
+
+
+class PriceMemoTest(TestCase):
+
+    def setUp(self):
+        price_memo.clear()
+        create_rates()
+
+    def test_identical_cabinets_priced_once(self):
+        project = create_priced_project(rooms=1, cabinets_per_room=1)
+        room = Room.objects.get(project=project)
+        cabinet = Cabinet.objects.get(project=project)
+        for number in range(2, 11):
+            info = get_cabinet_info(project, cabinet.specification, room)
+            info['cabinet_number'] = number
+            copy = Cabinet.objects.create(**info)
+            copy.width = cabinet.width
+            copy.finished_left_end = cabinet.finished_left_end
+            copy.save()
+        price_memo.clear()
+        body_price = mock.patch.object(
+            Cabinet, 'calculate_body_price', autospec=True,
+            side_effect=Cabinet.calculate_body_price)
+        with body_price as calculate:
+            prices = price_project(project)
+        self.assertEqual(calculate.call_count, 1)
+        self.assertEqual(prices.total, cabinet.price * 10)
+
+    def test_drawer_order_does_not_matter(self):
+        project = create_priced_project(rooms=1, cabinets_per_room=3)
+        cabinet = Cabinet.objects.get(project=project, cabinet_number=3)
+        drawers = list(cabinet.drawers.all())
+        drawers[0].height = 9
+        drawers[0].save()
+        forward = pricing.cabinet_key(
+            cabinet, [pricing.drawer_key(d) for d in drawers],
+            get_rate_table())
+        backward = pricing.cabinet_key(
+            cabinet, [pricing.drawer_key(d) for d in reversed(drawers)],
+            get_rate_table())
+        self.assertEqual(forward, backward)
+
+    def test_lru(self):
+        memo = LRUMemo(2)
+        memo.put('a', 1)
+        memo.put('b', 2)
+        memo.get('a')
+        memo.put('c', 3)
+        self.assertEqual(len(memo), 2)
+        self.assertIsNone(memo.get('b'))
+        self.assertEqual(memo.get('a'), 1)
+
+    def test_catalog_write_clears(self):
+        project = create_priced_project(rooms=1, cabinets_per_room=2)
+        price_project(project)
+        self.assertNotEqual(len(price_memo), 0)
+        labor = Labor.objects.get(item_name='Drawer')
+        labor.minutes = 20
+        labor.save()
+        # only the cabinets repriced by the save are left, at the new rates
+        rates = get_rate_table().key
+        self.assertTrue(all(key[0] == rates for key in price_memo._entries))
+
+
+class RateTableTest(TestCase):
+
+    def setUp(self):
+        create_rates()
+
+    def test_lookups(self):
+        rates = RateTable.load()
+        self.assertEqual(rates.labor_minutes('Door'), 60)
+        self.assertEqual(rates.hardware_cost('Blum 110+ Hinge'),
+                         Decimal('2.75'))
+        with self.assertRaises(Labor.DoesNotExist):
+            rates.labor_minutes('Crown')
+        with self.assertRaises(Hardware.DoesNotExist):
+            rates.hardware_cost('Blum 563 UM Guide')
+
+    def test_scope_loads_once(self):
+        project = create_priced_project()
+        with rate_scope():
+            with self.assertNumQueries(5):
+                price_project(project)
+            with self.assertNumQueries(3):
+                price_project(project)
+
+    def test_save_invalidates_scope(self):
+        with rate_scope():
+            self.assertEqual(get_rate_table().labor_minutes('Cabinet'), 120)
+            labor = Labor.objects.get(item_name='Cabinet')
+            labor.minutes = 90
+            labor.save()
+            self.assertEqual(get_rate_table().labor_minutes('Cabinet'), 90)
+        with self.assertNumQueries(2):
+            get_rate_table()
+
+
+class StoredPriceTest(TestCase):
+
+    def setUp(self):
+        create_rates()
+        self.project = create_priced_project()
+
+    def assertStoredPricesValid(self):
+        self.project.refresh_from_db()
+        self.assertEqual(verify_project(self.project), [])
+
+    def test_created_totals(self):
+        self.assertStoredPricesValid()
+        self.assertEqual(self.project.stored_price, to_cents(sum(
+            to_cents(cab.price)
+            for cab in Cabinet.objects.filter(project=self.project))))
+        room = Room.objects.filter(project=self.project)[0]
+        self.assertEqual(room.stored_drawer_count, 3)
+
+    def test_cabinet_update_and_delete(self):
+        cabinet = Cabinet.objects.filter(project=self.project)[0]
+        cabinet.width = 30
+        cabinet.finished_interior = True
+        cabinet.save()
+        self.assertStoredPricesValid()
+        Cabinet.objects.filter(project=self.project).last().delete()
+        self.assertStoredPricesValid()
+
+    def test_cabinet_moves_room(self):
+        cabinet = Cabinet.objects.filter(project=self.project).last()
+        cabinet.room = Room.objects.create(**get_room_info(self.project))
+        cabinet.save()
+        self.assertStoredPricesValid()
+
+    def test_drawer_add_and_delete(self):
+        cabinet = Cabinet.objects.filter(project=self.project)[0]
+        Drawer.objects.create(
+            **get_drawer_info(cabinet, Material.objects.get()))
+        self.assertStoredPricesValid()
+        Drawer.objects.filter(cabinet__project=self.project)[0].delete()
+        self.assertStoredPricesValid()
+
+    def test_room_delete(self):
+        Room.objects.filter(project=self.project)[0].delete()
+        self.assertStoredPricesValid()
+        self.assertNotEqual(self.project.stored_price, 0)
+
+    def test_catalog_changes(self):
+        material = Material.objects.get()
+        material.sheet_cost = 150
+        material.save()
+        self.assertStoredPricesValid()
+        labor = Labor.objects.get(item_name='Drawer')
+        labor.minutes = 20
+        with run_on_commit():
+            labor.save()
+        self.assertStoredPricesValid()
+        self.project.hourly_rate = Decimal('95.00')
+        self.project.save()
+        self.assertStoredPricesValid()
+
+    @skipUnlessDBFeature('has_select_for_update_of')
+    def test_reprice_locks_cabinets(self):
+        with CaptureQueriesContext(connection) as queries:
+            reprice_cabinets(Cabinet.objects.filter(project=self.project))
+        self.assertTrue(any(
+            'FOR UPDATE' in query['sql'] for query in queries))
+
+    def test_unpriced_rates_do_not_reprice(self):
+        reprice = mock.patch(
+            'cabinets_app.signals.reprice_all_projects', autospec=True)
+        with run_on_commit(), reprice as reprice_all:
+            Labor.objects.create(**get_labor_info('Toe Kick', 10))
+            guide = Hardware.objects.create(
+                name='Blum 563 UM Guide', cost_per=12, unit_type='Pair',
+                markup=Decimal('0.20'))
+            guide.delete()
+            reprice_all.assert_not_called()
+            # renamed into pricing
+            labor = Labor.objects.get(item_name='Toe Kick')
+            labor.item_name = 'Door'
+            labor.save()
+            reprice_all.assert_called_once_with()
+        with run_on_commit():
+            labor.delete()
+        self.assertStoredPricesValid()
+
+    def test_rate_change_waits_for_commit(self):
+        before = dict(Cabinet.objects.values_list('pk', 'stored_price'))
+        Labor.objects.filter(item_name='Cabinet').get().delete()
+        # the test's transaction never commits
+        self.assertEqual(
+            dict(Cabinet.objects.values_list('pk', 'stored_price')), before)
+        reprice_all_projects()
+        self.assertStoredPricesValid()
+        self.assertEqual(
+            set(Cabinet.objects.values_list('stored_price', flat=True)),
+            {0})
+
+    def test_spec_and_material_delete(self):
+        Specification.objects.get(project=self.project).delete()
+        self.assertStoredPricesValid()
+        self.assertEqual(self.project.stored_price, 0)
+
+    def test_stale_instance_save_keeps_totals(self):
+        room = Room.objects.filter(project=self.project)[0]
+        stale = Room.objects.get(pk=room.pk)
+        Drawer.objects.create(**get_drawer_info(
+            room.cabinets.all()[0], Material.objects.get()))
+        stale.name = 'Pantry'
+        stale.save()
+        self.assertStoredPricesValid()
+
+    def test_rebuild_prices_command(self):
+        Cabinet.objects.filter(project=self.project).update(stored_price=1)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_prices', '--verify-only',
+                         stdout=StringIO(), stderr=StringIO())
+        call_command('rebuild_prices', stdout=StringIO())
+        self.assertStoredPricesValid()
+
+    def test_rebuild_projects(self):
+        other = Project.objects.create(**get_project_info())
+        create_random_cabinets(other, 40)
+        Room.objects.create(**get_room_info(other))
+        Cabinet.objects.update(stored_price=1)
+        Room.objects.update(stored_price=1, stored_drawer_count=99)
+        rebuild_projects(Project.objects.all())
+        self.assertStoredPricesValid()
+        other.refresh_from_db()
+        self.assertEqual(verify_project(other), [])
+        # without the rates everything is stored at 0
+        Labor.objects.all().delete()
+        rebuild_projects([self.project])
+        self.assertStoredPricesValid()
+        self.assertEqual(self.project.stored_price, 0)
+
+    def test_dummy_data(self):
+        out = StringIO()
+        call_command('dummy_data', batch_size=7, stdout=out)
+        self.assertIn('rows/s', out.getvalue())
+        self.assertEqual(Project.objects.count(), 15)
+        self.assertEqual(Cabinet.objects.count(), 63)
+        self.assertEqual(Drawer.objects.count(), 46)
+        self.assertEqual(Labor.objects.count(), 15)
+        for project in Project.objects.all():
+            self.assertEqual(verify_project(project), [])
+        # loading again replaces everything
+        call_command('dummy_data', stdout=StringIO())
+        self.assertEqual(Cabinet.objects.count(), 63)
+        with self.assertRaises(CommandError):
+            call_command('dummy_data', copy=True, stdout=StringIO())
+
+    def test_dummy_data_bad_name(self):
+        source = os.path.join(settings.BASE_DIR, 'dummy_data')
+        with tempfile.TemporaryDirectory() as directory:
+            for name in os.listdir(source):
+                with open(os.path.join(source, name), 'rb') as f:
+                    data = f.read()
+                if name == 'dummy_specs.csv':
+                    data = data.replace(b'Smith Residence', b'Jones House')
+                with open(os.path.join(directory, name), 'wb') as f:
+                    f.write(data)
+            with self.assertRaisesRegex(CommandError, "No Project 'Jones"):
+                call_command('dummy_data', dir=directory, stdout=StringIO())
+        # the load is one transaction
+        self.assertTrue(Cabinet.objects.filter(project=self.project).exists())
+
+
+class MaterialRepriceTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        create_rates()
+        self.project = create_priced_project()
+        self.other = create_priced_project(rooms=1, cabinets_per_room=1)
+        self.material = Material.objects.get(
+            interior_specifications__project=self.project)
+
+    def test_report(self):
+        self.material.sheet_cost = 150
+        self.material.save()
+        report = self.material.reprice_report
+        self.assertEqual(report.cabinets, 6)
+        self.assertEqual(report.drawers, 6)
+        self.assertEqual(report.changed, 6)
+        self.assertEqual(report.rooms, 2)
+        self.assertEqual(report.project_ids, {self.project.id})
+        self.project.refresh_from_db()
+        self.assertEqual(verify_project(self.project), [])
+
+    def test_other_fields_do_not_reprice(self):
+        self.material.name = 'Rift Oak'
+        self.material.save()
+        self.assertIsNone(self.material.reprice_report)
+
+    def test_other_projects_stay_cached(self):
+        cached_cost_models([self.other])
+        self.material.markup = Decimal('0.5')
+        self.material.save()
+        with self.assertNumQueries(0):
+            cached_cost_models([self.other])
+
+    def test_material_update_view(self):
+        user = User.objects.create_user('estimator', password='12345')
+        self.client.force_login(user)
+        data = get_material_info()
+        data['sheet_cost'] = 150
+        res = self.client.post(reverse('material_update', kwargs={
+            'material_id': self.material.id}), data, follow=True)
+        self.assertContains(res, 'Repriced 6 cabinets and 6 drawers')
+
+
+class WithPriceTest(TestCase):
+
+    def setUp(self):
+        create_rates()
+        self.project = create_priced_project()
+
+    def test_cabinet_with_price(self):
+        cabinets = Cabinet.objects.filter(project=self.project).with_price()
+        for cabinet in cabinets:
+            self.assertAlmostEqual(
+                cabinet.calculated_price, cabinet.price, places=2)
+
+    def test_room_and_project_with_price(self):
+        for room in Room.objects.filter(project=self.project).with_price():
+            self.assertAlmostEqual(room.calculated_price, room.price, places=2)
+        project = Project.objects.with_price().get(pk=self.project.pk)
+        self.assertAlmostEqual(
+            project.calculated_price, self.project.price, places=2)
+
+    def test_one_query(self):
+        with self.assertNumQueries(1):
+            list(Project.objects.with_price())
+
+    def test_empty_room(self):
+        room = Room.objects.create(**get_room_info(self.project))
+        room = Room.objects.with_price().get(pk=room.pk)
+        self.assertEqual(room.calculated_price, 0)
+
+
+class PriceCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        create_rates()
+        self.project = create_priced_project(rooms=1, cabinets_per_room=2)
+
+    def areas(self):
+        return cached_cost_models([self.project])[
+            self.project.id].material_areas
+
+    def test_cached_until_project_write(self):
+        areas = self.areas()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.areas(), areas)
+        cabinet = Cabinet.objects.filter(project=self.project)[0]
+        cabinet.width = 30
+        cabinet.save()
+        self.assertEqual(
+            self.areas(),
+            build_cost_models([self.project])[
+                self.project.id].material_areas)
+        self.assertNotEqual(self.areas(), areas)
+
+    def test_evicted_revision(self):
+        areas = self.areas()
+        Cabinet.objects.filter(project=self.project).update(width=30)
+        cache.delete(project_revision(self.project.id))
+        self.assertNotEqual(self.areas(), areas)
+
+    def test_cabinet_detail(self):
+        user = User.objects.create_user('estimator', password='12345')
+        self.client.force_login(user)
+        cabinet = Cabinet.objects.get(project=self.project, cabinet_number=2)
+        res = self.client.get(reverse('cabinet_detail', kwargs={
+            'proj_id': self.project.id, 'cab_id': cabinet.id}))
+        self.assertContains(res, '$254.58')
+
+    def test_cabinet_detail_without_material(self):
+        user = User.objects.create_user('estimator', password='12345')
+        self.client.force_login(user)
+        cabinet = Cabinet.objects.get(project=self.project, cabinet_number=2)
+        spec = cabinet.specification
+        spec.interior_material = None
+        spec.save()
+        res = self.client.get(reverse('cabinet_detail', kwargs={
+            'proj_id': self.project.id, 'cab_id': cabinet.id}))
+        self.assertContains(res, '$0.00')
+        self.assertContains(res, 'Drawers (1)')
+
+
+class PriceArraysTest(TestCase):
+
+    def setUp(self):
+        create_rates()
+        self.project = Project.objects.create(**get_project_info())
+        create_random_cabinets(self.project, 150)
+
+    def assertMatchesScalar(self, arrays):
+        prices = arrays.prices()
+        self.assertEqual(len(prices), 150)
+        for cabinet in Cabinet.objects.filter(project=self.project):
+            self.assertEqual(prices[cabinet.id], to_cents(cabinet.price))
+
+    def test_parity_with_decimal_prices(self):
+        self.assertMatchesScalar(
+            price_arrays.price_projects_arrays([self.project]))
+
+    def test_half_cent_fallback(self):
+        with mock.patch.object(price_arrays, 'HALF_CENT_TOLERANCE', 0.6):
+            self.assertMatchesScalar(
+                price_arrays.price_projects_arrays([self.project]))
+
+    def test_totals(self):
+        arrays = price_arrays.price_projects_arrays([self.project])
+        prices = arrays.prices()
+        self.assertEqual(
+            arrays.project_totals()[self.project.id], sum(prices.values()))
+        for room in Room.objects.filter(project=self.project):
+            pks = room.cabinets.values_list('pk', flat=True)
+            self.assertEqual(
+                arrays.room_totals()[room.id], sum(prices[pk] for pk in pks))
+
+    def test_unpriceable_cabinet(self):
+        cabinet = Cabinet.objects.filter(project=self.project)[0]
+        Cabinet.objects.filter(pk=cabinet.pk).update(specification=None)
+        prices = price_arrays.price_projects_arrays([self.project]).prices()
+        self.assertEqual(prices[cabinet.id], 0)
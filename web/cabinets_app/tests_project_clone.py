@@ -0,0 +1,88 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from .models import Account, Project, Cabinet, Drawer, Specification
+from .project_clone import clone_project
+from .pricing import price_project
+from .stored_prices import rebuild_project, verify_project
+from .tests_models import get_account_info, get_project_info
+from .tests_utils import create_rates, create_random_cabinets
+
+
+class ProjectCloneTest(TestCase):
+
+    def setUp(self):
+        create_rates()
+        self.project = Project.objects.create(**get_project_info())
+        create_random_cabinets(self.project, 60)
+        rebuild_project(self.project)
+        self.project.refresh_from_db()
+
+    def test_clone(self):
+        clone = clone_project(self.project)
+        self.assertEqual(clone.name, 'remodel (copy)')
+        self.assertEqual(clone.account, self.project.account)
+        self.assertEqual(clone.stored_price, self.project.stored_price)
+        self.assertEqual(verify_project(clone), [])
+        fields = ('room__name', 'specification__name', 'cabinet_number',
+                  'width', 'stored_price')
+        self.assertEqual(
+            list(Cabinet.objects.filter(
+                project=clone).order_by('pk').values_list(*fields)),
+            list(Cabinet.objects.filter(
+                project=self.project).order_by('pk').values_list(*fields)))
+        self.assertEqual(
+            Drawer.objects.filter(cabinet__project=clone).count(),
+            Drawer.objects.filter(cabinet__project=self.project).count())
+        self.assertFalse(Cabinet.objects.filter(
+            project=clone, room__project=self.project).exists())
+        self.assertFalse(Cabinet.objects.filter(
+            project=clone, specification__project=self.project).exists())
+        self.assertEqual(price_project(clone).total, self.project.price)
+        # the original is untouched
+        self.assertEqual(verify_project(self.project), [])
+
+    def test_other_projects_specification(self):
+        other = Project.objects.create(**get_project_info())
+        spec = Specification.objects.filter(project=self.project)[0]
+        spec.pk = None
+        spec.project = other
+        spec.save()
+        cabinet = Cabinet.objects.filter(project=self.project)[0]
+        cabinet.specification = spec
+        cabinet.save()
+        self.project.refresh_from_db()
+        clone = clone_project(self.project)
+        copy = Cabinet.objects.get(
+            project=clone, cabinet_number=cabinet.cabinet_number)
+        self.assertIsNone(copy.specification)
+        self.assertEqual(copy.stored_price, 0)
+        self.assertEqual(
+            clone.stored_price,
+            self.project.stored_price - cabinet.stored_price)
+        self.assertEqual(verify_project(clone), [])
+
+    def test_query_count_is_fixed(self):
+        small = Project.objects.create(**get_project_info())
+        create_random_cabinets(small, 5)
+        with CaptureQueriesContext(connection) as queries:
+            clone_project(small)
+        with self.assertNumQueries(len(queries)):
+            clone_project(self.project)
+
+    def test_clone_view(self):
+        user = User.objects.create_user('estimator', password='12345')
+        self.client.force_login(user)
+        other = Account.objects.create(**get_account_info())
+        url = reverse('project_clone', kwargs={'proj_id': self.project.id})
+        res = self.client.get(url)
+        self.assertContains(res, 'remodel (copy)')
+        res = self.client.post(url, {'name': 'Plan B', 'account': other.id})
+        clone = Project.objects.get(name='Plan B')
+        self.assertEqual(clone.account, other)
+        self.assertRedirects(
+            res, reverse('project_home', kwargs={'proj_id': clone.id}))
+        self.assertEqual(
+            clone.cabinets.count(), self.project.cabinets.count())
@@ -0,0 +1,108 @@
+import csv
+import datetime
+import os
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from .models import Labor, Project, Specification
+from .schedule import (
+    labor_totals, labor_uses, next_monday, project_labor, schedule
+)
+from .takeoff import project_takeoff
+from .tests_utils import create_rates, create_priced_project
+
+
+class ScheduleTest(TestCase):
+
+    def setUp(self):
+        create_rates()
+        # 3 cabinets, 3 doors and 3 drawers: 3 * (120 + 60 + 45) minutes
+        self.first = create_priced_project(rooms=1, cabinets_per_room=3)
+        self.second = create_priced_project(rooms=2, cabinets_per_room=3)
+        self.projects = Project.objects.order_by('pk')
+
+    def test_seeded_finishes_are_placed(self):
+        path = os.path.join(
+            settings.BASE_DIR, 'dummy_data', 'dummy_labor.csv')
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            Labor.objects.bulk_create([
+                Labor(item_name=row['Item_Name'], minutes=row['Minutes'],
+                      unit_type=row['Units'])
+                for row in csv.DictReader(f)
+                if row['Units'].lower() == 'sq ft'
+            ])
+        uses, unplaced = labor_uses()
+        self.assertEqual(unplaced, [])
+        finishes = {use.item_name: use.finish_level for use in uses}
+        self.assertEqual(
+            finishes['Stain, Glaze, & Distress'], 'Stain, Glaze & Distress')
+        Specification.objects.filter(project=self.first).update(
+            finish_level='Paint, Glaze & Distress')
+        labor = project_labor(self.projects, uses)
+        self.assertGreater(labor[self.first.id]['Paint, Glaze, & Distress'], 0)
+        self.assertEqual(labor[self.second.id]['Paint, Glaze, & Distress'], 0)
+
+    def test_project_labor(self):
+        uses, unplaced = labor_uses()
+        with self.assertNumQueries(1):
+            labor = project_labor(self.projects, uses)
+        self.assertEqual(labor[self.first.id], {
+            'Cabinet': 360, 'Door': 180, 'Drawer': 135})
+        self.assertEqual(labor_totals(labor), {
+            'Cabinet': 1080, 'Door': 540, 'Drawer': 405})
+
+    def test_every_unit_type(self):
+        Labor.objects.create(item_name='Shelf', minutes=5, unit_type='Each')
+        Labor.objects.create(item_name='Stain', minutes=8, unit_type='Sq Ft')
+        Labor.objects.create(
+            item_name='Toe Kick', minutes=10, unit_type='Each')
+        Specification.objects.filter(project=self.first).update(
+            finish_level='Stain')
+        uses, unplaced = labor_uses()
+        self.assertEqual(unplaced, ['Toe Kick'])
+        labor = project_labor(self.projects, uses)
+        # 3 shelves a cabinet
+        self.assertEqual(labor[self.first.id]['Shelf'], 45)
+        exterior = sum(
+            row.exterior for row in project_takeoff(self.first))
+        self.assertAlmostEqual(
+            labor[self.first.id]['Stain'], exterior * 8, delta=1)
+        self.assertEqual(labor[self.second.id]['Stain'], 0)
+
+        user = User.objects.create_user('estimator', password='12345')
+        self.client.force_login(user)
+        res = self.client.get(reverse('shop_schedule'))
+        self.assertContains(res, 'Toe Kick')
+        self.assertContains(res, 'Stain Hours')
+
+    def test_schedule(self):
+        labor = project_labor(self.projects)
+        monday = datetime.date(2026, 10, 19)
+        # 675 and 1350 minutes in 15 hour weeks
+        scheduled, weeks = schedule(self.projects, labor, 15, monday)
+        first, second = scheduled
+        self.assertEqual((first.start, first.finish), (monday, monday))
+        self.assertEqual(second.start, monday)
+        self.assertEqual(second.finish, monday + datetime.timedelta(weeks=2))
+        self.assertEqual(
+            [minutes for week, minutes in weeks], [900, 900, 225])
+        with self.assertRaises(ValueError):
+            schedule(self.projects, labor, 0)
+
+    def test_next_monday(self):
+        self.assertEqual(
+            next_monday(datetime.date(2026, 10, 18)),
+            datetime.date(2026, 10, 19))
+        self.assertEqual(
+            next_monday(datetime.date(2026, 10, 19)),
+            datetime.date(2026, 10, 26))
+
+    def test_view(self):
+        user = User.objects.create_user('estimator', password='12345')
+        self.client.force_login(user)
+        res = self.client.get(reverse('shop_schedule'), {'hours': '15'})
+        self.assertEqual(len(res.context['scheduled']), 2)
+        self.assertEqual(len(res.context['weeks']), 3)
+        res = self.client.get(reverse('shop_schedule'), {'hours': '-1'})
+        self.assertEqual(res.status_code, 404)
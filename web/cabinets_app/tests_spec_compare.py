@@ -0,0 +1,69 @@
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.urls import reverse
+from .models import Material, Specification
+from .rates import get_rate_table, rate_scope
+from .spec_compare import (
+    Alternative, compare_specifications, load_alternatives
+)
+from .tests_models import get_material_info
+from .tests_utils import create_rates, create_priced_project
+
+
+class SpecCompareTest(TestCase):
+
+    def setUp(self):
+        create_rates()
+        self.project = create_priced_project()
+        self.spec = Specification.objects.get(project=self.project)
+        info = get_material_info()
+        info.update(name='Melamine', sheet_cost=45, markup=0)
+        self.melamine = Material.objects.create(**info)
+
+    def test_current_matches_stored(self):
+        comparison = compare_specifications(self.project, [])
+        self.assertEqual(comparison.labels, ['Current'])
+        self.assertEqual(comparison.totals, [self.project.stored_price])
+        for room, totals in comparison.rooms:
+            self.assertEqual(totals, [room.stored_price])
+
+    def test_alternative_matches_saved_spec(self):
+        alternative = Alternative(
+            'Melamine', self.melamine, self.spec.exterior_material)
+        comparison = compare_specifications(self.project, [alternative])
+        self.project.refresh_from_db()
+        self.assertNotEqual(comparison.totals[1], self.project.stored_price)
+        self.spec.interior_material = self.melamine
+        self.spec.save()
+        self.project.refresh_from_db()
+        self.assertEqual(comparison.totals[1], self.project.stored_price)
+
+    def test_graph_loads_once(self):
+        alternatives = load_alternatives(
+            [self.spec.id], [(self.melamine.id, self.melamine.id)] * 3)
+        with rate_scope():
+            get_rate_table()
+            with self.assertNumQueries(3):
+                compare_specifications(self.project, alternatives)
+
+    def test_view(self):
+        user = User.objects.create_user('estimator', password='12345')
+        self.client.force_login(user)
+        url = reverse('spec_compare', kwargs={'proj_id': self.project.id})
+        res = self.client.get(url, {
+            'interior': self.melamine.id, 'exterior': self.melamine.id})
+        self.assertContains(res, 'Melamine / Melamine')
+        res = self.client.get(url, {'spec': 0})
+        self.assertEqual(res.status_code, 404)
+
+    def test_command(self):
+        out = StringIO()
+        call_command(
+            'compare_specs', self.project.id,
+            '--materials', self.melamine.id, self.melamine.id, stdout=out)
+        self.assertIn('Project Total', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('compare_specs', self.project.id, '--spec', '0')
@@ -0,0 +1,60 @@
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+from .models import Cabinet
+from . import parts
+from .takeoff import account_takeoff, project_takeoff
+from .tests_utils import create_rates, create_priced_project
+
+
+class TakeoffTest(TestCase):
+
+    def setUp(self):
+        create_rates()
+        self.project = create_priced_project(rooms=2, cabinets_per_room=3)
+
+    def test_matches_parts(self):
+        cabinets = Cabinet.objects.filter(project=self.project)
+        interior = exterior = drawer = 0
+        for cabinet in cabinets:
+            box = parts.box_parts(cabinet)
+            box_interior, box_exterior = box.areas()
+            interior += box_interior
+            exterior += box_exterior
+            for d in cabinet.drawers.all():
+                drawer += parts.drawer_parts(d).drawer_area(0)
+        with self.assertNumQueries(1):
+            [row] = project_takeoff(self.project)
+        self.assertEqual(row.name, 'Select Cherry')
+
+        def sq_ft(area):
+            return (Decimal(area) / 1440000).quantize(Decimal('0.01'))
+        self.assertEqual(row.interior, sq_ft(interior))
+        self.assertEqual(row.exterior, sq_ft(exterior))
+        self.assertEqual(row.drawer, sq_ft(drawer))
+
+    def test_account(self):
+        other = create_priced_project(rooms=1, cabinets_per_room=2)
+        other.account = self.project.account
+        other.save()
+        rows = account_takeoff(self.project.account)
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(
+            sum(row.total for row in rows),
+            project_takeoff(self.project)[0].total +
+            project_takeoff(other)[0].total)
+
+    def test_views(self):
+        user = User.objects.create_user('estimator', password='12345')
+        self.client.force_login(user)
+        url = reverse('project_takeoff', kwargs={'proj_id': self.project.id})
+        self.assertContains(self.client.get(url), 'Select Cherry')
+        res = self.client.get(url, {'format': 'csv'})
+        self.assertEqual(res['Content-Type'], 'text/csv')
+        lines = res.content.decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith('Select Cherry,'))
+        url = reverse('account_takeoff', kwargs={
+            'account_id': self.project.account.id})
+        self.assertContains(self.client.get(url), 'Select Cherry')
@@ -0,0 +1,102 @@
+""" Helpers shared by the test modules for creating priced rows
+"""
+import random
+from decimal import Decimal
+from unittest import mock
+from django.db import transaction
+from .models import (
+    Material, Hardware, Labor, Project, Cabinet, Drawer, Specification,
+    Room
+)
+from .bulk_insert import bulk_insert
+from .tests_models import (
+    get_material_info, get_project_info, get_spec_info, get_room_info,
+    get_cabinet_info, get_drawer_info, get_hardware_info, get_labor_info
+)
+
+
+def run_on_commit():
+    """ Run transaction.on_commit callbacks at once, since a TestCase
+    never commits
+    """
+    return mock.patch.object(transaction, 'on_commit', lambda func: func())
+
+
+def create_rates():
+    """ Create the Labor and Hardware rows used by Cabinet.price
+    """
+    Labor.objects.create(**get_labor_info('Cabinet', 120))
+    Labor.objects.create(**get_labor_info('Door', 60))
+    Labor.objects.create(**get_labor_info('Drawer', 45))
+    Hardware.objects.create(**get_hardware_info())
+
+
+def create_priced_project(rooms=2, cabinets_per_room=3):
+    """ Create a Project with Rooms, Cabinets and Drawers ready to price
+    Returns the Project refetched from the database.
+    """
+    project = Project.objects.create(**get_project_info())
+    material = Material.objects.create(**get_material_info())
+    spec = Specification.objects.create(
+        **get_spec_info(project, material, material))
+    for r in range(rooms):
+        room = Room.objects.create(**get_room_info(project))
+        for c in range(cabinets_per_room):
+            cabinet_info = get_cabinet_info(project, spec, room)
+            cabinet_info['cabinet_number'] = r * cabinets_per_room + c + 1
+            cabinet_info['width'] = 9 + c * 3
+            cabinet_info['finished_left_end'] = c % 2 == 0
+            cabinet = Cabinet.objects.create(**cabinet_info)
+            for d in range(c):
+                Drawer.objects.create(**get_drawer_info(cabinet, material))
+    return Project.objects.get(pk=project.id)
+
+
+def create_random_cabinets(project, count, seed=0):
+    """ Bulk create Cabinets and Drawers with random dimensions, finishes
+    and materials, for comparing pricing implementations
+    """
+    rand = random.Random(seed)
+    materials = []
+    for i in range(4):
+        info = get_material_info()
+        info['sheet_cost'] = Decimal(rand.randint(4000, 30000)) / 100
+        info['markup'] = Decimal(rand.randint(0, 60)) / 100
+        info['width'] = rand.choice([48, 49, 60])
+        info['length'] = rand.choice([96, 97, 120])
+        materials.append(Material.objects.create(**info))
+    specs = [
+        Specification.objects.create(**get_spec_info(
+            project, rand.choice(materials), rand.choice(materials)))
+        for i in range(3)
+    ]
+    rooms = [Room.objects.create(**get_room_info(project)) for i in range(3)]
+
+    def inches(low, high):
+        return Decimal(rand.randint(low * 100, high * 100)) / 100
+
+    cabinets = []
+    for n in range(count):
+        info = get_cabinet_info(
+            project, rand.choice(specs), rand.choice(rooms))
+        info.update({
+            'cabinet_number': n + 1,
+            'width': inches(9, 48),
+            'height': inches(12, 96),
+            'depth': inches(12, 24),
+            'number_of_doors': rand.randint(0, 2),
+            'number_of_shelves': rand.randint(0, 4),
+            'finished_interior': rand.random() < 0.2,
+            'finished_left_end': rand.random() < 0.3,
+            'finished_right_end': rand.random() < 0.3,
+            'finished_top': rand.random() < 0.2,
+            'finished_bottom': rand.random() < 0.2,
+        })
+        cabinets.append(Cabinet(**info))
+    bulk_insert(cabinets, Cabinet.objects.filter(project=project))
+    Drawer.objects.bulk_create([
+        Drawer(cabinet=cabinet, height=inches(3, 12),
+               material=rand.choice(materials))
+        for cabinet in cabinets
+        for i in range(rand.randint(0, 4))
+    ])
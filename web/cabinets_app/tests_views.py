@@ -1,16 +1,23 @@
 import factory
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 from .models import (
     Material, Hardware, Labor, Account,
     Project, Cabinet, Drawer, Specification, Room
 )
+from .cabinet_numbers import reserve_cabinet_numbers
+from .middleware import view_query_stats
 from .tests_models import (
     get_material_info, get_account_info, get_cabinet_info,
     get_drawer_info, get_material_info, get_project_info,
-    get_spec_info,
+    get_spec_info, get_room_info,
     get_hardware_info
 )
+from .tests_utils import create_rates, create_random_cabinets
 
 
 class UserFactory(factory.django.DjangoModelFactory):
@@ -169,6 +176,34 @@ class TestProjects(TestCase):
         self.assertIn(project.contact_email.encode(), res.content)
         self.assertIn(str(project.hourly_rate).encode(), res.content)
 
+    def test_project_home_counts(self):
+        project = Project.objects.create(**get_project_info())
+        material = Material.objects.create(**get_material_info())
+        spec = Specification.objects.create(
+            **get_spec_info(project, material, material))
+
+        def add_room():
+            room = Room.objects.create(**get_room_info(project))
+            for n in range(3):
+                info = get_cabinet_info(project, spec, room)
+                info['cabinet_number'] = reserve_cabinet_numbers(project.id)
+                cabinet = Cabinet.objects.create(**info)
+                for d in range(n):
+                    Drawer.objects.create(
+                        **get_drawer_info(cabinet, material))
+
+        url = reverse('project_home', kwargs={'proj_id': project.id})
+        add_room()
+        with CaptureQueriesContext(connection) as one_room:
+            res = self.client.get(url)
+        self.assertContains(res, '3 Cabinets')
+        self.assertContains(res, '3 Drawers')
+        add_room()
+        with CaptureQueriesContext(connection) as two_rooms:
+            res = self.client.get(url)
+        self.assertContains(res, '3 Drawers', count=2)
+        self.assertEqual(len(one_room), len(two_rooms))
+
     # def test_project_list():
 
 
@@ -183,3 +218,88 @@ class TestCabinets(TestCase):
             password='12345'
         )
         pass
+
+
+# Most queries each view may make on a cold cache, whatever the size of
+# the Project
+QUERY_BUDGETS = {
+    'project_home': 7,
+    'project_detail': 8,
+    'cabinet_list': 6,
+    'cabinet_detail': 11,
+    'spec_compare': 13,
+    'project_cut_list': 9,
+    'project_takeoff': 4,
+    'account_detail': 5,
+    'account_takeoff': 4,
+    'account_hardware_order': 8,
+    'shop_schedule': 5,
+}
+
+
+class QueryBudgetTestCase(TestCase):
+    """ TestCase with assertQueryBudget, which fails when a view makes
+    more queries than its entry in QUERY_BUDGETS
+    """
+    def assertQueryBudget(self, url_name, **kwargs):
+        budget = QUERY_BUDGETS[url_name]
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(reverse(url_name, kwargs=kwargs))
+        self.assertEqual(res.status_code, 200)
+        if len(queries) > budget:
+            self.fail('{} made {} queries, over its budget of {}:\n{}'.format(
+                url_name, len(queries), budget,
+                '\n'.join(query['sql'] for query in queries)))
+        return res
+
+
+class TestQueryBudgets(QueryBudgetTestCase):
+
+    def setUp(self):
+        cache.clear()
+        create_rates()
+        user = User.objects.create_user('estimator', password='12345')
+        self.client.force_login(user)
+        # large enough that one query per cabinet blows any budget
+        self.project = Project.objects.create(**get_project_info())
+        create_random_cabinets(self.project, 150)
+        self.cabinet = Cabinet.objects.filter(project=self.project).first()
+
+    def test_project_views(self):
+        for url_name in ('project_home', 'project_detail', 'cabinet_list',
+                         'spec_compare', 'project_cut_list',
+                         'project_takeoff'):
+            with self.subTest(url_name):
+                self.assertQueryBudget(url_name, proj_id=self.project.id)
+        self.assertQueryBudget(
+            'cabinet_detail', proj_id=self.project.id,
+            cab_id=self.cabinet.id)
+
+    def test_account_views(self):
+        for url_name in ('account_detail', 'account_takeoff',
+                         'account_hardware_order'):
+            with self.subTest(url_name):
+                self.assertQueryBudget(
+                    url_name, account_id=self.project.account.id)
+        self.assertQueryBudget('shop_schedule')
+
+    def test_server_timing(self):
+        view_query_stats.clear()
+        timing = r'^db;desc="\d+ queries";dur=[\d.]+, total;dur=[\d.]+$'
+        res = self.assertQueryBudget('project_home', proj_id=self.project.id)
+        # not shown to everyone in production
+        self.assertFalse(res.has_header('Server-Timing'))
+        with self.settings(DEBUG=True):
+            res = self.client.get(
+                reverse('project_home', kwargs={'proj_id': self.project.id}))
+        self.assertRegex(res['Server-Timing'], timing)
+        staff = User.objects.create_user(
+            'manager', password='12345', is_staff=True)
+        self.client.force_login(staff)
+        res = self.client.get(reverse('account'))
+        self.assertRegex(res['Server-Timing'], timing)
+        requests, queries, seconds, most = view_query_stats.get(
+            'project_home')
+        self.assertEqual(requests, 2)
+        self.assertLessEqual(most, QUERY_BUDGETS['project_home'])
+        self.assertLessEqual(queries, 2 * most)
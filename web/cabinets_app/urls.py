@@ -1,5 +1,6 @@
 from .views import (
     account, account_create, account_detail, account_update, account_delete,
+    account_takeoff, account_hardware_order,
     material_create, material_delete, material_detail,
     material_list, material_update,
     hardware_create, hardware_delete, hardware_detail,
@@ -7,14 +8,16 @@ from .views import (
     labor_create, labor_delete, labor_detail, labor_list, labor_update
 )
 from .views_cab import (
-    cabinet_create, drawer_form, cabinet_detail,
-    cabinet_update, cabinet_delete, cabinet_list
+    cabinet_create, cabinet_import, cabinet_bulk_edit, drawer_form,
+    cabinet_detail, cabinet_update, cabinet_copy, cabinet_delete,
+    cabinet_list
 )
 from .views_proj import (
      project_list, project_create, project_detail, project_update,
-     project_delete, project_home,
-     spec_create, spec_detail, spec_delete, spec_update,
-     room_create, room_update, room_delete,
+     project_clone, project_delete, project_home, project_cut_list,
+     project_takeoff,
+     spec_create, spec_detail, spec_delete, spec_update, spec_compare,
+     room_create, room_update, room_delete, shop_schedule,
 )
 from django.urls import path
 
@@ -28,9 +31,15 @@ urlpatterns = [
          account_update, name='account_update'),
     path('account/<int:account_id>/delete',
          account_delete, name='account_delete'),
+    path('account/<int:account_id>/takeoff',
+         account_takeoff, name='account_takeoff'),
+    path('account/<int:account_id>/hardware',
+         account_hardware_order, name='account_hardware_order'),
     path('account/<int:account_id>/project/',
          project_create, name='project_create'),
 
+    path('schedule/', shop_schedule, name='shop_schedule'),
+
     path('material/all', material_list, name='material_list'),
     path('material/',
          material_create, name='material_create'),
@@ -67,8 +76,14 @@ urlpatterns = [
          project_detail, name='project_detail'),
     path('project/<int:proj_id>/update',
          project_update, name='project_update'),
+    path('project/<int:proj_id>/clone',
+         project_clone, name='project_clone'),
     path('project/<int:proj_id>/delete',
          project_delete, name='project_delete'),
+    path('project/<int:proj_id>/cutlist',
+         project_cut_list, name='project_cut_list'),
+    path('project/<int:proj_id>/takeoff',
+         project_takeoff, name='project_takeoff'),
 
     path('project/<int:proj_id>/room/',
          room_create, name='room_create'),
@@ -79,6 +94,8 @@ urlpatterns = [
 
     path('project/<int:proj_id>/spec/',
          spec_create, name='spec_create'),
+    path('project/<int:proj_id>/spec/compare',
+         spec_compare, name='spec_compare'),
     path('project/<int:proj_id>/spec/<int:spec_id>',
          spec_detail, name='spec_detail'),
     path('project/<int:proj_id>/spec/<int:spec_id>/update',
@@ -88,6 +105,10 @@ urlpatterns = [
 
     path('project/<int:proj_id>/room/<int:room_id>/cabinet',
          cabinet_create, name='cabinet_create'),
+    path('project/<int:proj_id>/room/<int:room_id>/cabinet/import',
+         cabinet_import, name='cabinet_import'),
+    path('project/<int:proj_id>/room/<int:room_id>/cabinet/edit',
+         cabinet_bulk_edit, name='cabinet_bulk_edit'),
     path('project/<int:proj_id>/cabinet/drawer_form',
          drawer_form, name='drawer_form'),
     path('project/<int:proj_id>/cabinet_list',
@@ -96,6 +117,8 @@ urlpatterns = [
          cabinet_detail, name='cabinet_detail'),
     path('project/<int:proj_id>/cabinet/<int:cab_id>/update',
          cabinet_update, name='cabinet_update'),
+    path('project/<int:proj_id>/cabinet/<int:cab_id>/copy',
+         cabinet_copy, name='cabinet_copy'),
     path('project/<int:proj_id>/cabinet/<int:cab_id>/delete',
          cabinet_delete, name='cabinet_delete'),
 ]
@@ -1,4 +1,6 @@
+from django.http import Http404, HttpResponse
 from django.shortcuts import render, redirect
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
 from .models import (
@@ -9,6 +11,8 @@ from .forms import (
     ProjectForm, AccountForm, CabinetForm, SpecForm,
     MaterialForm, HardwareForm, RoomForm, LaborForm
 )
+from . import takeoff
+from .hardware import hardware_order, write_order_csv
 
 
 # ----- ACCOUNTS ----- #
@@ -38,7 +42,7 @@ def account_create(req):
 @login_required
 def account_detail(req, account_id=None):
     account = Account.objects.get(pk=account_id)
-    projects = Project.objects.filter(account__id=account_id)
+    projects = Project.objects.filter(account__id=account_id).with_price()
     context = {
         'account': account,
         'projects': projects,
@@ -46,6 +50,63 @@ def account_detail(req, account_id=None):
     return render(req, './account/account_detail.html', context)
 
 
+@login_required
+def account_takeoff(req, account_id=None):
+    """ Square feet of each Material across the Account's Projects;
+    ?format=csv for a spreadsheet
+    """
+    account = Account.objects.get(pk=account_id)
+    rows = takeoff.account_takeoff(account)
+    if req.GET.get('format') == 'csv':
+        res = HttpResponse(content_type='text/csv')
+        res['Content-Disposition'] = (
+            f'attachment; filename="takeoff-account-{account.id}.csv"')
+        takeoff.write_takeoff_csv(rows, res)
+        return res
+    context = {
+        'name': account.name,
+        'rows': rows,
+        'total': sum(row.total for row in rows),
+    }
+    return render(req, './material/material_takeoff.html', context)
+
+
+@login_required
+def account_hardware_order(req, account_id=None):
+    """ Hardware purchase order for the Account's Projects, narrowed by
+    ?project=<id> and ?room=<id> (both repeatable); ?format=csv for a
+    spreadsheet
+    """
+    account = Account.objects.get(pk=account_id)
+    cabinets = Cabinet.objects.filter(project__account=account)
+    try:
+        project_ids = [int(pk) for pk in req.GET.getlist('project')]
+        room_ids = [int(pk) for pk in req.GET.getlist('room')]
+    except ValueError:
+        raise Http404('Unknown Project or Room')
+    if project_ids:
+        cabinets = cabinets.filter(project__in=project_ids)
+    if room_ids:
+        cabinets = cabinets.filter(room__in=room_ids)
+    lines = hardware_order(cabinets)
+    if req.GET.get('format') == 'csv':
+        res = HttpResponse(content_type='text/csv')
+        res['Content-Disposition'] = (
+            f'attachment; filename="hardware-account-{account.id}.csv"')
+        write_order_csv(lines, res)
+        return res
+    context = {
+        'account': account,
+        'projects': Project.objects.filter(
+            account=account).prefetch_related('rooms'),
+        'project_ids': project_ids,
+        'room_ids': room_ids,
+        'lines': lines,
+        'total': sum(line.marked_up for line in lines),
+    }
+    return render(req, './hardware/hardware_order.html', context)
+
+
 @login_required
 def account_update(req, account_id=None):
     account = Account.objects.get(pk=account_id)
@@ -119,6 +180,8 @@ def material_update(req, material_id=None):
         if form.is_valid():
             form.instance.date_updated = timezone.now()
             material = form.save()
+            if material.reprice_report:
+                messages.info(req, str(material.reprice_report))
             return redirect('material_detail', material_id=material.id)
         else:
             return render(req, './material/material_update.html', {'form': form})
@@ -1,18 +1,28 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
-from django.db.models import Max
 from django import forms
 from .models import (
     Account, Cabinet, Drawer, Project, Room
 )
-from .forms import CabinetForm, DrawerFormSet
+from .cabinet_bulk import copy_cabinet, update_cabinets
+from .cabinet_import import (
+    SCHEDULE_COLUMNS, ScheduleError, import_schedule, read_schedule
+)
+from .cabinet_numbers import reserve_cabinet_numbers
+from .forms import (
+    CabinetBulkEditForm, CabinetCopyForm, CabinetForm, CabinetImportForm,
+    DrawerFormSet
+)
+from .pricing import cabinet_prices
+from .rates import get_rate_table
+from .stored_prices import has_price_rates, is_priceable, load_cabinets
 
 
 @login_required
 def cabinet_list(req, proj_id=None):
     context = {
         'project': Project.objects.get(pk=proj_id),
-        'cabinets': Cabinet.objects.filter(project__id=proj_id)
+        'cabinets': Cabinet.objects.filter(project__id=proj_id).with_price()
     }
     return render(req, './cabinet/cabinet_list.html', context)
 
@@ -25,14 +35,8 @@ def cabinet_create(req, proj_id=None, room_id=None):
         form = CabinetForm(project, req.POST)
         drawer_form = DrawerFormSet(req.POST)
         if form.is_valid():
-            # set cabinet_number to increment within project
-            max_cab_no = Cabinet.objects.filter(
-                project__id=proj_id).aggregate(Max('cabinet_number'))
-            if max_cab_no['cabinet_number__max']:
-                cabinet_number = max_cab_no['cabinet_number__max'] + 1
-                form.instance.cabinet_number = cabinet_number
-            else:
-                form.instance.cabinet_number = 1
+            form.instance.cabinet_number = reserve_cabinet_numbers(
+                project.id)
             form.instance.project = project
             form.instance.room = room
             cab = form.save()
@@ -62,6 +66,83 @@ def cabinet_create(req, proj_id=None, room_id=None):
         return render(req, './cabinet/cabinet_create.html', context)
 
 
+@login_required
+def cabinet_import(req, proj_id=None, room_id=None):
+    """ Import a .csv or .xlsx cabinet schedule into a Room
+    Bad rows are listed and skipped; the rest are imported.
+    """
+    project = Project.objects.get(pk=proj_id)
+    room = Room.objects.select_related('project').get(
+        pk=room_id, project=project)
+    result = None
+    if req.method == 'POST':
+        form = CabinetImportForm(req.POST, req.FILES)
+        if form.is_valid():
+            schedule = form.cleaned_data['schedule']
+            try:
+                result = import_schedule(
+                    room, read_schedule(schedule, schedule.name))
+            except ScheduleError as e:
+                form.add_error('schedule', str(e))
+            else:
+                form = CabinetImportForm()
+    else:
+        form = CabinetImportForm()
+    context = {
+        'form': form,
+        'project': project,
+        'room': room,
+        'columns': SCHEDULE_COLUMNS,
+        'result': result,
+    }
+    return render(req, './cabinet/cabinet_import.html', context)
+
+
+@login_required
+def cabinet_copy(req, proj_id=None, cab_id=None):
+    """ Add copies of a Cabinet, with its drawers, to its Room
+    """
+    project = Project.objects.get(pk=proj_id)
+    cabinet = Cabinet.objects.select_related('room').get(
+        pk=cab_id, project=project)
+    if req.method == 'POST':
+        form = CabinetCopyForm(req.POST)
+        if form.is_valid():
+            copy_cabinet(cabinet, form.cleaned_data['count'])
+            return redirect('project_home', proj_id=proj_id)
+    else:
+        form = CabinetCopyForm()
+    context = {
+        'form': form,
+        'project': project,
+        'cabinet': cabinet,
+    }
+    return render(req, './cabinet/cabinet_copy.html', context)
+
+
+@login_required
+def cabinet_bulk_edit(req, proj_id=None, room_id=None):
+    """ Change fields on a selection of a Room's Cabinets at once
+    """
+    project = Project.objects.get(pk=proj_id)
+    room = Room.objects.get(pk=room_id, project=project)
+    if req.method == 'POST':
+        form = CabinetBulkEditForm(room, req.POST)
+        if form.is_valid():
+            update_cabinets(
+                room, [cab.pk for cab in form.cleaned_data['cabinets']],
+                **form.changes())
+            return redirect('project_home', proj_id=proj_id)
+    else:
+        form = CabinetBulkEditForm(room)
+    context = {
+        'form': form,
+        'project': project,
+        'room': room,
+    }
+    return render(req, './cabinet/cabinet_bulk_edit.html', context)
+
+
 @login_required
 def drawer_form(req, proj_id=None):
     if 'form-TOTAL_FORMS' in req.POST.keys():
@@ -74,13 +155,22 @@ def drawer_form(req, proj_id=None):
 
 @login_required
 def cabinet_detail(req, proj_id=None, cab_id=None):
-    cabinet = Cabinet.objects.get(pk=cab_id)
-    project = Project.objects.get(pk=proj_id)
-    account = Account.objects.get(pk=project.account.id)
+    cabinet = load_cabinets(Cabinet.objects.filter(pk=cab_id)).get()
+    project = cabinet.project
+    account = Account.objects.get(pk=project.account_id)
+    drawers = list(cabinet.drawers.all())
+    rates = get_rate_table()
+    if is_priceable(cabinet, drawers) and has_price_rates(rates):
+        # priced alone, as the cabinet's stored_price was
+        drawer_prices = cabinet_prices(cabinet, drawers, rates)[1]
+    else:
+        # leave the prices blank, as the price properties did
+        drawer_prices = [None] * len(drawers)
     context = {
         'cabinet': cabinet,
+        'drawers': list(zip(drawers, drawer_prices)),
         'project': project,
-        'account': account
+        'account': account,
     }
     return render(req, './cabinet/cabinet_detail.html', context)
 
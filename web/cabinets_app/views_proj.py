@@ -1,13 +1,25 @@
+from decimal import Decimal, InvalidOperation
+from django.http import Http404, HttpResponse
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
+from django.db.models import Prefetch
 from .models import (
     Account, Material, Labor,
     Specification, Hardware, Project, Room, Cabinet
 )
 from .forms import (
-    ProjectForm, AccountForm, CabinetForm, SpecForm,
+    ProjectForm, ProjectCloneForm, AccountForm, CabinetForm, SpecForm,
     MaterialForm, HardwareForm, RoomForm
 )
+from . import takeoff
+from .cutlist import DEFAULT_KERF, project_cut_lists
+from .project_clone import clone_project
+from .schedule import (
+    DEFAULT_SHOP_HOURS, labor_totals, labor_uses, project_labor, schedule
+)
+from .spec_compare import (
+    Alternative, compare_specifications, load_alternatives
+)
 
 
 # ----- PROJECTS ----- #
@@ -23,12 +35,13 @@ def project_list(req, account_id=None):
 @login_required
 def project_home(req, proj_id=None):
     project = Project.objects.get(pk=proj_id)
-    rooms = Room.objects.filter(project=project)
-    cabinets = Cabinet.objects.filter(project=project)
+    rooms = Room.objects.filter(project=project).with_counts(
+    ).prefetch_related(
+        Prefetch('cabinets', queryset=Cabinet.objects.select_related(
+            'project', 'specification')))
     context = {
         'project': project,
         'rooms': rooms,
-        'cabinets': cabinets,
     }
     return render(req, './project/project_home.html', context)
 
@@ -60,7 +73,8 @@ def project_create(req, account_id=None):
 def project_detail(req, proj_id=None):
     project = Project.objects.get(pk=proj_id)
     account = Account.objects.get(pk=project.account.id)
-    specs = Specification.objects.filter(project=project)
+    specs = Specification.objects.filter(project=project).select_related(
+        'project', 'interior_material', 'exterior_material')
     context = {
         'project': project,
         'account': account,
@@ -69,6 +83,49 @@ def project_detail(req, proj_id=None):
     return render(req, './project/project_detail.html', context)
 
 
+@login_required
+def project_cut_list(req, proj_id=None):
+    """ Sheets of each Material the Project's panels are cut from
+    ?kerf=<inches> sets the saw kerf; ?grain=1 keeps panels from turning.
+    """
+    project = Project.objects.get(pk=proj_id)
+    try:
+        kerf = Decimal(req.GET.get('kerf', DEFAULT_KERF))
+    except InvalidOperation:
+        raise Http404('Bad kerf')
+    if not kerf.is_finite() or kerf < 0:
+        raise Http404('Bad kerf')
+    grain = bool(req.GET.get('grain'))
+    context = {
+        'project': project,
+        'cut_lists': project_cut_lists(project, kerf, grain),
+        'kerf': kerf,
+        'grain': grain,
+    }
+    return render(req, './project/project_cut_list.html', context)
+
+
+@login_required
+def project_takeoff(req, proj_id=None):
+    """ Square feet of each Material the Project uses; ?format=csv for
+    a spreadsheet
+    """
+    project = Project.objects.get(pk=proj_id)
+    rows = takeoff.project_takeoff(project)
+    if req.GET.get('format') == 'csv':
+        res = HttpResponse(content_type='text/csv')
+        res['Content-Disposition'] = (
+            f'attachment; filename="takeoff-project-{project.id}.csv"')
+        takeoff.write_takeoff_csv(rows, res)
+        return res
+    context = {
+        'name': project.name,
+        'rows': rows,
+        'total': sum(row.total for row in rows),
+    }
+    return render(req, './material/material_takeoff.html', context)
+
+
 @login_required
 def project_update(req, proj_id=None):
     project = Project.objects.get(pk=proj_id)
@@ -88,6 +145,31 @@ def project_update(req, proj_id=None):
         return render(req, './project/project_update.html', context)
 
 
+@login_required
+def project_clone(req, proj_id=None):
+    """ Copy a Project, with everything in it, into its own Account or
+    another
+    """
+    project = Project.objects.get(pk=proj_id)
+    if req.method == 'POST':
+        form = ProjectCloneForm(req.POST)
+        if form.is_valid():
+            clone = clone_project(
+                project, form.cleaned_data['account'],
+                form.cleaned_data['name'])
+            return redirect('project_home', proj_id=clone.id)
+    else:
+        form = ProjectCloneForm(initial={
+            'name': f'{project.name} (copy)',
+            'account': project.account_id,
+        })
+    context = {
+        'form': form,
+        'project': project
+    }
+    return render(req, './project/project_clone.html', context)
+
+
 @login_required
 def project_delete(req, proj_id=None):
     if req.method == 'POST':
@@ -101,6 +183,33 @@ def project_delete(req, proj_id=None):
         return render(req, './project/project_delete.html', context)
 
 
+# ----- SCHEDULE ----- #
+
+@login_required
+def shop_schedule(req):
+    """ Labor minutes of every Project and the weeks they fill, oldest
+    Project first; ?hours=<shop hours per week>
+    """
+    try:
+        shop_hours = Decimal(req.GET.get('hours', DEFAULT_SHOP_HOURS))
+    except InvalidOperation:
+        raise Http404('Bad shop hours')
+    if not shop_hours.is_finite() or shop_hours <= 0:
+        raise Http404('Bad shop hours')
+    projects = Project.objects.order_by('pk')
+    uses, unplaced = labor_uses()
+    labor = project_labor(projects, uses)
+    scheduled, weeks = schedule(projects, labor, shop_hours)
+    context = {
+        'shop_hours': shop_hours,
+        'totals': labor_totals(labor),
+        'unplaced': unplaced,
+        'scheduled': scheduled,
+        'weeks': [(monday, minutes / 60) for monday, minutes in weeks],
+    }
+    return render(req, './project/shop_schedule.html', context)
+
+
 # ----- SPECIFICATIONS ----- #
 
 @login_required
@@ -175,6 +284,38 @@ def spec_delete(req, proj_id=None, spec_id=None):
         return render(req, './specifications/spec_delete.html', context)
 
 
+@login_required
+def spec_compare(req, proj_id=None):
+    """ Compare the Project's price under other Specifications
+    Alternatives come from ?spec=<id> and ?interior=<id>&exterior=<id>
+    (all repeatable), defaulting to every Specification of the Project.
+    """
+    project = Project.objects.get(pk=proj_id)
+    try:
+        spec_ids = [int(pk) for pk in req.GET.getlist('spec')]
+        material_pairs = [
+            (int(interior_id), int(exterior_id))
+            for interior_id, exterior_id in zip(
+                req.GET.getlist('interior'), req.GET.getlist('exterior'))
+        ]
+        alternatives = load_alternatives(spec_ids, material_pairs)
+    except (ValueError, Specification.DoesNotExist, Material.DoesNotExist):
+        raise Http404('Unknown Specification or Material')
+    if not alternatives:
+        alternatives = [
+            Alternative.from_spec(spec)
+            for spec in project.specifications.select_related(
+                'interior_material', 'exterior_material')
+        ]
+    context = {
+        'project': project,
+        'comparison': compare_specifications(project, alternatives),
+        'specs': project.specifications.all(),
+        'materials': Material.objects.all(),
+    }
+    return render(req, './specifications/spec_compare.html', context)
+
+
 # ----- ROOMS ----- #
 
 @login_required
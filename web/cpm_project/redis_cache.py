@@ -0,0 +1,124 @@
+""" Minimal Django cache backend on redis-py
+
+Django 2.2 ships no Redis backend. This one covers the cache API the
+project uses, with every gunicorn worker sharing the same Redis. Values
+are pickled, except integers, which are stored as plain numbers so that
+incr() and decr() are atomic in Redis.
+"""
+import pickle
+import redis
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+
+# INCRBY on a key only if it exists, in one atomic step, so a key that
+# expires meanwhile is not recreated at delta
+INCR_EXISTING = """
+if redis.call('exists', KEYS[1]) == 1 then
+    return redis.call('incrby', KEYS[1], ARGV[1])
+end
+return false
+"""
+
+
+class RedisCache(BaseCache):
+    def __init__(self, server, params):
+        super().__init__(params)
+        self._client = redis.Redis.from_url(server)
+        self._incr_existing = self._client.register_script(INCR_EXISTING)
+
+    def _key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _expiry(self, timeout):
+        """ Seconds until expiry, None for never
+        """
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        return None if timeout is None else max(int(timeout), 0)
+
+    def _dump(self, value):
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    def _load(self, value):
+        if value is None:
+            return None
+        if value.lstrip(b'-').isdigit():
+            return int(value)
+        return pickle.loads(value)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        expiry = self._expiry(timeout)
+        if expiry == 0:
+            return False
+        return bool(self._client.set(
+            self._key(key, version), self._dump(value), ex=expiry, nx=True))
+
+    def get(self, key, default=None, version=None):
+        value = self._load(self._client.get(self._key(key, version)))
+        return default if value is None else value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        expiry = self._expiry(timeout)
+        if expiry == 0:
+            self._client.delete(key)
+        else:
+            self._client.set(key, self._dump(value), ex=expiry)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        expiry = self._expiry(timeout)
+        if expiry is None:
+            return bool(self._client.persist(key))
+        return bool(self._client.expire(key, expiry))
+
+    def delete(self, key, version=None):
+        self._client.delete(self._key(key, version))
+
+    def has_key(self, key, version=None):
+        return bool(self._client.exists(self._key(key, version)))
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        value = self._incr_existing(keys=[key], args=[delta])
+        if value is None:
+            raise ValueError(f"Key '{key}' not found")
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        if not keys:
+            return {}
+        values = self._client.mget([self._key(key, version) for key in keys])
+        return {
+            key: self._load(value)
+            for key, value in zip(keys, values) if value is not None
+        }
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        pipeline = self._client.pipeline()
+        expiry = self._expiry(timeout)
+        for key, value in data.items():
+            key = self._key(key, version)
+            if expiry == 0:
+                pipeline.delete(key)
+            else:
+                pipeline.set(key, self._dump(value), ex=expiry)
+        pipeline.execute()
+        return []
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if keys:
+            self._client.delete(*keys)
+
+    def clear(self):
+        """ Empty the whole Redis database, not just this cache's keys
+        """
+        self._client.flushdb()
+
+    def close(self, **kwargs):
+        pass
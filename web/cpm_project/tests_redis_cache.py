@@ -0,0 +1,64 @@
+import os
+import threading
+from unittest import skipUnless
+import redis
+from django.test import SimpleTestCase
+from .redis_cache import RedisCache
+
+# a Redis the tests may write to; they are skipped when it is not up
+TEST_REDIS_URL = os.environ.get('TEST_REDIS_URL', 'redis://localhost:6379/15')
+
+
+def redis_reachable(url):
+    try:
+        return redis.Redis.from_url(url, socket_connect_timeout=1).ping()
+    except redis.RedisError:
+        return False
+
+
+@skipUnless(redis_reachable(TEST_REDIS_URL), f'No Redis at {TEST_REDIS_URL}')
+class RedisCacheTest(SimpleTestCase):
+
+    def setUp(self):
+        self.cache = RedisCache(TEST_REDIS_URL, {'KEY_PREFIX': 'cpm-test'})
+        self.addCleanup(self.cache.delete_many, ['counter', 'value'])
+
+    def test_set_and_get(self):
+        self.cache.set('value', {'total': 12})
+        self.assertEqual(self.cache.get('value'), {'total': 12})
+        self.cache.set('counter', 3)
+        self.assertEqual(self.cache.get_many(['counter', 'missing']), {
+            'counter': 3})
+
+    def test_incr(self):
+        self.cache.set('counter', 1)
+        self.assertEqual(self.cache.incr('counter'), 2)
+        self.assertEqual(self.cache.incr('counter', 5), 7)
+        self.assertEqual(self.cache.get('counter'), 7)
+
+    def test_incr_missing(self):
+        with self.assertRaises(ValueError):
+            self.cache.incr('counter')
+        # not created at delta
+        self.assertFalse(self.cache.has_key('counter'))
+
+    def test_incr_keeps_expiry(self):
+        self.cache.set('counter', 1, timeout=100)
+        self.cache.incr('counter')
+        key = self.cache.make_key('counter')
+        self.assertGreater(self.cache._client.ttl(key), 0)
+
+    def test_incr_is_atomic(self):
+        self.cache.set('counter', 0, timeout=None)
+
+        def count():
+            cache = RedisCache(TEST_REDIS_URL, {'KEY_PREFIX': 'cpm-test'})
+            for i in range(100):
+                cache.incr('counter')
+
+        threads = [threading.Thread(target=count) for t in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.cache.get('counter'), 400)
@@ -7,5 +7,6 @@ cd /src
 python3 manage.py migrate
 python3 manage.py makemigrations
 python3 manage.py migrate
+python3 manage.py rebuild_prices
 python3 manage.py collectstatic --noinput
 python3 manage.py runserver 0.0.0.0:8000
\ No newline at end of file